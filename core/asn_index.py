@@ -0,0 +1,352 @@
+import gzip
+import logging
+import mmap
+import os
+import socket
+import struct
+from array import array
+from bisect import bisect_right
+
+# Header of an index file: magic, byte-order mark, interval count, prefix count
+INDEX_MAGIC = b"NDTASN\x01\x00"
+INDEX_HEADER = struct.Struct("=8sIII")
+BYTE_ORDER_MARK = 0x01020304
+
+# Slot of the address ranges no prefix covers
+NO_PREFIX = 0xFFFFFFFF
+
+# First-level table entries, one per /16
+BUCKETS = 1 << 16
+
+_unpack_address = struct.Struct("!I").unpack
+_pack_address = struct.Struct("!I").pack
+
+
+def default_index_directory():
+    """Return the directory routing-table dumps and their index are kept in."""
+    return os.path.join(os.path.expanduser("~"), ".network_diagnostic_tool")
+
+
+def find_source(directory=None):
+    """
+    Find the newest routing-table dump in a directory.
+
+    Recognizes CAIDA pfx2as files (``*.pfx2as``, ``*.pfx2as.gz``) and
+    ``pfx2as.txt``/``pfx2as.txt.gz``.
+
+    Returns:
+        Path of the dump, or None if there is none
+    """
+    directory = directory or default_index_directory()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    candidates = [
+        os.path.join(directory, name) for name in names
+        if name.endswith((".pfx2as", ".pfx2as.gz", "pfx2as.txt", "pfx2as.txt.gz"))
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def address_to_int(address):
+    """Convert a dotted IPv4 address to an integer, or None if it is not one."""
+    try:
+        return _unpack_address(socket.inet_pton(socket.AF_INET, address))[0]
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def read_prefixes(path):
+    """
+    Read an IPv4 routing-table dump.
+
+    Lines are ``prefix<TAB>length<TAB>asn`` (CAIDA pfx2as) or
+    ``prefix/length asn``. For multi-origin prefixes (``13335_209`` or
+    ``13335,209``) the first origin is kept. IPv6 and malformed lines are
+    skipped.
+
+    Args:
+        path: Dump file, optionally gzip-compressed
+
+    Returns:
+        List of (network, length, asn) integer tuples
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    prefixes = []
+    skipped = 0
+    with opener(path, "rt", encoding="ascii", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            try:
+                if "/" in fields[0]:
+                    network, length = fields[0].split("/")
+                    origin = fields[1]
+                else:
+                    network, length, origin = fields[:3]
+                length = int(length)
+                value = address_to_int(network)
+                asn = int(origin.replace(",", "_").split("_")[0])
+            except (ValueError, IndexError):
+                skipped += 1
+                continue
+            if value is None or not 0 <= length <= 32:
+                skipped += 1
+                continue
+            # Clear host bits so equal prefixes sort together
+            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+            prefixes.append((value & mask, length, asn))
+    if skipped:
+        logging.info(f"ASN index: skipped {skipped} IPv6 or malformed lines in {path}")
+    return prefixes
+
+
+def _flatten(prefixes):
+    """
+    Turn possibly nested prefixes into non-overlapping address ranges.
+
+    Each range is labelled with the longest prefix covering it, so a
+    longest-prefix match becomes a search for the range holding an address.
+
+    Args:
+        prefixes: Sorted, de-duplicated list of (network, length, asn)
+
+    Returns:
+        Tuple of (starts, slots) arrays: range i covers starts[i] up to
+        starts[i + 1] - 1 and belongs to prefix slots[i] (or NO_PREFIX)
+    """
+    starts = array('I')
+    slots = array('I')
+
+    def emit(start, end, slot):
+        if start > end or (slots and slots[-1] == slot):
+            return
+        starts.append(start)
+        slots.append(slot)
+
+    cursor = 0
+    stack = []  # (end, slot) of the prefixes enclosing the cursor, innermost last
+    for slot, (network, length, _asn) in enumerate(prefixes):
+        while stack and stack[-1][0] < network:
+            end, enclosing = stack.pop()
+            emit(cursor, end, enclosing)
+            cursor = end + 1
+        emit(cursor, network - 1, stack[-1][1] if stack else NO_PREFIX)
+        cursor = network
+        stack.append((network + (1 << (32 - length)) - 1, slot))
+    while stack:
+        end, enclosing = stack.pop()
+        emit(cursor, end, enclosing)
+        cursor = end + 1
+    emit(cursor, 0xFFFFFFFF, NO_PREFIX)
+    return starts, slots
+
+
+def build_index(source, index_path):
+    """
+    Build an index file from a routing-table dump.
+
+    The file holds a /16 first-level table, the flattened ranges and the
+    prefix table as native-endian arrays, so AsnIndex can map it without
+    parsing anything. It is written to a temporary file and renamed, so a
+    reader never sees a partial index.
+
+    Args:
+        source: Routing-table dump, see read_prefixes
+        index_path: Index file to write
+
+    Returns:
+        Number of prefixes indexed
+    """
+    # Keep the first origin listed for a prefix that appears more than once
+    origins = {}
+    for network, length, asn in read_prefixes(source):
+        origins.setdefault((network, length), asn)
+    prefixes = [key + (origins[key],) for key in sorted(origins)]
+
+    starts, slots = _flatten(prefixes)
+    buckets = array('I', (bisect_right(starts, bucket << 16) - 1 for bucket in range(BUCKETS)))
+    buckets.append(len(starts) - 1)
+    networks = array('I', (network for network, _length, _asn in prefixes))
+    asns = array('I', (asn for _network, _length, asn in prefixes))
+    lengths = array('B', (length for _network, length, _asn in prefixes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    temporary = index_path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, BYTE_ORDER_MARK, len(starts), len(prefixes)))
+        for table in (buckets, starts, slots, networks, asns, lengths):
+            table.tofile(f)
+    os.replace(temporary, index_path)
+    return len(prefixes)
+
+
+class AsnIndex:
+    """
+    Memory-mapped longest-prefix index of IPv4 address to origin ASN.
+
+    A lookup indexes a /16 table to narrow the search to the few ranges of
+    that block, then bisects them, so it costs one table read and a handful
+    of comparisons. Opening an index only maps the file; pages are read on
+    demand and shared between processes.
+    """
+
+    def __init__(self, index_path):
+        """
+        Open an index file.
+
+        Args:
+            index_path: File written by build_index
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not a valid index for this machine
+        """
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, byte_order, intervals, prefixes = INDEX_HEADER.unpack_from(self._map)
+            if magic != INDEX_MAGIC or byte_order != BYTE_ORDER_MARK:
+                raise ValueError(f"{index_path} is not an ASN index for this machine")
+            sizes = (
+                ('I', (BUCKETS + 1) * 4), ('I', intervals * 4), ('I', intervals * 4),
+                ('I', prefixes * 4), ('I', prefixes * 4), ('B', prefixes),
+            )
+            if INDEX_HEADER.size + sum(size for _code, size in sizes) != len(self._map):
+                raise ValueError(f"{index_path} is truncated")
+            self._view = memoryview(self._map)
+            tables = []
+            offset = INDEX_HEADER.size
+            for code, size in sizes:
+                tables.append(self._view[offset:offset + size].cast(code))
+                offset += size
+        except Exception:
+            self._map.close()
+            raise
+        self._buckets, self._starts, self._slots, self._networks, self._asns, self._lengths = tables
+        self._tables = tables
+
+    def __len__(self):
+        return len(self._networks)
+
+    def close(self):
+        """Unmap the index file."""
+        for table in self._tables:
+            table.release()
+        self._tables = []
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _slot(self, address):
+        """Return the prefix slot of a dotted address, NO_PREFIX if none covers it."""
+        try:
+            value = _unpack_address(socket.inet_pton(socket.AF_INET, address))[0]
+        except (OSError, TypeError, ValueError):
+            return NO_PREFIX
+        bucket = value >> 16
+        low = self._buckets[bucket]
+        high = self._buckets[bucket + 1]
+        if low != high:
+            # Several ranges start inside this /16; bisect only those
+            low = bisect_right(self._starts, value, low + 1, high + 1) - 1
+        return self._slots[low]
+
+    def _prefix(self, slot):
+        network = socket.inet_ntoa(_pack_address(self._networks[slot]))
+        return f"{network}/{self._lengths[slot]}"
+
+    def asn(self, address):
+        """
+        Find the origin ASN of an address.
+
+        Args:
+            address: Dotted IPv4 address
+
+        Returns:
+            ASN as an integer, or None if no prefix covers the address
+        """
+        slot = self._slot(address)
+        return None if slot == NO_PREFIX else self._asns[slot]
+
+    def lookup(self, address):
+        """
+        Find the longest prefix covering an address.
+
+        Args:
+            address: Dotted IPv4 address
+
+        Returns:
+            Tuple of (asn, "network/length"), or None if no prefix covers
+            the address
+        """
+        slot = self._slot(address)
+        if slot == NO_PREFIX:
+            return None
+        return self._asns[slot], self._prefix(slot)
+
+    def lookup_many(self, addresses):
+        """
+        Look up many addresses, for example every responder of a trace.
+
+        Args:
+            addresses: Iterable of dotted IPv4 addresses; None entries are skipped
+
+        Returns:
+            Dictionary of address -> (asn, "network/length") or None
+        """
+        results = {}
+        prefixes = {}
+        slot_of = self._slot
+        asns = self._asns
+        for address in addresses:
+            if address is None or address in results:
+                continue
+            slot = slot_of(address)
+            if slot == NO_PREFIX:
+                results[address] = None
+                continue
+            prefix = prefixes.get(slot)
+            if prefix is None:
+                prefix = prefixes[slot] = self._prefix(slot)
+            results[address] = (asns[slot], prefix)
+        return results
+
+
+def open_index(source=None, index_path=None):
+    """
+    Open the ASN index, rebuilding it when the routing-table dump is newer.
+
+    Args:
+        source: Routing-table dump, defaults to the newest one find_source finds
+        index_path: Index file, defaults to asn.idx in the default directory
+
+    Returns:
+        AsnIndex, or None if there is neither a dump nor an index
+    """
+    index_path = index_path or os.path.join(default_index_directory(), "asn.idx")
+    source = source or find_source()
+    index_mtime = os.path.getmtime(index_path) if os.path.exists(index_path) else None
+    if source is not None and (index_mtime is None or os.path.getmtime(source) > index_mtime):
+        count = build_index(source, index_path)
+        logging.info(f"ASN index: indexed {count} prefixes from {source}")
+    elif index_mtime is None:
+        return None
+    try:
+        return AsnIndex(index_path)
+    except ValueError:
+        if source is None:
+            raise
+        # Written on a machine with a different byte order; rebuild it here
+        build_index(source, index_path)
+        return AsnIndex(index_path)
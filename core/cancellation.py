@@ -0,0 +1,190 @@
+import logging
+import socket
+import threading
+import time
+
+
+class OperationCancelled(Exception):
+    """Raised when an operation is cancelled or runs past its deadline."""
+
+
+class Deadline:
+    """Wall-clock budget measured on the monotonic clock."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, timeout=None):
+        """
+        Initialize the deadline.
+
+        Args:
+            timeout: Seconds from now until the deadline, None for no deadline
+        """
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    @property
+    def expired(self):
+        """True once the deadline has passed."""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self, default=None):
+        """
+        Seconds left before the deadline.
+
+        Args:
+            default: Value returned when there is no deadline
+
+        Returns:
+            Seconds left (never negative), or default
+        """
+        if self.expires_at is None:
+            return default
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation signal with an optional deadline.
+
+    Code doing blocking I/O can either poll ``cancelled``, include the token
+    in ``select()`` (it becomes readable the moment it is cancelled), or
+    ``register()`` a callback that aborts the I/O, for example by closing a
+    socket or killing a process. When the deadline passes the token cancels
+    itself, so registered callbacks fire on time as well.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        """
+        Initialize the token.
+
+        Args:
+            timeout: Optional wall-clock budget in seconds
+            parent: Optional token whose cancellation also cancels this one
+        """
+        self.deadline = Deadline(timeout)
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._waker = None
+        self._timer = None
+        self._parent = parent
+        if parent is not None:
+            parent.register(self._cancel_from_parent)
+        if timeout is not None:
+            self._timer = threading.Timer(timeout, self.cancel, args=("deadline",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_from_parent(self):
+        self.cancel(self._parent.reason)
+
+    def child(self, timeout=None):
+        """Create a token that is cancelled together with this one."""
+        return CancellationToken(timeout, parent=self)
+
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the token and run registered callbacks.
+
+        Args:
+            reason: "cancelled", "deadline" or "shutdown"
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+            if self._waker:
+                try:
+                    self._waker[1].send(b'\x00')
+                except OSError:
+                    pass
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.debug(f"Cancellation callback failed: {e}")
+
+    @property
+    def cancelled(self):
+        """True if the token was cancelled or its deadline has passed."""
+        if not self._event.is_set() and self.deadline.expired:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    @property
+    def deadline_exceeded(self):
+        """True if the token was cancelled because its deadline passed."""
+        return self.cancelled and self.reason == "deadline"
+
+    def raise_if_cancelled(self):
+        """Raise OperationCancelled if the token was cancelled."""
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def remaining(self, default=None):
+        """Seconds left before the deadline, or default if there is none."""
+        return self.deadline.remaining(default)
+
+    def wait(self, timeout=None):
+        """
+        Sleep until the timeout elapses or the token is cancelled.
+
+        Returns:
+            True if the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+    def register(self, callback):
+        """
+        Register a callback that aborts blocking I/O on cancellation.
+
+        The callback runs immediately if the token is already cancelled.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def unregister(self, callback):
+        """Remove a previously registered callback."""
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def fileno(self):
+        """Return a descriptor that becomes readable on cancellation, for select()."""
+        with self._lock:
+            if self._waker is None:
+                self._waker = socket.socketpair()
+                for end in self._waker:
+                    end.setblocking(False)
+                if self._event.is_set():
+                    self._waker[1].send(b'\x00')
+            return self._waker[0].fileno()
+
+    def close(self):
+        """Release the timer, waker sockets and link to the parent token."""
+        if self._timer:
+            self._timer.cancel()
+        if self._parent is not None:
+            self._parent.unregister(self._cancel_from_parent)
+        with self._lock:
+            if self._waker:
+                for end in self._waker:
+                    end.close()
+                self._waker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
@@ -0,0 +1,252 @@
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# getaddrinfo errors meaning the name has no addresses, as opposed to the
+# resolver failing to answer (EAI_AGAIN, EAI_FAIL, a network error)
+NEGATIVE_GAI_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+# gethostbyaddr errors meaning the address has no PTR record: HOST_NOT_FOUND
+# and NO_DATA, and their Windows Sockets equivalents
+NEGATIVE_HOST_ERRORS = {1, 4, 11001, 11004}
+
+
+class DnsCache:
+    """
+    Thread-safe in-memory cache for forward and reverse DNS lookups.
+
+    Forward lookups go through ``getaddrinfo`` so both A and AAAA records
+    are supported; reverse (PTR) lookups go through ``gethostbyaddr``. The
+    system resolver does not expose record TTLs, so positive and negative
+    answers are kept for fixed, configurable lifetimes. Only definitive
+    negative answers are cached; a lookup that failed because the resolver
+    did not answer is asked again on the next call. The least recently
+    used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300, negative_ttl=60, reverse_workers=8):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl: Seconds to keep a successful answer
+            negative_ttl: Seconds to keep a failed lookup
+            reverse_workers: Maximum number of concurrent background PTR lookups
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.reverse_workers = reverse_workers
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires, answer)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = {}  # address -> callbacks waiting for its PTR lookup
+
+    def _lookup(self, hostname, family):
+        """
+        Query the system resolver, returning a tuple of unique addresses.
+
+        Raises:
+            OSError: If the resolver failed without a definitive answer
+        """
+        try:
+            infos = socket.getaddrinfo(hostname, None, family, socket.SOCK_STREAM)
+        except UnicodeError as e:
+            logging.debug(f"DNS lookup failed for {hostname}: {e}")
+            return ()
+        except socket.gaierror as e:
+            logging.debug(f"DNS lookup failed for {hostname}: {e}")
+            if e.errno in NEGATIVE_GAI_ERRORS:
+                return ()
+            raise
+        return tuple(dict.fromkeys(info[4][0] for info in infos))
+
+    def resolve(self, hostname, family=socket.AF_UNSPEC):
+        """
+        Resolve a hostname, using the cache when possible.
+
+        Args:
+            hostname: Hostname to resolve
+            family: socket.AF_INET, socket.AF_INET6 or socket.AF_UNSPEC for both
+
+        Returns:
+            Tuple of address strings, empty if the name does not resolve
+        """
+        key = (hostname.lower(), family)
+        found, addresses = self._get(key)
+        if found:
+            return addresses
+        try:
+            addresses = self._lookup(hostname, family)
+        except OSError:
+            # Not cached, so the next call asks the resolver again
+            return ()
+        self._store(key, addresses)
+        return addresses
+
+    def _get(self, key):
+        """
+        Look up a live cache entry, counting the hit or miss.
+
+        Returns:
+            Tuple of (found, answer)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def _store(self, key, answer):
+        """Cache an answer; empty answers are kept for the negative TTL."""
+        lifetime = self.ttl if answer else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + lifetime, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _reverse_lookup(self, address):
+        """
+        Query the system resolver for the PTR name of an address.
+
+        Returns:
+            Host name, or None if the address has no PTR record
+
+        Raises:
+            OSError: If the resolver failed without a definitive answer
+        """
+        try:
+            return socket.gethostbyaddr(address)[0]
+        except socket.herror as e:
+            logging.debug(f"Reverse DNS lookup failed for {address}: {e}")
+            if e.errno in NEGATIVE_HOST_ERRORS:
+                return None
+            raise
+        except socket.gaierror as e:
+            logging.debug(f"Reverse DNS lookup failed for {address}: {e}")
+            if e.errno in NEGATIVE_GAI_ERRORS:
+                return None
+            raise
+
+    def reverse(self, address):
+        """
+        Find the host name of an address, using the cache when possible.
+
+        Args:
+            address: IPv4 or IPv6 address string
+
+        Returns:
+            Host name, or None if the address has no PTR record
+        """
+        key = ("PTR", address)
+        found, name = self._get(key)
+        if found:
+            return name
+        try:
+            name = self._reverse_lookup(address)
+        except OSError:
+            return None
+        self._store(key, name)
+        return name
+
+    def reverse_async(self, addresses, callback):
+        """
+        Resolve host names in the background, without blocking the caller.
+
+        Cached answers are delivered at once. The others are looked up in
+        parallel on a bounded worker pool, and an address already being
+        looked up is not queried twice.
+
+        Args:
+            addresses: Iterable of address strings
+            callback: Called with (address, name) for each address; name is
+                None if there is no PTR record. May run on a worker thread.
+        """
+        for address in dict.fromkeys(addresses):
+            if not address:
+                continue
+            found, name = self._get(("PTR", address))
+            if found:
+                callback(address, name)
+                continue
+            with self._lock:
+                waiting = self._pending.get(address)
+                if waiting is not None:
+                    waiting.append(callback)
+                    continue
+                self._pending[address] = [callback]
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.reverse_workers, thread_name_prefix="ptr"
+                    )
+                pool = self._pool
+            pool.submit(self._finish_reverse, address)
+
+    def _finish_reverse(self, address):
+        """Look up one PTR name and deliver it to everyone waiting for it."""
+        try:
+            name = self._reverse_lookup(address)
+            self._store(("PTR", address), name)
+        except OSError:
+            name = None
+        with self._lock:
+            callbacks = self._pending.pop(address, [])
+        for callback in callbacks:
+            try:
+                callback(address, name)
+            except Exception as e:
+                logging.error(f"Reverse DNS callback failed for {address}: {e}")
+
+    def close(self):
+        """Stop the background lookup pool without waiting for running lookups."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._pending.clear()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def resolve_many(self, hostnames, family=socket.AF_UNSPEC, max_workers=32):
+        """
+        Resolve many hostnames in parallel.
+
+        Args:
+            hostnames: Iterable of hostnames
+            family: Address family, as for resolve()
+            max_workers: Maximum number of concurrent lookups
+
+        Returns:
+            Dictionary mapping each hostname to a tuple of addresses
+        """
+        hostnames = list(dict.fromkeys(hostnames))
+        if not hostnames:
+            return {}
+        workers = max(1, min(max_workers, len(hostnames)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda name: self.resolve(name, family), hostnames)
+            return dict(zip(hostnames, results))
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses and the current number of entries
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
@@ -0,0 +1,213 @@
+import copy
+import math
+from array import array
+from .ping_stats import RunningStats
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class LatencySeries:
+    """
+    Compact latency series backed by an ``array('d')``.
+
+    Lost packets are stored as NaN, so a lost packet can never be confused
+    with a genuine 0 ms reply. Count, loss, min, max, mean and standard
+    deviation are maintained as samples are appended, so reading them is
+    O(1). Storage is pre-allocated and grows by doubling; views returned by
+    ``view()`` stay valid while the series keeps growing.
+    """
+
+    __slots__ = ("_data", "_length", "_lost", "_stats")
+
+    def __init__(self, values=(), capacity=64):
+        """
+        Initialize the series.
+
+        Args:
+            values: Optional initial latencies in ms (None or NaN for lost packets)
+            capacity: Number of samples to pre-allocate
+        """
+        self._data = array('d', bytes(8 * max(1, capacity)))
+        self._length = 0
+        self._lost = 0
+        self._stats = RunningStats()
+        for value in values:
+            self.append(value)
+
+    def append(self, rtt):
+        """
+        Append a sample.
+
+        Args:
+            rtt: Round-trip time in ms, or None/NaN for a lost packet
+        """
+        if self._length == len(self._data):
+            # Grow into a new buffer so existing views keep pointing at valid memory
+            grown = array('d', self._data)
+            grown.frombytes(bytes(8 * len(self._data)))
+            self._data = grown
+
+        if rtt is None or rtt != rtt:
+            self._data[self._length] = math.nan
+            self._lost += 1
+        else:
+            rtt = float(rtt)
+            self._data[self._length] = rtt
+            self._stats.add(rtt)
+        self._length += 1
+
+    def set(self, index, rtt):
+        """
+        Record the sample of a probe by its sequence number.
+
+        Probe engines report a lost packet only at its timeout, after the
+        replies to later probes, so samples may arrive out of order. Slots
+        up to index that were not set yet are filled with NaN and count as
+        lost until their own sample is set.
+
+        Args:
+            index: Sequence number of the probe, starting at 0
+            rtt: Round-trip time in ms, or None/NaN for a lost packet
+
+        Raises:
+            ValueError: If index is negative or its slot already holds a reply
+        """
+        if index < 0:
+            raise ValueError(f"Invalid sample index {index}")
+        while self._length <= index:
+            self.append(None)
+        if self._data[index] == self._data[index]:
+            raise ValueError(f"Sample {index} already holds a reply")
+        if rtt is None or rtt != rtt:
+            return
+        rtt = float(rtt)
+        self._data[index] = rtt
+        self._lost -= 1
+        self._stats.add(rtt)
+
+    def __len__(self):
+        return self._length
+
+    def copy(self):
+        """Return an independent copy, safe to hand to another thread while this one grows."""
+        clone = LatencySeries.__new__(LatencySeries)
+        clone._data = self._data[:max(1, self._length)]
+        clone._length = self._length
+        clone._lost = self._lost
+        clone._stats = copy.copy(self._stats)
+        return clone
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def view(self, start=0, stop=None):
+        """
+        Return a zero-copy view of the samples.
+
+        The view is read-only on Python 3.8+; on 3.7, which has no
+        ``memoryview.toreadonly()``, callers must not write through it.
+
+        Args:
+            start: Index of the first sample
+            stop: Index after the last sample, defaults to the end of the series
+
+        Returns:
+            memoryview of doubles (NaN marks lost packets)
+        """
+        if stop is None or stop > self._length:
+            stop = self._length
+        view = memoryview(self._data)
+        if hasattr(view, "toreadonly"):
+            view = view.toreadonly()
+        return view[start:stop]
+
+    def as_array(self):
+        """Return the samples as a NumPy array without copying, if NumPy is available."""
+        if numpy is None:
+            return self.view()
+        return numpy.frombuffer(self._data, dtype=numpy.float64, count=self._length)
+
+    @property
+    def count(self):
+        """Number of probes recorded."""
+        return self._length
+
+    @property
+    def received(self):
+        """Number of probes that got a reply."""
+        return self._length - self._lost
+
+    @property
+    def lost(self):
+        """Number of probes that were lost."""
+        return self._lost
+
+    @property
+    def packet_loss(self):
+        """Packet loss as a percentage."""
+        return (self._lost / self._length) * 100 if self._length else 0.0
+
+    @property
+    def min(self):
+        """Minimum latency in ms, or None if nothing was received."""
+        return self._stats.min if self.received else None
+
+    @property
+    def max(self):
+        """Maximum latency in ms, or None if nothing was received."""
+        return self._stats.max if self.received else None
+
+    @property
+    def avg(self):
+        """Average latency in ms, or None if nothing was received."""
+        return self._stats.mean if self.received else None
+
+    @property
+    def stddev(self):
+        """Sample standard deviation in ms, or None with fewer than two replies."""
+        return self._stats.stddev
+
+    def percentile(self, percent):
+        """
+        Compute a latency percentile over the received samples.
+
+        Uses linear interpolation between closest ranks, like numpy.percentile.
+
+        Args:
+            percent: Percentile between 0 and 100
+
+        Returns:
+            Latency in ms, or None if nothing was received
+        """
+        if not self.received:
+            return None
+        if numpy is not None:
+            return float(numpy.nanpercentile(self.as_array(), percent))
+        values = sorted(value for value in self.view() if value == value)
+        rank = (len(values) - 1) * percent / 100
+        lower = math.floor(rank)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+    def stats(self):
+        """
+        Summarize the series.
+
+        Returns:
+            Dictionary with avg/min/max/stddev latency in ms (0 if nothing was received)
+        """
+        return {
+            'avg_latency': self.avg or 0,
+            'min_latency': self.min or 0,
+            'max_latency': self.max or 0,
+            'stddev_latency': self.stddev or 0
+        }
+
+    def __repr__(self):
+        return f"LatencySeries(count={self._length}, lost={self._lost})"
@@ -0,0 +1,318 @@
+import math
+import time
+from array import array
+from .ping_stats import PingStatistics
+
+
+class RingBuffer:
+    """
+    Fixed-size ring of (timestamp, rtt) samples stored in two arrays.
+
+    Samples are kept in arrival order, which is not always timestamp order.
+    """
+
+    __slots__ = ("capacity", "_times", "_values", "_head", "_length")
+
+    def __init__(self, capacity):
+        """
+        Initialize the buffer.
+
+        Args:
+            capacity: Number of samples kept; older samples are overwritten
+        """
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._head = 0
+        self._length = 0
+
+    def append(self, timestamp, value):
+        """Store a sample, overwriting the oldest one when full."""
+        self._times[self._head] = timestamp
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        if self._length < self.capacity:
+            self._length += 1
+
+    def __len__(self):
+        return self._length
+
+    def snapshot(self):
+        """
+        Copy the samples out in time order.
+
+        Returns:
+            Tuple of (timestamps, values) arrays, oldest first
+        """
+        if self._length < self.capacity:
+            return self._times[:self._length], self._values[:self._length]
+        head = self._head
+        return (self._times[head:] + self._times[:head],
+                self._values[head:] + self._values[:head])
+
+    def tail(self, count):
+        """
+        Copy out the newest samples, without touching the rest of the ring.
+
+        Args:
+            count: Number of samples wanted
+
+        Returns:
+            Tuple of (timestamps, values) arrays, oldest first
+        """
+        count = min(count, self._length)
+        start = (self._head - count) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            return self._times[start:end], self._values[start:end]
+        end -= self.capacity
+        return (self._times[start:] + self._times[:end],
+                self._values[start:] + self._values[:end])
+
+
+class Rollup:
+    """
+    Fixed-size ring of min/avg/max/loss buckets at one time resolution.
+
+    Each bucket covers ``resolution`` seconds; only ``capacity`` buckets are
+    kept, so memory stays constant however long the monitor runs. A bucket
+    lives in slot ``key % capacity`` of its time key, so samples may arrive
+    out of order (a lost probe is only reported at its timeout, after
+    replies to later probes) and still land in the bucket they belong to.
+    """
+
+    __slots__ = ("resolution", "capacity", "_keys", "_sums", "_mins", "_maxs",
+                 "_counts", "_lost", "_newest")
+
+    def __init__(self, resolution, capacity):
+        """
+        Initialize the rollup.
+
+        Args:
+            resolution: Bucket width in seconds
+            capacity: Number of buckets kept
+        """
+        self.resolution = resolution
+        self.capacity = capacity
+        self._keys = array('q', [-1]) * capacity  # Time key of each slot's bucket, -1 if unused
+        self._sums = array('d', bytes(8 * capacity))
+        self._mins = array('d', bytes(8 * capacity))
+        self._maxs = array('d', bytes(8 * capacity))
+        self._counts = array('L', bytes(array('L').itemsize * capacity))
+        self._lost = array('L', bytes(array('L').itemsize * capacity))
+        self._newest = None
+
+    def add(self, timestamp, rtt):
+        """
+        Add a sample to the bucket covering its timestamp.
+
+        Samples older than the oldest bucket kept are dropped.
+
+        Args:
+            timestamp: Sample time in seconds since the epoch
+            rtt: Round-trip time in ms, or NaN for a lost packet
+        """
+        key = math.floor(timestamp / self.resolution)
+        newest = self._newest
+        if newest is not None and key <= newest - self.capacity:
+            return
+        i = key % self.capacity
+        if self._keys[i] != key:
+            # The slot holds nothing or a bucket at least capacity buckets older
+            self._keys[i] = key
+            self._sums[i] = 0.0
+            self._mins[i] = math.inf
+            self._maxs[i] = -math.inf
+            self._counts[i] = 0
+            self._lost[i] = 0
+        if newest is None or key > newest:
+            self._newest = key
+
+        if rtt != rtt:
+            self._lost[i] += 1
+            return
+        self._counts[i] += 1
+        self._sums[i] += rtt
+        if rtt < self._mins[i]:
+            self._mins[i] = rtt
+        if rtt > self._maxs[i]:
+            self._maxs[i] = rtt
+
+    def _live_keys(self, first=None):
+        """Keys of the buckets kept, oldest first, from key first on if given."""
+        if self._newest is None:
+            return
+        oldest = self._newest - self.capacity + 1
+        if first is not None and first > oldest:
+            oldest = first
+        for key in range(oldest, self._newest + 1):
+            if self._keys[key % self.capacity] == key:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _key in self._live_keys())
+
+    def buckets(self, since=None):
+        """
+        Iterate over the buckets, oldest first.
+
+        Args:
+            since: Optional time in seconds since the epoch; only the buckets
+                from the one covering it on are visited
+
+        Yields:
+            Tuples of (start_time, min, avg, max, packet_loss_percent); latency
+            fields are NaN for buckets where every packet was lost
+        """
+        first = None if since is None else math.floor(since / self.resolution)
+        for key in self._live_keys(first):
+            i = key % self.capacity
+            received = self._counts[i]
+            total = received + self._lost[i]
+            loss = (self._lost[i] / total) * 100 if total else 0.0
+            start = key * self.resolution
+            if received:
+                yield start, self._mins[i], self._sums[i] / received, self._maxs[i], loss
+            else:
+                yield start, math.nan, math.nan, math.nan, loss
+
+
+def lttb(xs, ys, threshold):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with its neighbours, so spikes survive
+    downsampling.
+
+    Args:
+        xs: Sequence of x values (sorted)
+        ys: Sequence of y values
+        threshold: Number of points to return
+
+    Returns:
+        Tuple of (xs, ys) lists with at most threshold points
+    """
+    length = len(xs)
+    if threshold >= length or threshold < 3:
+        return list(xs), list(ys)
+
+    out_x = [xs[0]]
+    out_y = [ys[0]]
+    every = (length - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third point of the triangle
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, length)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        ax = xs[a]
+        ay = ys[a]
+        max_area = -1.0
+        chosen = a
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                chosen = j
+        out_x.append(xs[chosen])
+        out_y.append(ys[chosen])
+        a = chosen
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+class PingMonitor:
+    """
+    Continuous ping monitor with constant memory.
+
+    Keeps a ring buffer of raw samples, 1 s / 1 min / 1 h rollups and
+    running statistics. The chart is drawn from the finest of them that
+    covers the whole run in a few points per pixel, so redraw cost does not
+    grow with the monitor's run time.
+    """
+
+    # (resolution in seconds, buckets kept): 1 hour, 1 day and 30 days
+    ROLLUPS = ((1, 3600), (60, 1440), (3600, 720))
+
+    # Points per pixel of chart width a source may have before the chart
+    # moves on to a coarser one; LTTB reduces them to one per pixel
+    POINTS_PER_PIXEL = 8
+
+    def __init__(self, raw_capacity=36000):
+        """
+        Initialize the monitor.
+
+        Args:
+            raw_capacity: Raw samples kept (one hour at 10 Hz by default)
+        """
+        self.raw = RingBuffer(raw_capacity)
+        self.rollups = {resolution: Rollup(resolution, capacity) for resolution, capacity in self.ROLLUPS}
+        self.stats = PingStatistics()
+        self.started = time.time()
+
+    def add(self, sample):
+        """
+        Record a PingSample.
+
+        Args:
+            sample: PingSample from a ping stream
+        """
+        rtt = math.nan if sample.rtt is None else sample.rtt
+        self.raw.append(sample.sent_at, rtt)
+        for rollup in self.rollups.values():
+            rollup.add(sample.sent_at, rtt)
+        self.stats.add(sample.rtt)
+
+    def chart_series(self, width, now=None):
+        """
+        Downsample the monitor's history for display.
+
+        The raw samples are used while the ring still holds the whole run in
+        at most POINTS_PER_PIXEL points per pixel, then the finest rollup that
+        does. At most that many points are copied and downsampled, so every
+        redraw costs the same however long the monitor has run.
+
+        Args:
+            width: Number of points the chart can show (its pixel width)
+            now: Current time in seconds since the epoch, defaults to time.time()
+
+        Returns:
+            Tuple of (seconds_ago, latencies, lost_seconds_ago, resolution):
+            the latency line with at most width points, the times of lost
+            probes (or of rollup buckets with losses) to mark on the chart,
+            and the bucket width in seconds, None for raw samples
+        """
+        width = max(3, int(width))
+        limit = width * self.POINTS_PER_PIXEL
+        now = time.time() if now is None else now
+
+        if len(self.raw) <= limit and len(self.raw) < self.raw.capacity:
+            times, values = self.raw.tail(limit)
+            # Losses are reported at their timeout, after replies to later probes
+            points = sorted(zip(times, values))
+            xs = [timestamp - now for timestamp, value in points if value == value]
+            ys = [value for _timestamp, value in points if value == value]
+            lost = [timestamp - now for timestamp, value in points if value != value]
+            resolution = None
+        else:
+            span = now - self.started
+            for resolution, capacity in self.ROLLUPS:
+                if span <= resolution * min(capacity, limit):
+                    break
+            rollup = self.rollups[resolution]
+            xs, ys, lost = [], [], []
+            for start, _low, average, _high, loss in rollup.buckets(since=now - resolution * limit):
+                middle = start + resolution / 2 - now
+                if average == average:
+                    xs.append(middle)
+                    ys.append(average)
+                if loss:
+                    lost.append(middle)
+        xs, ys = lttb(xs, ys, width)
+        return xs, ys, lost, resolution
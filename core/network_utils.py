@@ -1,16 +1,31 @@
 import logging
+import os
 import time
 import socket
 import platform
 import subprocess
 import ipaddress
-import re
 import psutil
-from ping3 import ping
 import speedtest
 import pyspeedtest
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import traceback
+from .asn_index import open_index
+from .cancellation import CancellationToken
+from .dns_cache import DnsCache
+from .latency_series import LatencySeries
+from .ping_engine import PingEngine
+from .probe_helper import ProbeHelperClient, default_socket_path
+from .process_stream import ProcessStream
+from .route_monitor import RouteMonitor
+from .speed_engine import DownloadEngine, UploadEngine
+from .sweep import PingSweep
+from .tcp_ping import TcpPingEngine
+from .topology import TopologyGraph
+from .trace_store import TraceStore, diff_paths
+from .traceroute import TraceEngine, parse_hop
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +40,9 @@ logging.basicConfig(
 class NetworkValidator:
     """Utilities for validating network addresses and hostnames."""
     
+    # Shared cache of forward lookups, so repeated runs skip the resolver
+    dns_cache = DnsCache()
+    
     @staticmethod
     def validate_ip(ip_address):
         """Validate if the given string is a valid IP address."""
@@ -35,24 +53,78 @@ class NetworkValidator:
             return False
     
     @staticmethod
-    def resolve_hostname(hostname):
-        """Resolve a hostname to an IP address."""
-        try:
-            return socket.gethostbyname(hostname)
-        except socket.gaierror:
-            return None
+    def resolve_hostname(hostname, family=socket.AF_INET):
+        """
+        Resolve a hostname to an IP address.
+        
+        Args:
+            hostname: Hostname to resolve
+            family: socket.AF_INET (default), socket.AF_INET6 or socket.AF_UNSPEC
+            
+        Returns:
+            The first address found, or None if the name does not resolve
+        """
+        addresses = NetworkValidator.dns_cache.resolve(hostname, family)
+        return addresses[0] if addresses else None
+    
+    @staticmethod
+    def reverse_lookup_async(addresses, callback):
+        """
+        Look up the host names of addresses in the background.
+        
+        Lookups run in parallel on a bounded pool and share the cache with
+        every other trace, so the caller never waits on DNS.
+        
+        Args:
+            addresses: Iterable of IP address strings
+            callback: Called with (address, name) as each name resolves; name
+                is None if the address has no PTR record
+        """
+        NetworkValidator.dns_cache.reverse_async(addresses, callback)
+    
+    @staticmethod
+    def resolve_hostnames(hostnames, family=socket.AF_INET):
+        """
+        Resolve many hostnames in parallel.
+        
+        Args:
+            hostnames: Iterable of hostnames
+            family: Address family, as for resolve_hostname
+            
+        Returns:
+            Dictionary mapping each hostname to its first address, or None
+        """
+        results = NetworkValidator.dns_cache.resolve_many(hostnames, family)
+        return {name: (addresses[0] if addresses else None) for name, addresses in results.items()}
 
 class NetworkUtils:
     """Core network utility functions."""
     
+    # Default wall-clock budget for a trace route in seconds
+    TRACE_ROUTE_DEADLINE = 60
+    
+    # Seconds each direction of a speed test transfers for
+    SPEED_TEST_DURATION = 10
+    
     def __init__(self):
         self.executor = ThreadPoolExecutor(max_workers=4)
         self._shutdown_requested = False
+        # Parent of every operation token, cancelled on shutdown
+        self._shutdown_token = CancellationToken()
+        self._trace_store = None
+        # Offline IP-to-ASN index, loaded by load_asn_index
+        self._asn_index = None
+        self._asn_index_lock = threading.Lock()
+        # Connection to the privileged probe helper, if one is running
+        self._probe_helper = None
+        self._probe_helper_lock = threading.Lock()
         
     def shutdown(self):
         """Shutdown the executor and stop all running threads properly."""
         logging.info("NetworkUtils: Shutting down all network operations")
         self._shutdown_requested = True
+        self._shutdown_token.cancel("shutdown")
+        NetworkValidator.dns_cache.close()
         
         # Shutdown the executor properly
         try:
@@ -61,20 +133,140 @@ class NetworkUtils:
             # For Python versions that don't support timeout parameter
             self.executor.shutdown(wait=False)
             
+        if self._trace_store is not None:
+            self._trace_store.close()
+        with self._probe_helper_lock:
+            if self._probe_helper is not None:
+                self._probe_helper.close()
+                self._probe_helper = None
+        with self._asn_index_lock:
+            if self._asn_index is not None:
+                self._asn_index.close()
+                self._asn_index = None
+            
         logging.info("NetworkUtils: Shutdown complete")
     
-    def run_ping(self, target, count=10, interval=1, callback=None):
+    @contextmanager
+    def _operation(self, token=None, deadline=None):
+        """
+        Create the token for one operation.
+        
+        The operation token is cancelled on shutdown, when the caller's token
+        is cancelled, or when the deadline passes.
+        
+        Args:
+            token: Optional CancellationToken supplied by the caller
+            deadline: Optional wall-clock budget in seconds
+        """
+        operation = self._shutdown_token.child(deadline)
+        relay = None
+        if token is not None:
+            relay = token.register(lambda: operation.cancel(token.reason))
+        try:
+            yield operation
+        finally:
+            if relay is not None:
+                token.unregister(relay)
+            operation.close()
+    
+    def _connect_probe_helper(self):
+        """
+        Connect to the privileged probe helper, reusing an open connection.
+        
+        Returns:
+            ProbeHelperClient, or None if no helper is running
+        """
+        with self._probe_helper_lock:
+            if self._probe_helper is not None and not self._probe_helper.closed:
+                return self._probe_helper
+            path = default_socket_path()
+            if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+                return None
+            try:
+                self._probe_helper = ProbeHelperClient(path)
+            except OSError as e:
+                logging.error(f"Could not connect to the probe helper at {path}: {e}")
+                self._probe_helper = None
+            return self._probe_helper
+    
+    def _ping_engine(self, timeout):
+        """
+        Create the ICMP engine for one operation.
+        
+        When this process may not open ICMP sockets, probes go through the
+        privileged probe helper if one is running; otherwise the returned
+        engine raises PermissionError on first use, as before.
+        """
+        engine = PingEngine(timeout=timeout)
+        try:
+            engine.open()
+        except PermissionError:
+            helper = self._connect_probe_helper()
+            if helper is not None:
+                engine.close()
+                return helper.ping_engine(timeout)
+        except OSError:
+            pass
+        return engine
+    
+    def _trace_engine(self, protocol="udp", timeout=2, port=None, probes=3):
+        """
+        Create the traceroute engine for one operation, using the probe
+        helper when raw sockets need privileges this process does not have.
+        
+        Raises:
+            OSError: If raw sockets are not available and no helper is running
+        """
+        try:
+            return TraceEngine(protocol, timeout, port, probes)
+        except OSError:
+            helper = self._connect_probe_helper()
+            if helper is None:
+                raise
+            return helper.trace_engine(protocol, timeout, port, probes)
+    
+    def _resolve_targets(self, targets):
+        """
+        Resolve a list of targets in parallel.
+        
+        Returns:
+            Tuple of (dict mapping target to address, dict mapping each
+            unresolvable target to a (None, 100.0) result)
+        """
+        addresses = {}
+        unresolved = {}
+        hostnames = [target for target in targets if not NetworkValidator.validate_ip(target)]
+        resolved = NetworkValidator.resolve_hostnames(hostnames)
+        logging.debug(f"DNS cache: {NetworkValidator.dns_cache.stats()}")
+        for target in targets:
+            if NetworkValidator.validate_ip(target):
+                addresses[target] = target
+            elif resolved.get(target):
+                addresses[target] = resolved[target]
+            else:
+                unresolved[target] = (None, 100.0)
+        return addresses, unresolved
+    
+    def run_ping(self, target, count=10, interval=1, callback=None, timeout=2, token=None, deadline=None):
         """
         Run a ping test to the specified target.
         
+        Echo requests are sent at a fixed rate on the monotonic clock and replies
+        are collected asynchronously, so the test takes count x interval no
+        matter how many packets are lost.
+        
         Args:
             target: IP address or hostname to ping
             count: Number of pings to send
-            interval: Time interval between pings in seconds
+            interval: Time interval between pings in seconds (sub-second allowed)
             callback: Optional callback function to update progress
+            timeout: Seconds to wait for each reply
+            token: Optional CancellationToken to stop the test early
+            deadline: Optional wall-clock budget in seconds
             
         Returns:
-            Tuple of (latency_data, packet_loss_percent)
+            Tuple of (latency_data, packet_loss_percent), where latency_data is a
+            LatencySeries with NaN marking lost packets
         """
         if not NetworkValidator.validate_ip(target):
             resolved_ip = NetworkValidator.resolve_hostname(target)
@@ -82,103 +274,568 @@ class NetworkUtils:
                 return None, 100.0
             target = resolved_ip
 
-        latency_data = []
-        lost_packets = 0
+        engine = self._ping_engine(timeout)
+        try:
+            with self._operation(token, deadline) as operation:
+                results = engine.ping_many([target], count, interval, callback, operation)
+        except OSError as e:
+            logging.error(f"Ping error for {target}: {e}")
+            if callback:
+                callback(100)
+            return LatencySeries([None] * count), 100.0
+        finally:
+            engine.close()
 
-        for i in range(count):
-            try:
-                if callback:
-                    callback(i / count * 100)
-                    
-                delay = ping(target, timeout=2)
-                if delay is None:
-                    lost_packets += 1
-                    latency_data.append(0)
-                else:
-                    latency_data.append(delay * 1000)  # Convert to ms
-            except Exception as e:
-                logging.error(f"Ping error for {target}: {e}")
-                lost_packets += 1
-                latency_data.append(0)
-            time.sleep(interval)
+        return results[target]
+
+    def stream_ping(self, target, count=None, interval=1, timeout=2, token=None, deadline=None):
+        """
+        Ping a target and yield a record for every probe as soon as it completes.
+        
+        Only outstanding probes are held in memory, so long or endless runs
+        (count=None) use constant memory. Close the generator to stop the run.
+        
+        Args:
+            target: IP address or hostname to ping
+            count: Number of pings to send, None to ping until closed
+            interval: Time interval between pings in seconds
+            timeout: Seconds to wait for each reply
+            token: Optional CancellationToken to stop the run
+            deadline: Optional wall-clock budget in seconds
+            
+        Yields:
+            PingSample with sequence number, send timestamp, RTT (None if lost) and TTL
+            
+        Raises:
+            OSError: If the ICMP socket cannot be opened or used
+        """
+        if not NetworkValidator.validate_ip(target):
+            resolved_ip = NetworkValidator.resolve_hostname(target)
+            if not resolved_ip:
+                logging.error(f"Ping error: could not resolve {target}")
+                return
+            target = resolved_ip
+
+        engine = self._ping_engine(timeout)
+        try:
+            with self._operation(token, deadline) as operation:
+                yield from engine.stream([target], count, interval, operation)
+        except OSError as e:
+            # Raised on, so the caller can tell a failure from total packet loss
+            logging.error(f"Ping error for {target}: {e}")
+            raise
+        finally:
+            engine.close()
+
+    def run_ping_many(self, targets, count=10, interval=1, callback=None, timeout=2, token=None, deadline=None):
+        """
+        Ping many targets concurrently over a single shared ICMP socket.
+        
+        Args:
+            targets: List of IP addresses or hostnames to ping
+            count: Number of pings to send to each target
+            interval: Time interval between ping rounds in seconds
+            callback: Optional callback function to update progress
+            timeout: Seconds to wait for each reply
+            token: Optional CancellationToken to stop the run early
+            deadline: Optional wall-clock budget in seconds
+            
+        Returns:
+            Dictionary mapping each target to a (LatencySeries, packet_loss_percent) tuple
+        """
+        addresses, results = self._resolve_targets(targets)
+
+        engine = self._ping_engine(timeout)
+        try:
+            with self._operation(token, deadline) as operation:
+                replies = engine.ping_many(addresses.values(), count, interval, callback, operation)
+        except OSError as e:
+            logging.error(f"Ping engine error: {e}")
+            replies = {}
+        finally:
+            engine.close()
+
+        for target, address in addresses.items():
+            results[target] = replies.get(address, (None, 100.0))
+        return results
+
+    def run_ping_sweep(self, network, rate=1000, timeout=1, callback=None, token=None, deadline=None):
+        """
+        Sweep an IPv4 network with ICMP echo requests to find live hosts.
+        
+        This is a library API; no view exposes it yet. Progress goes to
+        callback and the sweep stops as soon as token is cancelled.
+        
+        Args:
+            network: Network in CIDR notation, e.g. "192.168.0.0/22"
+            rate: Maximum packets per second
+            timeout: Seconds to wait for replies
+            callback: Optional callback function to update progress
+            token: Optional CancellationToken to stop the sweep early
+            deadline: Optional wall-clock budget in seconds
+            
+        Returns:
+            SweepResult with a live-host bitmap and RTTs, or None on error
+        """
+        try:
+            sweep = PingSweep(network, rate=rate, timeout=timeout, engine_factory=self._ping_engine)
+        except ValueError as e:
+            logging.error(f"Ping sweep error: {e}")
+            return None
+            
+        try:
+            with self._operation(token, deadline) as operation:
+                result = sweep.run(callback, operation)
+        except OSError as e:
+            logging.error(f"Ping sweep error for {network}: {e}")
+            return None
+            
+        logging.info(f"Ping sweep of {network}: {result.alive_count} of {result.probed} hosts alive")
+        return result
+
+    def stream_tcp_ping(self, target, port=443, count=None, interval=1, timeout=2, token=None, deadline=None):
+        """
+        Measure TCP handshake latency to a target, yielding a record per probe.
+        
+        Use this for targets that drop ICMP; results have the same shape as
+        stream_ping and feed the same series and statistics.
         
-        if callback:
-            callback(100)
+        Args:
+            target: IP address or hostname to probe
+            port: TCP port to connect to
+            count: Number of probes to send, None to probe until closed
+            interval: Time interval between probes in seconds
+            timeout: Seconds to wait for each handshake
+            token: Optional CancellationToken to stop the run
+            deadline: Optional wall-clock budget in seconds
             
-        packet_loss_percent = (lost_packets / count) * 100
-        return latency_data, packet_loss_percent
+        Yields:
+            PingSample with sequence number, send timestamp and RTT (None if lost)
+            
+        Raises:
+            OSError: If the probes cannot be sent
+        """
+        if not NetworkValidator.validate_ip(target):
+            resolved_ip = NetworkValidator.resolve_hostname(target)
+            if not resolved_ip:
+                logging.error(f"TCP ping error: could not resolve {target}")
+                return
+            target = resolved_ip
 
-    def run_trace_route(self, target, max_hops=35, update_ui_callback=None):
+        engine = TcpPingEngine(port=port, timeout=timeout)
+        try:
+            with self._operation(token, deadline) as operation:
+                yield from engine.stream([target], count, interval, operation)
+        except OSError as e:
+            # Raised on, so the caller can tell a failure from total packet loss
+            logging.error(f"TCP ping error for {target}: {e}")
+            raise
+
+    def run_tcp_ping_many(self, targets, port=443, count=10, interval=1, callback=None, timeout=2, token=None, deadline=None):
+        """
+        Measure TCP handshake latency to many targets concurrently.
+        
+        Args:
+            targets: List of IP addresses or hostnames to probe
+            port: TCP port to connect to
+            count: Number of probes to send to each target
+            interval: Time interval between probe rounds in seconds
+            callback: Optional callback function to update progress
+            timeout: Seconds to wait for each handshake
+            token: Optional CancellationToken to stop the run early
+            deadline: Optional wall-clock budget in seconds
+            
+        Returns:
+            Dictionary mapping each target to a (LatencySeries, packet_loss_percent) tuple
+        """
+        addresses, results = self._resolve_targets(targets)
+
+        engine = TcpPingEngine(port=port, timeout=timeout)
+        try:
+            with self._operation(token, deadline) as operation:
+                replies = engine.ping_many(addresses.values(), count, interval, callback, operation)
+        except OSError as e:
+            logging.error(f"TCP ping engine error: {e}")
+            replies = {}
+
+        for target, address in addresses.items():
+            results[target] = replies.get(address, (None, 100.0))
+        return results
+
+    def trace_route(self, target, max_hops=30, hop_callback=None, protocol="udp", timeout=2,
+                    token=None, deadline=None, ttls=None):
+        """
+        Trace the route to a target with the in-process traceroute engine.
+        
+        Args:
+            target: IPv4 address or hostname to trace
+            max_hops: Maximum number of hops to trace
+            hop_callback: Optional callback called with each Hop in TTL order
+            protocol: Probe protocol, "udp", "icmp" or "tcp"
+            timeout: Seconds to wait for replies to the last probes
+            token: Optional CancellationToken to stop the trace
+            deadline: Wall-clock budget in seconds, defaults to TRACE_ROUTE_DEADLINE
+            ttls: Optional collection of TTLs to probe; the others are skipped
+            
+        Returns:
+            List of Hop objects, or None if the target does not resolve
+            
+        Raises:
+            PermissionError: If raw sockets are not available and no probe helper is running
+        """
+        address = target
+        if not NetworkValidator.validate_ip(target):
+            address = NetworkValidator.resolve_hostname(target)
+            if not address:
+                logging.error(f"Trace route error: could not resolve {target}")
+                return None
+        if deadline is None:
+            deadline = self.TRACE_ROUTE_DEADLINE
+            
+        with self._trace_engine(protocol, timeout) as engine:
+            with self._operation(token, deadline) as operation:
+                return engine.trace(address, max_hops, hop_callback, operation, ttls)
+    
+    def run_trace_route(self, target, max_hops=35, update_ui_callback=None, token=None, deadline=None,
+                        protocol="udp"):
         """
         Run a traceroute to the specified target.
         
+        Uses the in-process engine, which probes every hop at once. When raw
+        sockets need privileges the application does not have, the probes go
+        through the privileged probe helper if one is running, and otherwise
+        the system traceroute/tracert is run.
+        
         Args:
             target: IP address or hostname to trace
             max_hops: Maximum number of hops to trace
-            update_ui_callback: Optional callback to update UI with real-time output
+            update_ui_callback: Optional callback called with (line, hop) for every
+                output line; hop is the parsed Hop, or None for other lines
+            token: Optional CancellationToken; cancelling it kills the trace at once
+            deadline: Wall-clock budget in seconds, defaults to TRACE_ROUTE_DEADLINE
+            protocol: Probe protocol for the in-process engine, "udp", "icmp" or "tcp"
             
         Returns:
             String containing the trace route output
         """
-        if platform.system() == "Windows":
-            command = ["tracert", "-h", str(max_hops), target]
-        else:
-            command = ["traceroute", "-m", str(max_hops), target]
-
-        process = None
-        try:
-            process = subprocess.Popen(
-                command, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                text=True, 
-                bufsize=1, 
-                universal_newlines=True
-            )
+        if deadline is None:
+            deadline = self.TRACE_ROUTE_DEADLINE
             
+        with self._operation(token, deadline) as operation:
             output = []
-            while True:
-                if self._shutdown_requested:
-                    # If shutdown requested, terminate the process
-                    if process:
-                        try:
-                            process.terminate()
-                            return "Trace route cancelled due to application shutdown"
-                        except:
-                            pass
-                
-                line = process.stdout.readline()
-                if not line:
-                    break
-                # Replace non-numeric values (like '<1') with '0' for processing
-                line = re.sub(r'<\d+', '0', line)
-                if update_ui_callback and not self._shutdown_requested:
-                    update_ui_callback(line.strip() + '\n')
+            
+            asn_lookup = self.lookup_asn if self._asn_index is not None else None
+            
+            def emit(hop):
+                line = hop.format(asn_lookup=asn_lookup) + '\n'
                 output.append(line)
-
-            process.wait()
-            if process.returncode != 0:
-                error_message = process.stderr.read()
-                logging.error(f"Trace route error for {target}: {error_message}")
-                return f"Error: {error_message}"
+                if update_ui_callback and not operation.cancelled:
+                    update_ui_callback(line, hop)
+            
+            try:
+                hops = self.trace_route(target, max_hops, emit, protocol, token=operation)
+            except OSError as e:
+                logging.info(f"Native trace route unavailable ({e}), using the system command")
+                return self._run_trace_route_command(target, max_hops, update_ui_callback, operation, deadline)
+            
+            if hops is None:
+                return f"Error: could not resolve {target}"
+            if operation.cancelled:
+                if operation.reason == "deadline":
+                    return f"Trace route timed out after {deadline} seconds"
+                if operation.reason == "shutdown":
+                    return "Trace route cancelled due to application shutdown"
+                return "Trace route cancelled"
             return "".join(output)
-        except subprocess.TimeoutExpired:
-            # Terminate the process if timeout expired
-            if process:
-                try:
-                    process.terminate()
-                except:
-                    pass
-            return "Trace route timed out after 60 seconds"
+    
+    def load_asn_index(self, source=None, index_path=None):
+        """
+        Load the offline IP-to-ASN index, replacing any loaded one.
+        
+        The index is built from a local routing-table dump (for example a
+        CAIDA pfx2as file in ~/.network_diagnostic_tool) the first time and
+        whenever the dump is newer; later loads only map the index file.
+        No network access is needed.
+        
+        Args:
+            source: Optional routing-table dump, defaults to the newest one found
+            index_path: Optional index file location
+            
+        Returns:
+            True if an index is loaded
+        """
+        try:
+            index = open_index(source, index_path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading ASN index: {e}")
+            return False
+        # Lookups read the index under the same lock, so none is still
+        # using the previous one when it is unmapped
+        with self._asn_index_lock:
+            previous, self._asn_index = self._asn_index, index
+            if previous is not None:
+                previous.close()
+        return index is not None
+    
+    def lookup_asn(self, address):
+        """
+        Find the origin ASN of an address in the loaded index.
+        
+        Returns:
+            ASN as an integer, or None if no index is loaded or no prefix covers it
+        """
+        with self._asn_index_lock:
+            index = self._asn_index
+            return index.asn(address) if index is not None else None
+    
+    def lookup_asns(self, addresses):
+        """
+        Find the origin ASN and prefix of many addresses, for example every hop of a trace.
+        
+        Returns:
+            Dictionary of address -> (asn, prefix) or None; empty if no index is loaded
+        """
+        with self._asn_index_lock:
+            index = self._asn_index
+            return index.lookup_many(addresses) if index is not None else {}
+    
+    def describe_origin(self, address):
+        """
+        Describe the origin of an address as "AS<n> (<prefix>)".
+        
+        Returns:
+            Description string, or None if no index is loaded or no prefix covers it
+        """
+        origin = self.lookup_asns([address]).get(address)
+        return f"AS{origin[0]} ({origin[1]})" if origin else None
+    
+    @property
+    def trace_store(self):
+        """Persistent store of past traces, opened on first use."""
+        if self._trace_store is None:
+            self._trace_store = TraceStore()
+        return self._trace_store
+    
+    def record_trace(self, target, hops, protocol=None, probed_at=None, asn_lookup=None):
+        """
+        Store a trace and compare it with the last known-good path.
+        
+        Args:
+            target: Target the trace was run to
+            hops: List of Hop objects
+            protocol: Probe protocol used
+            probed_at: Optional ttl -> probe time of hops reused from an earlier trace
+            asn_lookup: Optional function mapping an address to its ASN,
+                defaults to the loaded ASN index
+            
+        Returns:
+            Tuple of (previous StoredTrace or None, list of HopChange)
+        """
+        if asn_lookup is None and self._asn_index is not None:
+            asn_lookup = self.lookup_asn
+        try:
+            previous = self.trace_store.last(target, reached_only=True)
+            changes = diff_paths(previous.hops, hops, asn_lookup) if previous else []
+            self.trace_store.save(target, hops, protocol, probed_at)
+            return previous, changes
         except Exception as e:
-            # Terminate the process in case of any other exception
-            if process:
-                try:
-                    process.terminate()
-                except:
-                    pass
+            logging.error(f"Error storing trace route for {target}: {e}")
+            return None, []
+    
+    def quick_trace_route(self, target, max_hops=30, hop_callback=None, protocol="udp", max_age=300,
+                          token=None, deadline=None):
+        """
+        Re-trace a route, probing only the hops whose stored results are stale.
+        
+        Hops of the last stored trace probed less than max_age seconds ago
+        and answered are reused; the rest are probed again. Without a usable
+        stored trace, or when the re-probed hops show the path has moved, every
+        hop is probed.
+        
+        Args:
+            target: IPv4 address or hostname to trace
+            max_hops: Maximum number of hops to trace
+            hop_callback: Optional callback called with each Hop in TTL order
+            protocol: Probe protocol, "udp", "icmp" or "tcp"
+            max_age: Seconds a stored hop stays fresh
+            token: Optional CancellationToken to stop the trace
+            deadline: Optional wall-clock budget in seconds
+            
+        Returns:
+            Tuple of (list of Hop objects or None, ttl -> probe time of the reused hops)
+            
+        Raises:
+            PermissionError: If raw sockets are not available
+        """
+        previous = self.trace_store.last(target)
+        if previous is None or not previous.reached or len(previous.hops) > max_hops:
+            return self.trace_route(target, max_hops, hop_callback, protocol, token=token, deadline=deadline), {}
+            
+        stale = self.trace_store.stale_ttls(previous, max_age)
+        merged = {hop.ttl: hop for hop in previous.hops}
+        if stale:
+            fresh = self.trace_route(
+                target, len(previous.hops), None, protocol, token=token, deadline=deadline, ttls=stale
+            )
+            if fresh is None:
+                return None, {}
+            # A hop answered by other routers, or a destination that no longer
+            # answers at the end of the stored path, means the route moved and
+            # the reused hops cannot be trusted
+            moved = any(change.status == "changed" for change in diff_paths(previous.hops, fresh))
+            last = previous.hops[-1].ttl
+            if not any(hop.reached for hop in fresh) and any(hop.ttl == last for hop in fresh):
+                moved = True
+            if moved:
+                return self.trace_route(target, max_hops, hop_callback, protocol, token=token, deadline=deadline), {}
+            for hop in fresh:
+                merged[hop.ttl] = hop
+                
+        hops = []
+        for ttl in sorted(merged):
+            hops.append(merged[ttl])
+            # The destination may now answer earlier; stored hops past it are stale
+            if merged[ttl].reached:
+                break
+        if hop_callback:
+            for hop in hops:
+                hop_callback(hop)
+        reused = {hop.ttl: previous.probed_at[hop.ttl] for hop in hops if hop.ttl not in stale}
+        return hops, reused
+    
+    def run_trace_route_many(self, targets, max_hops=30, update_ui_callback=None, protocol="udp",
+                             token=None, deadline=None, max_concurrent=32):
+        """
+        Trace the routes to many targets at once and merge them into one graph.
+        
+        Every trace runs concurrently through run_trace_route, so the total
+        time is that of the slowest trace. Hops are merged into the graph as
+        they arrive, so hops shared by several paths show up immediately.
+        
+        Args:
+            targets: List of IP addresses or hostnames to trace
+            max_hops: Maximum number of hops to trace
+            update_ui_callback: Optional callback called with (target, line, hop, shared)
+                for every output line; shared lists the hop's addresses already
+                seen on another target's path
+            protocol: Probe protocol for the in-process engine, "udp", "icmp" or "tcp"
+            token: Optional CancellationToken that stops every trace
+            deadline: Optional wall-clock budget in seconds for the whole batch
+            max_concurrent: Maximum number of traces running at the same time
+            
+        Returns:
+            Tuple of (TopologyGraph, dictionary mapping each target to its trace output)
+        """
+        targets = list(dict.fromkeys(targets))
+        graph = TopologyGraph()
+        if not targets:
+            return graph, {}
+            
+        def trace(target):
+            def on_line(line, hop):
+                shared = graph.add_hop(target, hop) if hop is not None else []
+                if update_ui_callback:
+                    update_ui_callback(target, line, hop, shared)
+            return self.run_trace_route(target, max_hops, on_line, token=operation, protocol=protocol)
+        
+        with self._operation(token, deadline) as operation:
+            with ThreadPoolExecutor(max_workers=min(max_concurrent, len(targets))) as executor:
+                outputs = dict(zip(targets, executor.map(trace, targets)))
+        return graph, outputs
+    
+    def run_route_monitor(self, target, max_hops=30, protocol="udp", interval=1, callback=None,
+                          token=None, deadline=None):
+        """
+        Continuously trace the route to a target, MTR style, until cancelled.
+        
+        Args:
+            target: IPv4 address or hostname to monitor
+            max_hops: Maximum number of hops to trace
+            protocol: Probe protocol, "udp", "icmp" or "tcp"
+            interval: Seconds between probe rounds
+            callback: Optional callback called after every round with (monitor, changes)
+            token: CancellationToken that stops the monitor
+            deadline: Optional wall-clock budget in seconds
+            
+        Returns:
+            The RouteMonitor with the final statistics, or None if the target
+            does not resolve
+            
+        Raises:
+            PermissionError: If raw sockets are not available
+        """
+        address = target
+        if not NetworkValidator.validate_ip(target):
+            address = NetworkValidator.resolve_hostname(target)
+            if not address:
+                logging.error(f"Route monitor error: could not resolve {target}")
+                return None
+                
+        monitor = RouteMonitor(address, max_hops, protocol, interval, engine_factory=self._trace_engine)
+        with self._operation(token, deadline) as operation:
+            monitor.run(callback, operation)
+        return monitor
+    
+    def _run_trace_route_command(self, target, max_hops, update_ui_callback, operation, deadline):
+        """
+        Run the system traceroute/tracert and stream its output.
+        
+        Args:
+            target: IP address or hostname to trace
+            max_hops: Maximum number of hops to trace
+            update_ui_callback: Optional callback called with (line, hop) for every line
+            operation: CancellationToken of the running trace
+            deadline: Wall-clock budget in seconds, for the timeout message
+            
+        Returns:
+            String containing the trace route output
+        """
+        # Numeric output: names are looked up in parallel by the caller instead
+        if platform.system() == "Windows":
+            command = ["tracert", "-d", "-h", str(max_hops), target]
+        else:
+            command = ["traceroute", "-n", "-m", str(max_hops), target]
+        try:
+            stream = ProcessStream(command, token=operation)
+        except OSError as e:
+            logging.error(f"Trace route error for {target}: {e}")
+            return f"Error: {e}"
+            
+        # A hop reached the destination if the destination itself answered
+        destination = NetworkValidator.resolve_hostname(target)
+        output = []
+        try:
+            # stdout and stderr are read without blocking, so a silent hop
+            # never delays cancellation; the deadline is enforced by the token
+            for batch in stream.batches():
+                for source, line in batch:
+                    if source != "stdout" or operation.cancelled:
+                        continue
+                    # Each line is parsed once; consumers work off the Hop
+                    hop = parse_hop(line)
+                    if hop is not None:
+                        hop.reached = destination is not None and destination in hop.addresses
+                    if hop is not None and self._asn_index is not None:
+                        line = hop.format(asn_lookup=self.lookup_asn)
+                    if update_ui_callback:
+                        update_ui_callback(line.strip() + '\n', hop)
+                    output.append(line + '\n')
+        except Exception as e:
+            stream.kill()
             logging.error(f"Trace route error for {target}: {e}")
             return f"Error: {e}"
+            
+        if operation.cancelled:
+            if operation.reason == "deadline":
+                return f"Trace route timed out after {deadline} seconds"
+            if operation.reason == "shutdown":
+                return "Trace route cancelled due to application shutdown"
+            return "Trace route cancelled"
+            
+        if stream.returncode != 0:
+            logging.error(f"Trace route error for {target}: {stream.stderr}")
+            return f"Error: {stream.stderr}"
+        return "".join(output)
 
     def get_network_info(self):
         """
@@ -209,6 +866,9 @@ class NetworkUtils:
                 import requests
                 public_ip = requests.get("https://api.ipify.org", timeout=5).text
                 info['public_ip'] = public_ip
+                origin = self.describe_origin(public_ip)
+                if origin:
+                    info['public_asn'] = origin
             except Exception as e:
                 logging.error(f"Error retrieving public IP: {e}")
                 info['public_ip'] = "Public IP not accessible"
@@ -265,7 +925,8 @@ class NetworkUtils:
             logging.error(f"Error retrieving DNS resolvers: {e}")
         return resolvers
 
-    def run_speed_test(self, progress_callback=None, selected_server="auto"):
+    def run_speed_test(self, progress_callback=None, selected_server="auto", token=None, deadline=None,
+                       streams=None, series_callback=None):
         """
         Run an internet speed test using direct downloads from reliable CDN servers.
         Uses a simplified approach with better error handling.
@@ -273,10 +934,22 @@ class NetworkUtils:
         Args:
             progress_callback: Optional callback function to update progress
             selected_server: Server URL to use for testing, "auto" for automatic selection
+            token: Optional CancellationToken; cancelling it aborts open connections
+            deadline: Optional wall-clock budget in seconds
+            streams: Number of concurrent streams per direction, None to add
+                streams while throughput keeps rising
+            series_callback: Optional function called with "download" or
+                "upload" and the phase's ThroughputSeries as each phase
+                starts; the series fills in while the phase runs
             
         Returns:
             Tuple of (download_speed, upload_speed, ping_latency) in Mbps
         """
+        with self._operation(token, deadline) as operation:
+            return self._run_speed_test(progress_callback, selected_server, operation, streams, series_callback)
+    
+    def _run_speed_test(self, progress_callback, selected_server, operation, streams=None, series_callback=None):
+        """Speed test implementation, see run_speed_test."""
         try:
             logging.info("Starting speed test...")
             
@@ -286,9 +959,6 @@ class NetworkUtils:
             # Standard modules only, to minimize dependencies
             import requests
             import time
-            import threading
-            import random
-            import string
             from urllib.parse import urlparse
             
             # Use a session with timeout and headers
@@ -325,6 +995,8 @@ class NetworkUtils:
             
             ping_results = []
             for url in ping_urls:
+                if operation.cancelled:
+                    break
                 try:
                     start_time = time.time()
                     response = session.head(url, timeout=2)
@@ -334,6 +1006,9 @@ class NetworkUtils:
                         logging.info(f"Ping to {url}: {latency:.1f} ms")
                 except Exception as e:
                     logging.error(f"Error pinging {url}: {str(e)}")
+            # The session only serves the latency checks; the engines below
+            # open their own connections
+            session.close()
             
             # Calculate average ping
             if ping_results:
@@ -351,82 +1026,39 @@ class NetworkUtils:
             if progress_callback:
                 progress_callback(20, "Testing download speed...")
             
-            # Try multiple servers until one works
+            # Servers in order of preference; streams move to the next one
+            # when one fails and request a body again when it ends
             download_urls = [
-                "https://speed.cloudflare.com/__down?bytes=10000000",  # 10MB from Cloudflare
+                "https://speed.cloudflare.com/__down?bytes=100000000",  # 100MB from Cloudflare
                 "https://ftp.halifax.rwth-aachen.de/random/10MB.dat",  # 10MB from RWTH Aachen
                 "https://speed.hetzner.de/10MB.bin"  # 10MB from Hetzner
             ]
             
-            download_results = []
-            
-            def run_download_test(url, size_estimate=10000000):
-                try:
-                    logging.info(f"Download test: Starting download from {url}")
-                    start_time = time.time()
-                    
-                    try:
-                        response = session.get(url, stream=True, timeout=15)
-                    except Exception as e:
-                        logging.error(f"Error connecting to download server {url}: {str(e)}")
-                        return None
-                    
-                    if response.status_code != 200:
-                        logging.error(f"Download test failed: HTTP {response.status_code} from {url}")
-                        return None
-                    
-                    downloaded = 0
-                    download_start = time.time()  # Start time after connection established
-                    current_speed = 0
-                    
-                    try:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                downloaded += len(chunk)
-                                # Update real-time progress
-                                elapsed = time.time() - download_start
-                                if elapsed > 0:
-                                    current_speed = (downloaded * 8) / (elapsed * 1000000)  # Mbps
-                                    if progress_callback:
-                                        progress_callback(30, f"Download speed: {current_speed:.2f} Mbps")
-                                
-                                # If downloaded > 4MB, we have enough data for an accurate test
-                                if downloaded > 4 * 1024 * 1024:
-                                    break
-                    except Exception as e:
-                        logging.error(f"Error during download from {url}: {str(e)}")
-                        if downloaded < 1024 * 1024:  # Less than 1MB
-                            return None
-                    
-                    total_time = time.time() - download_start
-                    if total_time < 0.1 or downloaded < 100 * 1024:  # Too fast or too small
-                        logging.warning(f"Download from {url} was too small or too fast: {downloaded} bytes in {total_time:.2f}s")
-                        return None
-                        
-                    speed_mbps = (downloaded * 8) / (total_time * 1000000)  # Convert to Mbps
-                    logging.info(f"Download test completed: {speed_mbps:.2f} Mbps, {downloaded/1024/1024:.1f}MB in {total_time:.1f}s")
-                    return speed_mbps
-                except Exception as e:
-                    logging.error(f"Download test error with {url}: {str(e)}")
-                    return None
-            
-            # Try each download URL until we get a valid result
-            successful_download = False
-            for url in download_urls:
+            def on_download_progress(result):
                 if progress_callback:
-                    progress_callback(25, f"Testing download server...")
-                
-                result = run_download_test(url)
-                if result:
-                    download_results.append(result)
-                    successful_download = True
-                    break
+                    progress_callback(
+                        30, f"Download speed: {result.format_mbps()} ({len(result.streams)} streams)"
+                    )
+            
+            # Several concurrent streams, so one flow's window limit and slow
+            # start do not cap the result on fast links; the phase ends early
+            # once the rate after the warm-up is stable. run() registers the
+            # engine's stop() with the operation, so cancelling shuts down
+            # the sockets of streams blocked in a read
+            engine = DownloadEngine(download_urls, streams=streams, duration=self.SPEED_TEST_DURATION)
+            if series_callback:
+                series_callback("download", engine.series)
+            result = engine.run(operation, on_download_progress)
+            if result is not None and (result.elapsed < 0.1 or result.bytes < 100 * 1024):
+                logging.warning(f"Download was too small or too fast: {result.bytes} bytes in {result.elapsed:.2f}s")
+                result = None
             
             # Calculate final download speed
-            if download_results:
-                download_speed = sum(download_results) / len(download_results)
+            if result is not None:
+                download_speed = result.mbps
+                logging.info(f"Download test completed: {result.describe()}")
                 if progress_callback:
-                    progress_callback(50, f"Download speed: {download_speed:.2f} Mbps")
+                    progress_callback(50, f"Download speed: {result.format_mbps()}")
             else:
                 download_speed = None
                 if progress_callback:
@@ -438,74 +1070,49 @@ class NetworkUtils:
             if progress_callback:
                 progress_callback(60, "Testing upload speed...")
             
-            # Try multiple upload servers
+            # Servers in order of preference; streams move to the next one when one fails
             upload_urls = [
+                "https://speed.cloudflare.com/__up",
                 "https://httpbin.org/post",
                 "https://postman-echo.com/post"
             ]
             
-            upload_sizes = [2 * 1024 * 1024]  # 2MB - smaller for reliability
-            upload_results = []
-            
-            def run_upload_test(url, size):
-                try:
-                    # Generate random data
-                    logging.info(f"Upload test: Generating {size/1024/1024:.1f}MB of test data")
-                    data = ''.join(random.choices(string.ascii_letters + string.digits, k=size)).encode()
-                    
-                    logging.info(f"Upload test: Starting upload of {size/1024/1024:.1f}MB to {url}")
-                    start_time = time.time()
-                    
-                    try:
-                        response = session.post(
-                            url, 
-                            data=data,
-                            headers={'Content-Type': 'application/octet-stream'},
-                            timeout=15
-                        )
-                    except Exception as e:
-                        logging.error(f"Error connecting to upload server {url}: {str(e)}")
-                        return None
-                    
-                    if response.status_code >= 400:
-                        logging.error(f"Upload test failed: HTTP {response.status_code} from {url}")
-                        return None
-                    
-                    total_time = time.time() - start_time
-                    speed_mbps = (size * 8) / (total_time * 1000000)  # Convert to Mbps
-                    logging.info(f"Upload test completed: {speed_mbps:.2f} Mbps, {size/1024/1024:.1f}MB in {total_time:.1f}s")
-                    return speed_mbps
-                except Exception as e:
-                    logging.error(f"Upload test error with {url}: {str(e)}")
-                    return None
-            
-            # Try each upload URL until we get a valid result
-            successful_upload = False
-            for url in upload_urls:
+            def on_upload_progress(result):
                 if progress_callback:
-                    progress_callback(70, f"Testing upload server...")
-                
-                for size in upload_sizes:
-                    result = run_upload_test(url, size)
-                    if result:
-                        upload_results.append(result)
-                        successful_upload = True
-                        break
-                
-                if successful_upload:
-                    break
+                    progress_callback(
+                        75, f"Upload speed: {result.format_mbps()} ({len(result.streams)} streams)"
+                    )
+            
+            # The payload is generated once and streamed from memory, so only
+            # bytes actually written to the network are timed; as above,
+            # cancelling shuts down the sockets of streams blocked in a write
+            engine = UploadEngine(upload_urls, streams=streams, duration=self.SPEED_TEST_DURATION)
+            if series_callback:
+                series_callback("upload", engine.series)
+            result = engine.run(operation, on_upload_progress)
+            if result is not None and (result.elapsed < 0.1 or result.bytes < 100 * 1024):
+                logging.warning(f"Upload was too small or too fast: {result.bytes} bytes in {result.elapsed:.2f}s")
+                result = None
             
             # Calculate final upload speed
-            if upload_results:
-                upload_speed = sum(upload_results) / len(upload_results)
+            if result is not None:
+                upload_speed = result.mbps
+                logging.info(f"Upload test completed: {result.describe()}")
                 if progress_callback:
-                    progress_callback(90, f"Upload speed: {upload_speed:.2f} Mbps")
+                    progress_callback(90, f"Upload speed: {result.format_mbps()}")
             else:
                 upload_speed = None
                 if progress_callback:
                     progress_callback(90, "Unable to calculate upload speed")
                 logging.warning("Could not calculate upload speed - no successful tests")
             
+            if operation.cancelled:
+                message = "Speed test timed out" if operation.reason == "deadline" else "Speed test cancelled"
+                logging.warning(message)
+                if progress_callback:
+                    progress_callback(100, message)
+                return None, None, None
+            
             # Process complete results
             if progress_callback:
                 progress_callback(95, "Processing results...")
@@ -571,24 +1178,31 @@ class NetworkUtils:
             logging.error(f"Error checking internet connectivity: {str(e)}")
             return False
 
-    def analyze_ping_results(self, avg_latency, packet_loss):
+    def analyze_ping_results(self, avg_latency, packet_loss, jitter=None, p95_latency=None):
         """
         Analyze ping results and provide a quality assessment.
         
         Args:
             avg_latency: Average latency in ms
             packet_loss: Packet loss percentage
+            jitter: Optional RFC 3550 jitter in ms
+            p95_latency: Optional 95th percentile latency in ms
             
         Returns:
             Tuple of (quality_level, description, icon_name)
         """
         if packet_loss > 20:
             return "poor", "Network quality is poor! High packet loss indicates connection issues.", "poor_network.png"
+        
+        # A good average can hide unstable latency, so judge by the tail as well
+        unstable = (jitter is not None and jitter > 30) or (p95_latency is not None and p95_latency > 200)
             
-        if avg_latency < 50:
+        if avg_latency < 50 and not unstable:
             return "excellent", "Network quality is excellent (Low latency). Suitable for gaming, video calls, and streaming.", "excellent_network.png"
-        elif avg_latency < 100:
+        elif avg_latency < 100 and not unstable:
             return "good", "Network quality is good. Should support most online activities with minimal delay.", "good_network.png"
+        elif avg_latency < 100:
+            return "moderate", "Network quality is moderate! Latency is unstable (high jitter or latency spikes), so video calls and gaming may stutter.", "moderate_network.png"
         elif avg_latency < 200:
             return "moderate", "Network quality is moderate! Video calls and gaming may experience noticeable delay.", "moderate_network.png"
         else:
@@ -0,0 +1,411 @@
+import logging
+import os
+import select
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from .latency_series import LatencySeries
+from .scheduler import FixedRateScheduler
+
+# ICMP message types
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# Size of the payload carried by each echo request (same as the system ping)
+PAYLOAD_SIZE = 56
+
+# Linux value of IP_RECVTTL, which the socket module does not export
+IP_RECVTTL = getattr(socket, "IP_RECVTTL", 12)
+
+# Sequence numbers are 16 bits wide, so at most this many probes can be
+# outstanding on one socket before a sequence number would be reused.
+MAX_IN_FLIGHT = 60000
+
+_pack_address = struct.Struct("!I").pack
+
+
+def icmp_checksum(data):
+    """
+    Compute the RFC 1071 internet checksum of the given bytes.
+
+    Args:
+        data: Bytes to checksum
+
+    Returns:
+        16-bit checksum as an integer
+    """
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class PingSample:
+    """Result of a single echo request."""
+
+    __slots__ = ("target", "sequence", "sent_at", "rtt", "ttl")
+
+    def __init__(self, target, sequence, sent_at, rtt=None, ttl=None):
+        """
+        Initialize the sample.
+
+        Args:
+            target: IPv4 address the request was sent to
+            sequence: Probe number for this target, starting at 0
+            sent_at: Wall-clock time the request was sent (seconds since the epoch)
+            rtt: Round-trip time in ms, or None if the packet was lost
+            ttl: TTL of the reply, or None if unknown or lost
+        """
+        self.target = target
+        self.sequence = sequence
+        self.sent_at = sent_at
+        self.rtt = rtt
+        self.ttl = ttl
+
+    @property
+    def lost(self):
+        """True if no reply arrived for this request."""
+        return self.rtt is None
+
+    def __repr__(self):
+        return (f"PingSample(target={self.target!r}, sequence={self.sequence}, "
+                f"rtt={self.rtt}, ttl={self.ttl})")
+
+
+class AddressRange:
+    """
+    Consecutive IPv4 addresses, as a sequence of strings made on demand.
+
+    Lets a sweep hand a whole network to PingEngine.stream without creating
+    a string per address up front. The addresses are unique by construction,
+    so stream uses a range as it is instead of de-duplicating it.
+    """
+
+    __slots__ = ("first", "count")
+
+    def __init__(self, first, count):
+        """
+        Initialize the range.
+
+        Args:
+            first: First address as an integer
+            count: Number of addresses
+        """
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                raise ValueError("AddressRange slices must be contiguous")
+            return AddressRange(self.first + start, max(0, stop - start))
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("AddressRange index out of range")
+        return socket.inet_ntoa(_pack_address(self.first + index))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield socket.inet_ntoa(_pack_address(self.first + index))
+
+
+class PingEngine:
+    """
+    ICMP echo engine that multiplexes many targets over a single socket.
+
+    Every echo request is sent from one raw (or unprivileged datagram) ICMP
+    socket and replies are matched back to their probe by identifier and
+    sequence number, so thousands of requests to hundreds of targets can be
+    in flight at the same time.
+    """
+
+    def __init__(self, timeout=2):
+        """
+        Initialize the engine.
+
+        Args:
+            timeout: Seconds to wait for each echo reply before counting it as lost
+        """
+        self.timeout = timeout
+        self._identifier = (os.getpid() ^ id(self)) & 0xFFFF
+        self._sequence = 0
+        self._sock = None
+        self._raw = False
+
+    def _open_socket(self):
+        """Open the shared ICMP socket, preferring a raw socket."""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._raw = True
+        except PermissionError:
+            # Unprivileged ICMP sockets (Linux ping_group_range, macOS)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self._raw = False
+        sock.setblocking(False)
+        if not self._raw and sys.platform.startswith("linux"):
+            # Linux datagram sockets strip the IP header, so ask for the TTL
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, IP_RECVTTL, 1)
+            except OSError:
+                pass
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        except OSError:
+            pass
+        return sock
+
+    def open(self):
+        """
+        Open the shared socket now instead of on the first probe.
+
+        Raises:
+            PermissionError: If neither raw nor unprivileged ICMP sockets are allowed
+        """
+        if self._sock is None:
+            self._sock = self._open_socket()
+
+    def close(self):
+        """Close the shared socket."""
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _next_sequence(self):
+        """Return the next 16-bit sequence number."""
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        return self._sequence
+
+    def _build_packet(self, sequence):
+        """Build an ICMP echo request for the given sequence number."""
+        payload = struct.pack("!d", time.time()).ljust(PAYLOAD_SIZE, b'Q')
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self._identifier, sequence)
+        checksum = icmp_checksum(header + payload)
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, self._identifier, sequence)
+        return header + payload
+
+    def _parse_reply(self, data, ancillary=()):
+        """
+        Extract (identifier, sequence, ttl) from a received echo reply.
+
+        Args:
+            data: Received packet
+            ancillary: Ancillary data returned by recvmsg
+
+        Returns:
+            Tuple of (identifier, sequence, ttl) or None if the packet is not an echo reply
+        """
+        ttl = None
+        # Raw sockets (and datagram sockets on macOS) include the IP header
+        if data and data[0] >> 4 == 4:
+            ttl = data[8]
+            data = data[(data[0] & 0x0F) * 4:]
+        else:
+            for level, kind, value in ancillary:
+                if level == socket.IPPROTO_IP and kind in (IP_RECVTTL, socket.IP_TTL) and value:
+                    ttl = int.from_bytes(value[:4], sys.byteorder) if len(value) >= 4 else value[0]
+        if len(data) < 8:
+            return None
+        icmp_type, _code, _checksum, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        return identifier, sequence, ttl
+
+    def _send(self, packet, address):
+        """Send a packet, waiting briefly if the socket buffer is full."""
+        while True:
+            try:
+                self._sock.sendto(packet, (address, 0))
+                return True
+            except (BlockingIOError, InterruptedError):
+                select.select([], [self._sock], [], 0.05)
+            except OSError as e:
+                logging.error(f"Ping send error for {address}: {e}")
+                return False
+
+    def stream(self, targets, count=None, interval=1, token=None, rate_limiter=None):
+        """
+        Ping targets over the shared socket, yielding one record per probe.
+
+        Each round sends one echo request to every target. Rounds are sent at a
+        fixed rate on the monotonic clock while replies are collected
+        asynchronously, so a lost packet never delays the next round. Only
+        outstanding probes are kept in memory, so endless runs (count=None)
+        use constant memory; close the generator to stop them.
+
+        Args:
+            targets: Iterable of IPv4 address strings, or an AddressRange
+            count: Number of echo requests to send to each target, None for endless
+            interval: Time interval between rounds in seconds
+            token: Optional CancellationToken; the stream stops as soon as it fires
+            rate_limiter: Optional TokenBucket capping the packets sent per second
+
+        Yields:
+            PingSample for every probe, in the order replies arrive or time out
+        """
+        if not isinstance(targets, AddressRange):
+            targets = list(dict.fromkeys(targets))
+        if not targets or (count is not None and count <= 0):
+            return
+
+        self.open()
+
+        pending = {}        # sequence -> (target, round, send_time, send_wall_time)
+        deadlines = deque() # (deadline, sequence, send_time) in send order
+
+        round_index = 0
+        target_index = 0
+        schedule = FixedRateScheduler(interval)
+
+        def sending():
+            return count is None or round_index < count
+
+        def lost(sequence):
+            target, index, _sent, sent_wall = pending.pop(sequence)
+            return PingSample(target, index, sent_wall)
+
+        watched = [self._sock] if token is None else [self._sock, token]
+
+        while sending() or pending:
+            if token is not None and token.cancelled:
+                return
+            now = time.monotonic()
+
+            # Send every probe that is due, without waiting for replies
+            while sending() and schedule.is_due(now) and len(pending) < MAX_IN_FLIGHT:
+                if rate_limiter is not None and not rate_limiter.consume(now=now):
+                    break
+                target = targets[target_index]
+                sequence = self._next_sequence()
+                if sequence in pending:
+                    yield lost(sequence)
+                sent_wall = time.time()
+                sent_at = time.monotonic()
+                if self._send(self._build_packet(sequence), target):
+                    pending[sequence] = (target, round_index, sent_at, sent_wall)
+                    deadlines.append((sent_at + self.timeout, sequence, sent_at))
+                else:
+                    yield PingSample(target, round_index, sent_wall)
+
+                target_index += 1
+                if target_index == len(targets):
+                    target_index = 0
+                    round_index = schedule.advance()
+                now = time.monotonic()
+
+            # Expire probes whose reply never arrived
+            while deadlines and deadlines[0][0] <= now:
+                _deadline, sequence, sent_at = deadlines.popleft()
+                entry = pending.get(sequence)
+                if entry and entry[2] == sent_at:
+                    yield lost(sequence)
+
+            if not sending() and not pending:
+                break
+
+            # Sleep until the next send or expiry, waking early for replies;
+            # with MAX_IN_FLIGHT probes out only a reply or expiry frees a slot
+            wake = deadlines[0][0] if deadlines else now + self.timeout
+            if sending() and len(pending) < MAX_IN_FLIGHT:
+                due = schedule.next_due()
+                if rate_limiter is not None and due <= now:
+                    due = now + rate_limiter.time_until_available(now=now)
+                wake = min(wake, due)
+            readable, _, _ = select.select(watched, [], [], max(0, wake - now))
+            if self._sock not in readable:
+                continue
+
+            # Drain every reply that is already queued on the socket
+            while True:
+                try:
+                    if hasattr(self._sock, "recvmsg"):
+                        data, ancillary, _flags, address = self._sock.recvmsg(2048, 64)
+                    else:
+                        # Windows has no recvmsg; raw sockets carry the TTL anyway
+                        data, address = self._sock.recvfrom(2048)
+                        ancillary = ()
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:
+                    logging.error(f"Ping receive error: {e}")
+                    break
+                received_at = time.monotonic()
+                reply = self._parse_reply(data, ancillary)
+                if reply is None:
+                    continue
+                identifier, sequence, ttl = reply
+                # The kernel rewrites the identifier of unprivileged sockets
+                if self._raw and identifier != self._identifier:
+                    continue
+                entry = pending.get(sequence)
+                if entry is None or entry[0] != address[0]:
+                    continue
+                del pending[sequence]
+                target, index, sent_at, sent_wall = entry
+                yield PingSample(target, index, sent_wall, (received_at - sent_at) * 1000, ttl)
+
+    def ping_many(self, targets, count=1, interval=1, callback=None, token=None, rate_limiter=None):
+        """
+        Ping many IPv4 targets concurrently over the shared socket.
+
+        Args:
+            targets: Iterable of IPv4 address strings
+            count: Number of echo requests to send to each target
+            interval: Time interval between rounds in seconds
+            callback: Optional callback function to update progress
+            token: Optional CancellationToken; unfinished probes count as lost
+            rate_limiter: Optional TokenBucket capping the packets sent per second
+
+        Returns:
+            Dictionary mapping each target to (LatencySeries, packet_loss_percent)
+        """
+        targets = list(dict.fromkeys(targets))
+        samples = self.stream(targets, count, interval, token, rate_limiter)
+        return collect_samples(samples, targets, count, callback)
+
+
+def collect_samples(samples, targets, count, callback=None):
+    """
+    Gather a finite stream of PingSample records into per-target series.
+
+    Args:
+        samples: Iterable of PingSample, as produced by a probe engine's stream()
+        targets: List of targets the stream probes
+        count: Number of probes sent to each target
+        callback: Optional callback function to update progress
+
+    Returns:
+        Dictionary mapping each target to (LatencySeries, packet_loss_percent)
+    """
+    if not targets or count <= 0:
+        return {target: (LatencySeries(), 0.0) for target in targets}
+
+    results = {target: [None] * count for target in targets}
+    total = len(targets) * count
+    reported = -1
+    for completed, sample in enumerate(samples, 1):
+        results[sample.target][sample.sequence] = sample.rtt
+        percent = completed * 100 // total
+        if callback and percent != reported:
+            reported = percent
+            callback(percent)
+
+    if callback and reported != 100:
+        callback(100)
+
+    summary = {}
+    for target, latencies in results.items():
+        series = LatencySeries(latencies, capacity=count)
+        summary[target] = (series, series.packet_loss)
+    return summary
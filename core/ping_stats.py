@@ -0,0 +1,210 @@
+import math
+
+
+class RunningStats:
+    """Welford's online mean and variance, plus min and max."""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """Add a sample in O(1)."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def variance(self):
+        """Sample variance, or None with fewer than two samples."""
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+    @property
+    def stddev(self):
+        """Sample standard deviation, or None with fewer than two samples."""
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+
+class JitterEstimator:
+    """
+    RFC 3550 interarrival jitter.
+
+    For round-trip probes the transit-time difference D is the difference
+    between consecutive RTTs, and the estimate is smoothed with a gain of 1/16.
+    """
+
+    __slots__ = ("jitter", "_last")
+
+    def __init__(self):
+        self.jitter = 0.0
+        self._last = None
+
+    def add(self, rtt):
+        """Add an RTT in ms; lost packets should not be passed in."""
+        if self._last is not None:
+            self.jitter += (abs(rtt - self._last) - self.jitter) / 16
+        self._last = rtt
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate using the P-square algorithm (Jain & Chlamtac).
+
+    Keeps five markers regardless of the number of samples, so memory is
+    constant and every update is O(1).
+    """
+
+    __slots__ = ("quantile", "count", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, quantile):
+        """
+        Initialize the estimator.
+
+        Args:
+            quantile: Quantile to track, between 0 and 1 (e.g. 0.95)
+        """
+        self.quantile = quantile
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self._increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        """Add a sample in O(1)."""
+        self.count += 1
+        heights = self._heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        positions = self._positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            offset = self._desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1) or
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        q = self._heights
+        n = self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, step):
+        q = self._heights
+        n = self._positions
+        return q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+
+    @property
+    def value(self):
+        """Current quantile estimate, or None if no samples were added."""
+        if not self.count:
+            return None
+        if self.count <= 5:
+            # Exact for the first few samples
+            rank = (len(self._heights) - 1) * self.quantile
+            lower = math.floor(rank)
+            upper = min(lower + 1, len(self._heights) - 1)
+            return self._heights[lower] + (self._heights[upper] - self._heights[lower]) * (rank - lower)
+        return self._heights[2]
+
+
+class PingStatistics:
+    """
+    Incremental statistics for a ping run.
+
+    Every update is O(1) and uses constant memory, and ``snapshot()`` can be
+    called at any time during the run.
+    """
+
+    QUANTILES = (0.50, 0.95, 0.99)
+
+    def __init__(self):
+        self.sent = 0
+        self.lost = 0
+        self.latency = RunningStats()
+        self.jitter = JitterEstimator()
+        self.quantiles = {q: P2Quantile(q) for q in self.QUANTILES}
+
+    def add(self, rtt):
+        """
+        Record the result of one probe.
+
+        Args:
+            rtt: Round-trip time in ms, or None/NaN for a lost packet
+        """
+        self.sent += 1
+        if rtt is None or rtt != rtt:
+            self.lost += 1
+            return
+        self.latency.add(rtt)
+        self.jitter.add(rtt)
+        for estimator in self.quantiles.values():
+            estimator.add(rtt)
+
+    @property
+    def packet_loss(self):
+        """Packet loss as a percentage."""
+        return (self.lost / self.sent) * 100 if self.sent else 0.0
+
+    def snapshot(self):
+        """
+        Read the current statistics.
+
+        Returns:
+            Dictionary with avg/min/max/stddev/jitter/p50/p95/p99 latency in ms
+            (0 if nothing was received), the number of replies received and
+            packet_loss in percent
+        """
+        received = self.latency.count
+        return {
+            'received': received,
+            'avg_latency': self.latency.mean if received else 0,
+            'min_latency': self.latency.min if received else 0,
+            'max_latency': self.latency.max if received else 0,
+            'stddev_latency': self.latency.stddev or 0,
+            'jitter': self.jitter.jitter,
+            'p50_latency': self.quantiles[0.50].value or 0,
+            'p95_latency': self.quantiles[0.95].value or 0,
+            'p99_latency': self.quantiles[0.99].value or 0,
+            'packet_loss': self.packet_loss
+        }
@@ -0,0 +1,726 @@
+import argparse
+import logging
+import math
+import os
+import queue
+import signal
+import socket
+import struct
+import threading
+from .cancellation import CancellationToken
+from .ping_engine import AddressRange, PingEngine, PingSample, collect_samples
+from .scheduler import TokenBucket
+from .traceroute import PROTOCOLS, Hop, TraceEngine
+
+# Frame header: payload length, request ID, message type
+FRAME = struct.Struct("!IHB")
+
+# Client -> helper
+MSG_PING = 1     # PING_REQUEST followed by 4-byte IPv4 addresses
+MSG_TRACE = 2    # TRACE_REQUEST followed by one byte per TTL to probe (all if none)
+MSG_CANCEL = 3   # Empty; stops the request
+
+# Helper -> client
+MSG_SAMPLES = 0x81  # One or more SAMPLE records
+MSG_HOPS = 0x82     # One or more hop records, see _pack_hop
+MSG_ERROR = 0x8E    # UTF-8 message; ends the request
+MSG_DONE = 0x8F     # Empty; ends the request
+
+# count (0 = endless), interval, timeout, rate limit in packets/s (0 = none)
+PING_REQUEST = struct.Struct("!Ifff")
+# target, protocol index in PROTOCOLS, max hops, probes per hop, timeout, port (0 = default)
+TRACE_REQUEST = struct.Struct("!4sBBBfH")
+# target, round, send time (wall clock), RTT in ms (NaN if lost), reply TTL (0 if unknown)
+SAMPLE = struct.Struct("!4sIdfB")
+HOP_HEADER = struct.Struct("!BBB")     # TTL, probe count, HOP_REACHED flag
+HOP_REACHED = 1
+HOP_PROBE = struct.Struct("!4sfB")     # responder, RTT (NaN if lost), mark length
+
+# Limits protecting the helper from oversized requests
+MAX_PAYLOAD = 1024 * 1024
+MAX_REQUESTS_PER_CONNECTION = 64
+MAX_HOPS = 64
+MAX_PROBES = 10
+MAX_TIMEOUT = 30
+
+# Limits keeping any user who can reach the socket from flooding the network
+# with the helper's privileges: targets per ping request (the client splits
+# larger lists), the shortest interval between rounds, and packets per second
+# across all requests (pings and traces) of all front ends
+MAX_TARGETS = 4096
+MIN_INTERVAL = 0.2
+MAX_RATE = 1000
+
+# Requests in flight and front ends connected across the whole helper; every
+# request runs on a thread of its own
+MAX_REQUESTS = 256
+MAX_CONNECTIONS = 32
+
+NO_ADDRESS = b"\x00\x00\x00\x00"
+
+
+def default_socket_path():
+    """Return the helper socket path, overridable with NDT_PROBE_HELPER_SOCKET."""
+    return os.environ.get(
+        "NDT_PROBE_HELPER_SOCKET", "/run/network-diagnostic-tool/probe.sock"
+    )
+
+
+def _pack_sample(sample):
+    return SAMPLE.pack(
+        socket.inet_aton(sample.target), sample.sequence, sample.sent_at,
+        math.nan if sample.rtt is None else sample.rtt, sample.ttl or 0
+    )
+
+
+def _unpack_samples(payload):
+    samples = []
+    for address, sequence, sent_at, rtt, ttl in SAMPLE.iter_unpack(payload):
+        samples.append(PingSample(
+            socket.inet_ntoa(address), sequence, sent_at,
+            None if rtt != rtt else rtt, ttl or None
+        ))
+    return samples
+
+
+def _pack_hop(hop):
+    parts = [HOP_HEADER.pack(hop.ttl, len(hop.rtts), HOP_REACHED if hop.reached else 0)]
+    for address, rtt, mark in zip(hop.addresses, hop.rtts, hop.marks):
+        mark = (mark or "").encode("ascii")
+        parts.append(HOP_PROBE.pack(
+            socket.inet_aton(address) if address else NO_ADDRESS,
+            math.nan if rtt is None else rtt, len(mark)
+        ))
+        parts.append(mark)
+    return b"".join(parts)
+
+
+def _unpack_hops(payload):
+    hops = []
+    offset = 0
+    while offset < len(payload):
+        ttl, probes, flags = HOP_HEADER.unpack_from(payload, offset)
+        offset += HOP_HEADER.size
+        hop = Hop(ttl, probes)
+        hop.reached = bool(flags & HOP_REACHED)
+        for index in range(probes):
+            address, rtt, mark_length = HOP_PROBE.unpack_from(payload, offset)
+            offset += HOP_PROBE.size
+            if address != NO_ADDRESS:
+                hop.addresses[index] = socket.inet_ntoa(address)
+            if rtt == rtt:
+                hop.rtts[index] = float(rtt)
+            hop.marks[index] = payload[offset:offset + mark_length].decode("ascii")
+            offset += mark_length
+        hops.append(hop)
+    return hops
+
+
+def _reply_timeout(timeout):
+    """
+    Clamp a requested reply timeout to the helper's limits.
+
+    Raises:
+        ValueError: If the timeout is NaN or infinite, which would keep
+            probes pending forever
+    """
+    if not math.isfinite(timeout):
+        raise ValueError(f"Invalid timeout {timeout}")
+    return min(max(timeout, 0.01), MAX_TIMEOUT)
+
+
+def _take(limiter, packets, token):
+    """
+    Take tokens for a number of packets from a TokenBucket, waiting as needed.
+
+    Returns:
+        False if the token was cancelled before every token was taken
+    """
+    while packets > 0:
+        tokens = min(packets, limiter.capacity)
+        if limiter.consume(tokens):
+            packets -= tokens
+        elif token.wait(limiter.time_until_available(tokens)):
+            return False
+    return True
+
+
+def _read_exactly(sock, size):
+    """Read size bytes from a socket, or return None if it is closed first."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return bytes(buffer)
+
+
+def _read_frame(sock):
+    """Read one frame; return (request_id, message_type, payload) or None at EOF."""
+    header = _read_exactly(sock, FRAME.size)
+    if header is None:
+        return None
+    length, request_id, message_type = FRAME.unpack(header)
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"Frame of {length} bytes exceeds the limit")
+    payload = _read_exactly(sock, length) if length else b""
+    if payload is None:
+        return None
+    return request_id, message_type, payload
+
+
+class _FrameWriter:
+    """
+    Writes frames from many threads through one socket.
+
+    Frames are queued and written by a single thread; frames of the same
+    request and type that are queued together are merged into one, so a
+    burst of results costs one frame and one system call.
+    """
+
+    def __init__(self, sock, mergeable):
+        self._sock = sock
+        self._mergeable = mergeable
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, request_id, message_type, payload=b""):
+        self._queue.put((request_id, message_type, payload))
+
+    def close(self):
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frames = [item]
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                last = frames[-1]
+                if item[:2] == last[:2] and item[1] in self._mergeable:
+                    frames[-1] = (last[0], last[1], last[2] + item[2])
+                else:
+                    frames.append(item)
+            data = b"".join(
+                FRAME.pack(len(payload), request_id, message_type) + payload
+                for request_id, message_type, payload in frames
+            )
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                return
+
+
+class _RequestLimiter:
+    """
+    TokenBucket interface enforcing a request's own rate and the helper-wide one.
+
+    Only the request's thread uses its own bucket, so checking it before
+    taking from the shared bucket cannot race.
+    """
+
+    def __init__(self, rate, shared):
+        self.rate = rate
+        self._own = TokenBucket(rate)
+        self._shared = shared
+
+    def consume(self, tokens=1, now=None):
+        if self._own.time_until_available(tokens, now) > 0:
+            return False
+        if not self._shared.consume(tokens, now):
+            return False
+        return self._own.consume(tokens, now)
+
+    def time_until_available(self, tokens=1, now=None):
+        return max(self._own.time_until_available(tokens, now),
+                   self._shared.time_until_available(tokens, now))
+
+
+class _HelperConnection:
+    """One front end connected to the helper."""
+
+    def __init__(self, sock, limiter, slots):
+        self.sock = sock
+        self.limiter = limiter  # TokenBucket shared by every connection
+        self.slots = slots      # Semaphore bounding the requests of every connection
+        self.writer = _FrameWriter(sock, (MSG_SAMPLES, MSG_HOPS))
+        self.requests = {}  # request ID -> CancellationToken
+        self.lock = threading.Lock()
+
+    def serve(self):
+        """Read requests until the client disconnects."""
+        try:
+            while True:
+                frame = _read_frame(self.sock)
+                if frame is None:
+                    break
+                request_id, message_type, payload = frame
+                if message_type == MSG_CANCEL:
+                    with self.lock:
+                        token = self.requests.get(request_id)
+                    if token is not None:
+                        token.cancel()
+                    continue
+                self._start(request_id, message_type, payload)
+        except (OSError, ValueError) as e:
+            logging.error(f"Probe helper connection error: {e}")
+        finally:
+            with self.lock:
+                tokens = list(self.requests.values())
+            for token in tokens:
+                token.cancel()
+            self.writer.close()
+            self.sock.close()
+
+    def _start(self, request_id, message_type, payload):
+        handlers = {MSG_PING: self._ping, MSG_TRACE: self._trace}
+        handler = handlers.get(message_type)
+        with self.lock:
+            if handler is None:
+                error = f"Unknown message type {message_type}"
+            elif request_id in self.requests:
+                error = f"Request {request_id} is already running"
+            elif len(self.requests) >= MAX_REQUESTS_PER_CONNECTION:
+                error = "Too many requests in flight"
+            elif not self.slots.acquire(blocking=False):
+                error = "Too many requests in flight on the helper"
+            else:
+                error = None
+                token = self.requests[request_id] = CancellationToken()
+        if error:
+            self.writer.send(request_id, MSG_ERROR, error.encode())
+            return
+        threading.Thread(
+            target=self._run, args=(request_id, handler, payload, token), daemon=True
+        ).start()
+
+    def _run(self, request_id, handler, payload, token):
+        try:
+            handler(request_id, payload, token)
+            self.writer.send(request_id, MSG_DONE)
+        except Exception as e:
+            self.writer.send(request_id, MSG_ERROR, f"{type(e).__name__}: {e}".encode())
+        finally:
+            with self.lock:
+                self.requests.pop(request_id, None)
+            self.slots.release()
+            token.close()
+
+    def _ping(self, request_id, payload, token):
+        count, interval, timeout, rate = PING_REQUEST.unpack_from(payload)
+        addresses = payload[PING_REQUEST.size:]
+        if len(addresses) % 4:
+            raise ValueError("Malformed ping request")
+        if len(addresses) > MAX_TARGETS * 4:
+            raise ValueError(f"More than {MAX_TARGETS} targets in one request")
+        targets = [socket.inet_ntoa(addresses[i:i + 4]) for i in range(0, len(addresses), 4)]
+        if not math.isfinite(interval):
+            raise ValueError(f"Invalid interval {interval}")
+        limiter = _RequestLimiter(min(rate, MAX_RATE) if rate > 0 else MAX_RATE, self.limiter)
+        interval = max(interval, MIN_INTERVAL)
+        engine = PingEngine(timeout=_reply_timeout(timeout))
+        try:
+            for sample in engine.stream(targets, count or None, interval, token, limiter):
+                self.writer.send(request_id, MSG_SAMPLES, _pack_sample(sample))
+        finally:
+            engine.close()
+
+    def _trace(self, request_id, payload, token):
+        address, protocol, max_hops, probes, timeout, port = TRACE_REQUEST.unpack_from(payload)
+        if protocol >= len(PROTOCOLS) or not 1 <= max_hops <= MAX_HOPS or not 1 <= probes <= MAX_PROBES:
+            raise ValueError("Malformed trace request")
+        ttls = payload[TRACE_REQUEST.size:] or None
+        timeout = _reply_timeout(timeout)
+        # A trace sends each round back to back, so its probes are charged to
+        # the helper-wide rate before it starts
+        probed = len(set(ttls) & set(range(1, max_hops + 1))) if ttls else max_hops
+        if not _take(self.limiter, probed * probes, token):
+            return
+        engine = TraceEngine(
+            PROTOCOLS[protocol], timeout, port or None, probes
+        )
+        with engine:
+            engine.trace(
+                socket.inet_ntoa(address), max_hops,
+                lambda hop: self.writer.send(request_id, MSG_HOPS, _pack_hop(hop)),
+                token, ttls and set(ttls)
+            )
+
+
+class ProbeHelper:
+    """
+    Privileged probe helper.
+
+    A long-lived process holding raw-socket privileges (root or
+    CAP_NET_RAW) that runs the ping and traceroute engines for unprivileged
+    front ends, so they neither need privileges nor spawn a traceroute per
+    trace. Front ends connect over a Unix socket; every message is a frame
+    of ``!IHB`` (payload length, request ID, message type) followed by its
+    payload. A connection may have many requests in flight, results are
+    streamed back as they arrive, and results of one request that are ready
+    together are merged into one frame. Pings and traces are paced to at
+    most MAX_RATE packets per second across all front ends, and at most
+    MAX_CONNECTIONS front ends and MAX_REQUESTS requests are served at once.
+    Run it with::
+
+        python -m core.probe_helper --socket /run/network-diagnostic-tool/probe.sock --group netdiag
+    """
+
+    def __init__(self, path=None, mode=0o660, group=None):
+        """
+        Create the listening socket.
+
+        Args:
+            path: Socket path, defaults to default_socket_path()
+            mode: Permissions of the socket file, which decide who may probe
+            group: Optional group name or ID owning the socket file, so only
+                its members may probe
+
+        Raises:
+            OSError: If the socket cannot be created or another helper is running
+        """
+        self.path = path or default_socket_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            # Remove the socket of a helper that did not shut down cleanly
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"A probe helper is already listening on {self.path}")
+            finally:
+                probe.close()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket file is created with the final permissions, so it is
+        # never reachable with the default umask's
+        umask = os.umask(0o777 & ~mode)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        if group is not None:
+            import grp
+            gid = group if isinstance(group, int) else grp.getgrnam(group).gr_gid
+            os.chown(self.path, -1, gid)
+        self._limiter = TokenBucket(MAX_RATE)
+        self._request_slots = threading.BoundedSemaphore(MAX_REQUESTS)
+        self._connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+        self._sock.listen(16)
+
+    def serve_forever(self):
+        """Accept front ends until close() is called, one thread per connection."""
+        while True:
+            try:
+                sock, _address = self._sock.accept()
+            except OSError:
+                return
+            if not self._connection_slots.acquire(blocking=False):
+                logging.error("Probe helper: too many front ends connected, refusing one")
+                sock.close()
+                continue
+            connection = _HelperConnection(sock, self._limiter, self._request_slots)
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        try:
+            connection.serve()
+        finally:
+            self._connection_slots.release()
+
+    def close(self):
+        """Stop accepting connections and remove the socket file."""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ProbeHelperClient:
+    """
+    Connection from a front end to the probe helper.
+
+    Thread-safe: any number of pings and traces can run at once over the
+    same connection.
+    """
+
+    def __init__(self, path=None, timeout=2):
+        """
+        Connect to the helper.
+
+        Args:
+            path: Socket path, defaults to default_socket_path()
+            timeout: Seconds to wait for the connection
+
+        Raises:
+            OSError: If no helper is listening
+        """
+        self.path = path or default_socket_path()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.settimeout(timeout)
+            self._sock.connect(self.path)
+            self._sock.settimeout(None)
+        except OSError:
+            self._sock.close()
+            raise
+        self._writer = _FrameWriter(self._sock, ())
+        self._requests = {}  # request ID -> queue of results
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.closed = False
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def close(self):
+        """Close the connection; running requests end with an error."""
+        self.closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._writer.close()
+
+    def _read(self):
+        """Dispatch result frames to the queues of their requests."""
+        try:
+            while True:
+                frame = _read_frame(self._sock)
+                if frame is None:
+                    break
+                request_id, message_type, payload = frame
+                with self._lock:
+                    results = self._requests.get(request_id)
+                if results is None:
+                    continue  # A cancelled request still finishing
+                if message_type == MSG_SAMPLES:
+                    results.put(_unpack_samples(payload))
+                elif message_type == MSG_HOPS:
+                    results.put(_unpack_hops(payload))
+                elif message_type == MSG_ERROR:
+                    results.put(OSError(payload.decode(errors="replace")))
+                else:
+                    results.put(None)
+        except (OSError, ValueError) as e:
+            if not self.closed:
+                logging.error(f"Probe helper connection error: {e}")
+        finally:
+            self.closed = True
+            self._sock.close()
+            with self._lock:
+                pending = list(self._requests.values())
+            for results in pending:
+                results.put(OSError("Probe helper connection closed"))
+
+    def _request(self, message_type, payload, token=None):
+        """
+        Send a request and yield its results as they arrive.
+
+        Closing the generator or cancelling the token cancels the request.
+
+        Yields:
+            Lists of decoded results (PingSample or Hop)
+
+        Raises:
+            OSError: If the helper reports an error or the connection fails
+        """
+        if self.closed:
+            raise OSError("Probe helper connection closed")
+        results = queue.Queue()
+        with self._lock:
+            request_id = self._next_id
+            while request_id in self._requests:
+                request_id = (request_id + 1) & 0xFFFF
+            self._next_id = (request_id + 1) & 0xFFFF
+            self._requests[request_id] = results
+        relay = token.register(lambda: results.put(token)) if token is not None else None
+        finished = False
+        try:
+            self._writer.send(request_id, message_type, payload)
+            while True:
+                item = results.get()
+                if item is None:
+                    finished = True
+                    return
+                if item is token:
+                    return
+                if isinstance(item, Exception):
+                    finished = True
+                    raise item
+                yield item
+        finally:
+            if relay is not None:
+                token.unregister(relay)
+            with self._lock:
+                self._requests.pop(request_id, None)
+            if not finished and not self.closed:
+                self._writer.send(request_id, MSG_CANCEL)
+
+    def stream_ping(self, targets, count=None, interval=1, timeout=2, token=None, rate=0):
+        """
+        Ping targets through the helper, like PingEngine.stream.
+
+        Args:
+            targets: Iterable of IPv4 address strings, or an AddressRange
+            count: Number of echo requests per target, None for endless
+            interval: Time interval between rounds in seconds
+            timeout: Seconds to wait for each reply
+            token: Optional CancellationToken to stop the run
+            rate: Optional cap on packets per second
+
+        The helper enforces MIN_INTERVAL and MAX_RATE. Target lists longer
+        than MAX_TARGETS are pinged as consecutive requests.
+
+        Yields:
+            PingSample for every probe
+
+        Raises:
+            ValueError: If an endless run has more than MAX_TARGETS targets
+        """
+        if not isinstance(targets, AddressRange):
+            targets = list(dict.fromkeys(targets))
+        if not targets or (count is not None and count <= 0):
+            return
+        if count is None and len(targets) > MAX_TARGETS:
+            raise ValueError(f"An endless ping through the helper takes at most {MAX_TARGETS} targets")
+        for first in range(0, len(targets), MAX_TARGETS):
+            if token is not None and token.cancelled:
+                return
+            payload = PING_REQUEST.pack(count or 0, interval, timeout, rate or 0)
+            payload += b"".join(socket.inet_aton(target) for target in targets[first:first + MAX_TARGETS])
+            for samples in self._request(MSG_PING, payload, token):
+                yield from samples
+
+    def trace(self, target, max_hops=30, callback=None, token=None, ttls=None,
+              protocol="udp", timeout=2, port=None, probes=3):
+        """
+        Trace a route through the helper, like TraceEngine.trace.
+
+        Args:
+            target: IPv4 address to trace
+            max_hops: Highest TTL probed
+            callback: Optional function called with each Hop in TTL order
+            token: Optional CancellationToken to stop the trace
+            ttls: Optional collection of TTLs to probe
+            protocol: "udp", "icmp" or "tcp"
+            timeout: Seconds to wait for replies after the last probe
+            port: Destination port for UDP and TCP probes
+            probes: Number of probes sent per TTL
+
+        Returns:
+            List of the probed Hop objects up to and including the destination
+        """
+        payload = TRACE_REQUEST.pack(
+            socket.inet_aton(target), PROTOCOLS.index(protocol), min(max_hops, MAX_HOPS),
+            probes, timeout, port or 0
+        )
+        if ttls is not None:
+            payload += bytes(sorted(ttl for ttl in set(ttls) if 1 <= ttl <= MAX_HOPS))
+        hops = []
+        for batch in self._request(MSG_TRACE, payload, token):
+            for hop in batch:
+                hops.append(hop)
+                if callback:
+                    callback(hop)
+        return hops
+
+    def ping_engine(self, timeout=2):
+        """Return an object with PingEngine's interface that probes through the helper."""
+        return HelperPingEngine(self, timeout)
+
+    def trace_engine(self, protocol="udp", timeout=2, port=None, probes=3):
+        """Return an object with TraceEngine's interface that probes through the helper."""
+        return HelperTraceEngine(self, protocol, timeout, port, probes)
+
+
+class HelperPingEngine:
+    """PingEngine stand-in that sends its probes through the helper."""
+
+    def __init__(self, client, timeout=2):
+        self.client = client
+        self.timeout = timeout
+
+    def close(self):
+        """Nothing to release; the helper connection is shared."""
+
+    def stream(self, targets, count=None, interval=1, token=None, rate_limiter=None):
+        """See PingEngine.stream; the rate limiter's rate is enforced by the helper."""
+        rate = rate_limiter.rate if rate_limiter is not None else 0
+        return self.client.stream_ping(targets, count, interval, self.timeout, token, rate)
+
+    def ping_many(self, targets, count=1, interval=1, callback=None, token=None, rate_limiter=None):
+        """See PingEngine.ping_many."""
+        targets = list(dict.fromkeys(targets))
+        samples = self.stream(targets, count, interval, token, rate_limiter)
+        return collect_samples(samples, targets, count, callback)
+
+
+class HelperTraceEngine:
+    """TraceEngine stand-in that sends its probes through the helper."""
+
+    def __init__(self, client, protocol="udp", timeout=2, port=None, probes=3):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol {protocol}")
+        self.client = client
+        self.protocol = protocol
+        self.timeout = timeout
+        self.port = port
+        self.probes = probes
+
+    def close(self):
+        """Nothing to release; the helper connection is shared."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def trace(self, target, max_hops=30, callback=None, token=None, ttls=None):
+        """See TraceEngine.trace."""
+        return self.client.trace(
+            target, max_hops, callback, token, ttls,
+            self.protocol, self.timeout, self.port, self.probes
+        )
+
+
+def main(argv=None):
+    """Run the helper until interrupted."""
+    parser = argparse.ArgumentParser(description="Privileged probe helper for the Network Diagnostic Tool")
+    parser.add_argument("--socket", default=default_socket_path(), help="Unix socket to listen on")
+    parser.add_argument("--mode", default="660", help="Octal permissions of the socket (default 660)")
+    parser.add_argument("--group", help="Group owning the socket; its members may probe")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    group = int(args.group) if args.group and args.group.isdigit() else args.group
+    helper = ProbeHelper(args.socket, int(args.mode, 8), group)
+    logging.info(f"Probe helper listening on {helper.path}")
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: helper.close())
+    try:
+        helper.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        helper.close()
+
+
+if __name__ == "__main__":
+    main()
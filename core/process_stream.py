@@ -0,0 +1,290 @@
+import locale
+import logging
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import time
+from .cancellation import Deadline
+
+# Bytes read from a pipe per readiness event
+READ_SIZE = 64 * 1024
+
+
+class ProcessStream:
+    """
+    Subprocess whose stdout and stderr are read without blocking.
+
+    Both pipes are non-blocking and multiplexed with a selector, so a
+    silent process never blocks the reader, a full stderr pipe can never
+    deadlock it, and cancellation or a deadline kills the whole process
+    group at once. Lines are delivered in batches to keep per-line overhead
+    (for example UI updates) low. Several streams can share one selector
+    and one thread through ``stream_processes``.
+    """
+
+    def __init__(self, command, deadline=None, token=None, batch_interval=0.1, encoding=None):
+        """
+        Start the process.
+
+        Args:
+            command: Command line as a list of arguments
+            deadline: Optional wall-clock budget in seconds
+            token: Optional CancellationToken that kills the process
+            batch_interval: Seconds lines are held back to be delivered together
+            encoding: Output encoding, defaults to the locale's
+
+        Raises:
+            OSError: If the process cannot be started
+        """
+        self.command = command
+        self.deadline = Deadline(deadline)
+        self.token = token
+        self.batch_interval = batch_interval
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.reason = None      # "deadline" or "cancelled" if the process was killed
+        self.stderr_lines = []  # Every stderr line, for error reporting
+
+        if sys.platform == "win32":
+            # Own process group, so the whole tree can be signalled
+            options = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            options = {'start_new_session': True}
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **options
+        )
+        self._buffers = {self.process.stdout: b'', self.process.stderr: b''}
+        self._names = {self.process.stdout: "stdout", self.process.stderr: "stderr"}
+        self._batch = []
+        self._batch_started = None
+        if token is not None:
+            token.register(self._kill_on_cancel)
+
+    @property
+    def returncode(self):
+        """Exit status once the process has finished, otherwise None."""
+        return self.process.returncode
+
+    @property
+    def stderr(self):
+        """Everything the process wrote to stderr so far."""
+        return "\n".join(self.stderr_lines)
+
+    @property
+    def finished(self):
+        """True once both pipes are closed."""
+        return not self._buffers
+
+    def _kill_on_cancel(self):
+        self.kill("cancelled")
+
+    def kill(self, reason="cancelled"):
+        """
+        Kill the process and everything it started.
+
+        Args:
+            reason: Recorded in ``self.reason``
+        """
+        if self.process.poll() is not None:
+            return
+        if self.reason is None:
+            self.reason = reason
+        try:
+            if sys.platform == "win32":
+                self.process.kill()
+            else:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def register(self, selector):
+        """Register both pipes with a selector, in non-blocking mode."""
+        for pipe in self._buffers:
+            os.set_blocking(pipe.fileno(), False)
+            selector.register(pipe, selectors.EVENT_READ, self)
+
+    def read(self, pipe, selector):
+        """
+        Read whatever is available on a pipe that the selector reported ready.
+
+        Complete lines are added to the current batch; a closed pipe is
+        unregistered and its unterminated last line flushed.
+        """
+        try:
+            data = os.read(pipe.fileno(), READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            logging.error(f"Error reading from {self.command[0]}: {e}")
+            data = b''
+
+        if not data:
+            selector.unregister(pipe)
+            rest = self._buffers.pop(pipe)
+            pipe.close()
+            if rest:
+                self._add_line(pipe, rest)
+            return
+
+        buffer = self._buffers[pipe] + data
+        *lines, self._buffers[pipe] = buffer.split(b'\n')
+        for line in lines:
+            self._add_line(pipe, line)
+
+    def _add_line(self, pipe, raw):
+        line = raw.rstrip(b'\r').decode(self.encoding, errors="replace")
+        name = self._names[pipe]
+        if name == "stderr":
+            self.stderr_lines.append(line)
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append((name, line))
+
+    def batch_due(self, now):
+        """Return the time the pending batch should be delivered, or None."""
+        if not self._batch:
+            return None
+        return self._batch_started + self.batch_interval
+
+    def take_batch(self):
+        """Remove and return the pending lines as a list of (stream, line)."""
+        batch, self._batch = self._batch, []
+        return batch
+
+    def wait(self):
+        """Reap the process once its pipes are closed and return its exit status."""
+        if self.token is not None:
+            self.token.unregister(self._kill_on_cancel)
+        return self.process.wait()
+
+    def batches(self):
+        """
+        Read the process to completion.
+
+        Yields:
+            Lists of (stream, line) tuples, where stream is "stdout" or "stderr"
+        """
+        for _stream, batch in stream_processes([self]):
+            yield batch
+
+
+def stream_processes(streams, token=None):
+    """
+    Read many ProcessStreams from one thread with a single selector.
+
+    Args:
+        streams: Iterable of ProcessStream
+        token: Optional CancellationToken that also wakes the selector
+
+    Yields:
+        Tuples of (stream, batch) where batch is a list of (stream_name, line)
+    """
+    streams = list(streams)
+    if sys.platform == "win32":
+        # Windows cannot select() on pipes
+        yield from _stream_processes_blocking(streams)
+        return
+
+    selector = selectors.DefaultSelector()
+    tokens = {stream.token for stream in streams if stream.token is not None}
+    if token is not None:
+        tokens.add(token)
+    try:
+        for stream in streams:
+            stream.register(selector)
+        for waker in tokens:
+            selector.register(waker, selectors.EVENT_READ, None)
+
+        active = list(streams)
+        while active:
+            now = time.monotonic()
+
+            # Enforce deadlines
+            for stream in active:
+                if stream.deadline.expired:
+                    stream.kill("deadline")
+
+            # Deliver batches that have waited long enough, and sleep until
+            # the next batch or deadline is due
+            wakes = []
+            for stream in active:
+                due = stream.batch_due(now)
+                if due is not None and due <= now:
+                    yield stream, stream.take_batch()
+                elif due is not None:
+                    wakes.append(due)
+                if stream.deadline.expires_at is not None and stream.reason is None:
+                    wakes.append(stream.deadline.expires_at)
+
+            timeout = max(0, min(wakes) - time.monotonic()) if wakes else None
+            for key, _events in selector.select(timeout):
+                if key.data is None:
+                    # A token fired; kill its processes, their pipes close next
+                    selector.unregister(key.fileobj)
+                    for stream in active:
+                        if key.fileobj is token or stream.token is key.fileobj:
+                            stream.kill("cancelled")
+                    continue
+                key.data.read(key.fileobj, selector)
+
+            # Flush and reap finished processes
+            for stream in [stream for stream in active if stream.finished]:
+                active.remove(stream)
+                stream.wait()
+                batch = stream.take_batch()
+                if batch:
+                    yield stream, batch
+    finally:
+        for stream in streams:
+            stream.kill("cancelled")
+        selector.close()
+
+
+def _stream_processes_blocking(streams):
+    """Fallback for Windows: one reader thread per pipe feeding a queue."""
+    import queue
+    import threading
+
+    lines = queue.Queue()
+
+    def pump(stream, pipe):
+        for raw in iter(pipe.readline, b''):
+            lines.put((stream, pipe, raw.rstrip(b'\n')))
+        lines.put((stream, pipe, None))
+
+    open_pipes = 0
+    for stream in streams:
+        for pipe in list(stream._buffers):
+            threading.Thread(target=pump, args=(stream, pipe), daemon=True).start()
+            open_pipes += 1
+
+    try:
+        while open_pipes:
+            try:
+                stream, pipe, raw = lines.get(timeout=0.05)
+            except queue.Empty:
+                pass
+            else:
+                if raw is None:
+                    open_pipes -= 1
+                    stream._buffers.pop(pipe, None)
+                else:
+                    stream._add_line(pipe, raw)
+
+            now = time.monotonic()
+            for candidate in streams:
+                if candidate.deadline.expired:
+                    candidate.kill("deadline")
+                due = candidate.batch_due(now)
+                if due is not None and (due <= now or candidate.finished):
+                    yield candidate, candidate.take_batch()
+        for stream in streams:
+            stream.wait()
+    finally:
+        for stream in streams:
+            stream.kill("cancelled")
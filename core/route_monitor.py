@@ -0,0 +1,159 @@
+import time
+from collections import deque
+from .ping_stats import RunningStats
+from .scheduler import FixedRateScheduler
+from .traceroute import TraceEngine
+
+# Route changes kept for display; older ones are dropped
+MAX_ROUTE_CHANGES = 100
+
+
+class HopStats:
+    """Running loss and latency statistics of one hop, in constant memory."""
+
+    __slots__ = ("ttl", "address", "sent", "lost", "last", "rtt")
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.address = None
+        self.sent = 0
+        self.lost = 0
+        self.last = None
+        self.rtt = RunningStats()
+
+    def add(self, address, rtt):
+        """
+        Record one probe.
+
+        Args:
+            address: Responder address, or None if the probe was lost
+            rtt: Round-trip time in ms, or None if the probe was lost
+        """
+        self.sent += 1
+        if rtt is None:
+            self.lost += 1
+            return
+        self.address = address
+        self.last = rtt
+        self.rtt.add(rtt)
+
+    @property
+    def loss(self):
+        """Percentage of probes lost at this hop."""
+        return (self.lost / self.sent) * 100 if self.sent else 0.0
+
+    def row(self):
+        """
+        Snapshot the statistics for display.
+
+        Returns:
+            Tuple of (ttl, address, loss, sent, last, avg, best, worst, stddev);
+            latency fields are None until the hop has answered
+        """
+        answered = self.rtt.count > 0
+        return (
+            self.ttl,
+            self.address,
+            self.loss,
+            self.sent,
+            self.last,
+            self.rtt.mean if answered else None,
+            self.rtt.min if answered else None,
+            self.rtt.max if answered else None,
+            self.rtt.stddev,
+        )
+
+
+class RouteMonitor:
+    """
+    MTR-style continuous traceroute.
+
+    Every round sends one probe to every TTL with the in-process trace
+    engine, at a fixed rate, and folds the answers into per-hop running
+    statistics. A responder that differs from the one last seen at the same
+    TTL is recorded as a route change.
+    """
+
+    def __init__(self, target, max_hops=30, protocol="udp", interval=1, timeout=2, engine_factory=None):
+        """
+        Initialize the monitor.
+
+        Args:
+            target: IPv4 address to monitor
+            max_hops: Highest TTL probed
+            protocol: Probe protocol, "udp", "icmp" or "tcp"
+            interval: Seconds between rounds
+            timeout: Seconds to wait for the replies of a round
+            engine_factory: Optional function returning a TraceEngine-like
+                object for (protocol, timeout, probes=...), defaults to TraceEngine
+        """
+        self.target = target
+        self.max_hops = max_hops
+        self.protocol = protocol
+        self.interval = interval
+        self.timeout = timeout
+        self.engine_factory = engine_factory or TraceEngine
+        self.hops = [HopStats(ttl) for ttl in range(1, max_hops + 1)]
+        self.depth = 0  # Hops up to the destination in the last round
+        self.rounds = 0
+        self.changes = deque(maxlen=MAX_ROUTE_CHANGES)
+
+    def add_round(self, hops):
+        """
+        Fold the result of one trace round into the statistics.
+
+        Args:
+            hops: List of Hop objects with one probe each, from TraceEngine.trace
+
+        Returns:
+            List of route changes in this round as (time, ttl, old_address, new_address)
+        """
+        changes = []
+        now = time.time()
+        for hop in hops:
+            stats = self.hops[hop.ttl - 1]
+            address = hop.addresses[0]
+            if address and stats.address and address != stats.address:
+                changes.append((now, hop.ttl, stats.address, address))
+            stats.add(address, hop.rtts[0])
+        self.depth = len(hops)
+        self.rounds += 1
+        self.changes.extend(changes)
+        return changes
+
+    def rows(self):
+        """Snapshot the per-hop statistics up to the destination, for display."""
+        return [stats.row() for stats in self.hops[:self.depth]]
+
+    def run(self, callback=None, token=None):
+        """
+        Probe the route until the token is cancelled.
+
+        Args:
+            callback: Optional function called after every round with
+                (monitor, changes)
+            token: CancellationToken that stops the monitor
+
+        Raises:
+            PermissionError: If raw sockets are not available
+        """
+        timeout = min(self.timeout, max(self.interval, 0.1))
+        with self.engine_factory(self.protocol, timeout, probes=1) as engine:
+            schedule = FixedRateScheduler(self.interval)
+            while token is None or not token.cancelled:
+                hops = engine.trace(self.target, self.max_hops, token=token)
+                if token is not None and token.cancelled:
+                    break
+                changes = self.add_round(hops)
+                if callback:
+                    callback(self, changes)
+
+                # A round that overran its slot skips the missed ones
+                # instead of firing them back to back
+                now = time.monotonic()
+                while schedule.is_due(now):
+                    schedule.advance()
+                if token is not None:
+                    token.wait(schedule.time_until_due())
+                else:
+                    time.sleep(schedule.time_until_due())
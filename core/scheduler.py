@@ -0,0 +1,98 @@
+import threading
+import time
+
+
+class FixedRateScheduler:
+    """
+    Fixed-rate send schedule on the monotonic clock.
+
+    Slot ``n`` is due at ``start + n * interval``. Due times are computed from
+    the start instead of being accumulated after each send, so the real send
+    rate never drifts from the configured one, however long replies take.
+    """
+
+    def __init__(self, interval, start=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            interval: Seconds between consecutive slots (may be well below 100 ms)
+            start: Monotonic time of the first slot, defaults to now
+        """
+        self.interval = max(0.0, float(interval))
+        self.start = time.monotonic() if start is None else start
+        self.index = 0
+
+    def next_due(self):
+        """Return the monotonic time at which the next slot is due."""
+        return self.start + self.index * self.interval
+
+    def is_due(self, now=None):
+        """Check whether the next slot is due."""
+        if now is None:
+            now = time.monotonic()
+        return now >= self.next_due()
+
+    def advance(self):
+        """Move to the next slot and return its index."""
+        self.index += 1
+        return self.index
+
+    def time_until_due(self, now=None):
+        """Return the seconds left until the next slot, never negative."""
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self.next_due() - now)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter on the monotonic clock.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``. One
+    bucket can be shared by several threads to enforce a global rate.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens (for example packets) per second
+            burst: Bucket size, defaults to 10 ms worth of tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate * 0.01)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def consume(self, tokens=1, now=None):
+        """
+        Take tokens from the bucket if enough are available.
+
+        Returns:
+            True if the tokens were taken
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def time_until_available(self, tokens=1, now=None):
+        """Return the seconds until the given number of tokens is available."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            missing = tokens - self.tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
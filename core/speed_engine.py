@@ -0,0 +1,850 @@
+import http.client
+import logging
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.request
+from array import array
+from urllib.parse import urljoin, urlsplit
+from .cancellation import OperationCancelled
+
+# Streams an auto-scaled transfer starts with, and the most it may open
+INITIAL_STREAMS = 2
+MAX_STREAMS = 16
+
+# Auto-scaling doubles the streams every SCALE_INTERVAL seconds for as long
+# as aggregate throughput rises by more than SCALE_GAIN
+SCALE_INTERVAL = 1.0
+SCALE_GAIN = 0.10
+
+# Seconds between progress reports
+REPORT_INTERVAL = 0.25
+
+# Seconds between throughput samples. Consecutive samples are strongly
+# correlated, so the estimate's confidence interval is computed over batches
+# of BATCH_SAMPLES samples rather than over the samples themselves.
+SAMPLE_INTERVAL = 0.1
+BATCH_SAMPLES = 5
+
+# The warm-up (TCP slow start and stream ramp-up) lasts at least MIN_WARMUP
+# seconds and at most MAX_WARMUP_SHARE of the phase, and ends once batch
+# throughput stops rising by more than SCALE_GAIN and no streams are being added
+MIN_WARMUP = 1.0
+MAX_WARMUP_SHARE = 0.5
+
+# A phase ends early once at least MIN_BATCHES batches were measured after the
+# warm-up and the 95% confidence interval is within TOLERANCE of the estimate
+MIN_BATCHES = 4
+TOLERANCE = 0.05
+
+# Download reads are made larger while they take under FAST_READ seconds and
+# smaller when they take over SLOW_READ, so counts stay within a sample interval
+FAST_READ = SAMPLE_INTERVAL / 10
+SLOW_READ = SAMPLE_INTERVAL / 2
+
+# Two-sided 95% Student t critical values by degrees of freedom
+_T_95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+# Size of the random upload payload, generated once and shared by every upload
+PAYLOAD_SIZE = 4 * 1024 * 1024
+
+# Request headers of download streams
+DOWNLOAD_HEADERS = {'Accept-Encoding': 'identity', 'User-Agent': 'Network-Diagnostic-Tool'}
+
+# HTTP statuses a download follows to the Location header
+REDIRECTS = (301, 302, 303, 307, 308)
+
+_payload = None
+_payload_lock = threading.Lock()
+_tls = None
+
+
+def upload_payload():
+    """
+    Return the shared upload payload, generating it on first use.
+
+    The payload is random, so compression along the path cannot inflate
+    the measured upload speed.
+    """
+    global _payload
+    with _payload_lock:
+        if _payload is None:
+            _payload = os.urandom(PAYLOAD_SIZE)
+        return _payload
+
+
+def _tls_context():
+    """TLS context for download connections, verified against certifi's CAs if available."""
+    global _tls
+    if _tls is None:
+        try:
+            import certifi
+            _tls = ssl.create_default_context(cafile=certifi.where())
+        except ImportError:
+            _tls = ssl.create_default_context()
+    return _tls
+
+
+def _shutdown(connection):
+    """Interrupt a read or write blocked on a connection from another thread."""
+    if connection.sock is not None:
+        connection.sock.shutdown(socket.SHUT_RDWR)
+
+
+class TransferMeter:
+    """
+    Byte counters of concurrent transfer streams on one monotonic clock.
+
+    Each stream only ever updates its own counter, so streams never
+    contend for a lock; readers take a consistent enough snapshot by
+    summing the counters.
+    """
+
+    def __init__(self):
+        self.started = None   # Monotonic time of the first byte
+        self.stream_bytes = []
+        self.stream_started = []
+        self._lock = threading.Lock()
+
+    def add_stream(self):
+        """Register a new stream and return its index."""
+        with self._lock:
+            self.stream_bytes.append(0)
+            self.stream_started.append(None)
+            return len(self.stream_bytes) - 1
+
+    def add(self, stream, count):
+        """Count bytes transferred by a stream."""
+        if self.stream_started[stream] is None:
+            now = time.monotonic()
+            self.stream_started[stream] = now
+            if self.started is None:
+                self.started = now
+        self.stream_bytes[stream] += count
+
+    @property
+    def total(self):
+        """Bytes transferred by all streams."""
+        return sum(self.stream_bytes)
+
+    def result(self, now=None, estimator=None):
+        """
+        Snapshot the counters as a TransferResult.
+
+        Args:
+            now: Monotonic time of the snapshot, defaults to now
+            estimator: Optional ThroughputEstimator fed from this meter; its
+                steady-state estimate becomes the result's throughput
+        """
+        now = now or time.monotonic()
+        elapsed = now - self.started if self.started is not None else 0.0
+        streams = [
+            (count, now - started if started is not None else 0.0)
+            for count, started in zip(list(self.stream_bytes), list(self.stream_started))
+        ]
+        total = sum(count for count, _ in streams)
+        if estimator is None or estimator.warmup_end is None:
+            return TransferResult(total, elapsed, streams)
+        mark_time, mark_bytes = estimator.warmup_end
+        margin = estimator.margin
+        return TransferResult(
+            total, elapsed, streams, warmup=estimator.warmup,
+            measured=(total - mark_bytes, max(now - mark_time, 0.0)),
+            margin=margin * 8 / 1000000 if margin is not None else None,
+        )
+
+
+class ThroughputEstimator:
+    """
+    Steady-state throughput of a transfer from periodic byte-count samples.
+
+    Samples are grouped into batches of equal length. Batches up to the end
+    of the warm-up are discarded; the estimate is the throughput from there
+    on, and its confidence interval comes from the spread of the batch
+    rates. Because warm-up and stability are judged on rates relative to
+    each other, the same thresholds hold on a 1 Mbps link and a 1 Gbps one.
+    """
+
+    def __init__(self, duration, batch_samples=BATCH_SAMPLES):
+        """
+        Initialize the estimator.
+
+        Args:
+            duration: Longest the phase may last, in seconds
+            batch_samples: Samples per batch
+        """
+        self.max_warmup = max(MIN_WARMUP, duration * MAX_WARMUP_SHARE)
+        self.batch_samples = batch_samples
+        self.started = None     # (time, bytes) of the first sample
+        self.warmup_end = None  # (time, bytes) the measurement starts from
+        self.last = None        # (time, bytes) of the latest sample
+        self.batch_rates = array('d')  # Bytes per second of each measured batch
+        self._batch_start = None
+        self._batch_count = 0
+        self._previous_rate = None
+
+    @property
+    def warmup(self):
+        """Seconds excluded as warm-up, None while still warming up."""
+        if self.warmup_end is None:
+            return None
+        return self.warmup_end[0] - self.started[0]
+
+    def add(self, now, total, ramping=False):
+        """
+        Add a sample.
+
+        Args:
+            now: Monotonic time of the sample
+            total: Bytes transferred so far
+            ramping: Whether streams are still being added, which extends the warm-up
+        """
+        sample = (now, total)
+        self.last = sample
+        if self.started is None:
+            self.started = self._batch_start = sample
+            return
+        self._batch_count += 1
+        if self._batch_count < self.batch_samples:
+            return
+
+        elapsed = now - self._batch_start[0]
+        rate = (total - self._batch_start[1]) / elapsed if elapsed > 0 else 0.0
+        self._batch_start = sample
+        self._batch_count = 0
+        if self.warmup_end is not None:
+            self.batch_rates.append(rate)
+            return
+
+        since_start = now - self.started[0]
+        settled = (
+            not ramping and since_start >= MIN_WARMUP and self._previous_rate is not None
+            and rate < self._previous_rate * (1 + SCALE_GAIN)
+        )
+        if settled or since_start >= self.max_warmup:
+            self.warmup_end = sample
+        self._previous_rate = rate
+
+    @property
+    def rate(self):
+        """Bytes per second since the warm-up, or None while still warming up."""
+        if self.warmup_end is None or self.last is None:
+            return None
+        elapsed = self.last[0] - self.warmup_end[0]
+        return (self.last[1] - self.warmup_end[1]) / elapsed if elapsed > 0 else None
+
+    @property
+    def margin(self):
+        """Half-width of the rate's 95% confidence interval in bytes per second, or None."""
+        count = len(self.batch_rates)
+        if count < 2:
+            return None
+        mean = sum(self.batch_rates) / count
+        variance = sum((rate - mean) ** 2 for rate in self.batch_rates) / (count - 1)
+        t = _T_95[count - 2] if count - 1 <= len(_T_95) else 1.96
+        return t * (variance / count) ** 0.5
+
+    def stable(self):
+        """Whether the estimate is precise enough to end the phase."""
+        if len(self.batch_rates) < MIN_BATCHES:
+            return False
+        rate, margin = self.rate, self.margin
+        return bool(rate) and margin <= rate * TOLERANCE
+
+
+class ThroughputSeries:
+    """
+    Time series of a transfer: time, total bytes and bytes of every stream.
+
+    Samples are cumulative byte counts, so the throughput between any two
+    samples is their difference; a stall shows up as a flat stretch rather
+    than being averaged away. Storage is a few ``array('d')`` buffers that
+    grow by doubling, with the per-stream counts in one flat array of
+    max_streams columns. A sample is written before the length is bumped,
+    so another thread can read the samples while the transfer appends.
+    """
+
+    __slots__ = ("max_streams", "warmup", "_times", "_totals", "_streams", "_length")
+
+    def __init__(self, max_streams, capacity=128):
+        """
+        Initialize the series.
+
+        Args:
+            max_streams: Most streams the transfer may open
+            capacity: Number of samples to pre-allocate
+        """
+        self.max_streams = max_streams
+        self.warmup = None  # Seconds excluded as warm-up, once known
+        self._times = array('d', bytes(8 * capacity))
+        self._totals = array('d', bytes(8 * capacity))
+        self._streams = array('d', bytes(8 * capacity * max_streams))
+        self._length = 0
+
+    def append(self, timestamp, stream_bytes):
+        """
+        Append a sample.
+
+        Args:
+            timestamp: Seconds since the first byte
+            stream_bytes: Bytes transferred so far by each stream
+        """
+        length = self._length
+        if length == len(self._times):
+            # Grow into new buffers so readers holding the old ones stay valid
+            grown = []
+            for data in (self._times, self._totals, self._streams):
+                data = array('d', data)
+                data.frombytes(bytes(8 * len(data)))
+                grown.append(data)
+            self._times, self._totals, self._streams = grown
+        base = length * self.max_streams
+        total = 0
+        for stream, count in enumerate(stream_bytes[:self.max_streams]):
+            self._streams[base + stream] = count
+            total += count
+        self._times[length] = timestamp
+        self._totals[length] = total
+        self._length = length + 1
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def elapsed(self):
+        """Seconds covered by the series."""
+        return self._times[self._length - 1] if self._length else 0.0
+
+    def times(self, start=0):
+        """Timestamps of the samples from start on, as an array."""
+        return self._times[start:self._length]
+
+    def totals(self, start=0):
+        """Bytes transferred by all streams at each sample from start on, as an array."""
+        return self._totals[start:self._length]
+
+    def stream_totals(self, stream, start=0):
+        """Bytes transferred by one stream at each sample from start on, as an array."""
+        stride = self.max_streams
+        return self._streams[start * stride + stream:self._length * stride:stride]
+
+    def rates(self, start=0, window=1, stream=None):
+        """
+        Throughput between samples, in Mbps.
+
+        Args:
+            start: Index of the first sample to return a rate for
+            window: Samples each rate spans; larger windows smooth the line
+            stream: Index of a stream, None for all streams together
+
+        Returns:
+            Tuple of (timestamps, mbps) arrays; the first window samples
+            have no rate and are left out
+        """
+        length = self._length
+        first = max(start, window)
+        times = self._times[first - window:length]
+        counts = (self._totals[first - window:length] if stream is None
+                  else self.stream_totals(stream, first - window)[:len(times)])
+        mbps = array('d', (
+            (counts[i] - counts[i - window]) * 8 / ((times[i] - times[i - window]) * 1000000)
+            if times[i] > times[i - window] else 0.0
+            for i in range(window, len(times))
+        ))
+        return times[window:], mbps
+
+
+class TransferResult:
+    """Aggregate and per-stream throughput of a transfer."""
+
+    __slots__ = ("bytes", "elapsed", "streams", "warmup", "measured_bytes", "measured_elapsed", "margin")
+
+    def __init__(self, total_bytes, elapsed, streams, warmup=None, measured=None, margin=None):
+        """
+        Initialize the result.
+
+        Args:
+            total_bytes: Bytes transferred by all streams
+            elapsed: Seconds from the first byte to the end of the transfer
+            streams: List of (bytes, seconds) per stream
+            warmup: Seconds excluded as warm-up, None if the transfer ended
+                before the warm-up did
+            measured: (bytes, seconds) transferred after the warm-up
+            margin: Half-width of the 95% confidence interval in Mbps, or None
+        """
+        self.bytes = total_bytes
+        self.elapsed = elapsed
+        self.streams = streams
+        self.warmup = warmup
+        self.measured_bytes, self.measured_elapsed = measured or (0, 0.0)
+        self.margin = margin
+
+    @property
+    def mbps(self):
+        """Throughput in Mbps after the warm-up, or over the whole transfer if it never ended."""
+        if self.measured_elapsed > 0:
+            return self.measured_bytes * 8 / (self.measured_elapsed * 1000000)
+        return self.bytes * 8 / (self.elapsed * 1000000) if self.elapsed > 0 else 0.0
+
+    @property
+    def stream_mbps(self):
+        """Throughput of each stream in Mbps."""
+        return [
+            count * 8 / (seconds * 1000000) if seconds > 0 else 0.0
+            for count, seconds in self.streams
+        ]
+
+    def format_mbps(self):
+        """Throughput with its confidence interval if there is one, e.g. "93.41 ± 1.20 Mbps"."""
+        if self.margin is None:
+            return f"{self.mbps:.2f} Mbps"
+        return f"{self.mbps:.2f} ± {self.margin:.2f} Mbps"
+
+    def describe(self):
+        """One-line summary, for logs and progress messages."""
+        per_stream = ", ".join(f"{mbps:.1f}" for mbps in self.stream_mbps)
+        warmup = f"{self.warmup:.1f}s warm-up excluded" if self.warmup is not None else "no steady state"
+        return (f"{self.format_mbps()} over {len(self.streams)} streams "
+                f"({self.bytes / 1024 / 1024:.1f} MB in {self.elapsed:.1f}s, {warmup}; "
+                f"per stream: {per_stream})")
+
+
+class TransferEngine:
+    """
+    Runs one direction of a speed test over several concurrent streams.
+
+    Every stream runs in its own thread and counts its bytes in a shared
+    TransferMeter, which the engine samples into a ThroughputSeries. With a fixed stream count all streams start at once;
+    otherwise the engine starts with INITIAL_STREAMS and doubles them while
+    aggregate throughput keeps rising, up to max_streams, so a single
+    flow's window limit does not cap the result on fast links.
+    Subclasses implement _run_stream.
+    """
+
+    def __init__(self, urls, streams=None, max_streams=MAX_STREAMS, duration=10, timeout=15):
+        """
+        Initialize the engine.
+
+        Args:
+            urls: URLs to transfer to or from, in order of preference; a
+                stream moves to the next one when one fails
+            streams: Fixed number of streams, None to auto-scale
+            max_streams: Most streams auto-scaling may open
+            duration: Most seconds to transfer for, from the first byte; the
+                transfer ends sooner once its throughput is stable
+            timeout: Seconds to wait for a connection or data
+        """
+        self.urls = list(urls)
+        self.streams = streams
+        self.max_streams = streams or max_streams
+        self.duration = duration
+        self.timeout = timeout
+        self.meter = TransferMeter()
+        self.estimator = ThroughputEstimator(duration)
+        self.series = ThroughputSeries(self.max_streams)
+        self._stop = threading.Event()
+        self._aborts = {}  # stream index -> function interrupting its blocked I/O
+        self._threads = []
+
+    def _start_streams(self, count):
+        for _ in range(count):
+            index = self.meter.add_stream()
+            thread = threading.Thread(target=self._stream, args=(index,), daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _stream(self, index):
+        try:
+            self._run_stream(index)
+        except Exception as e:
+            if not self._stop.is_set():
+                logging.error(f"Speed test stream {index} error: {e}")
+        finally:
+            self._aborts.pop(index, None)
+
+    def _run_stream(self, index):
+        """Transfer data on one stream until self._stop is set or every URL fails."""
+        raise NotImplementedError
+
+    def _connect(self, url):
+        """
+        Create a connection for a URL, through the environment's proxy if one is set.
+
+        Returns:
+            Tuple of (connection, request target)
+        """
+        parts = urlsplit(url)
+        https = parts.scheme == "https"
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        options = {'timeout': self.timeout}
+        if https:
+            options['context'] = _tls_context()
+        connection_class = http.client.HTTPSConnection if https else http.client.HTTPConnection
+
+        proxy = urllib.request.getproxies().get(parts.scheme)
+        if not proxy or urllib.request.proxy_bypass(parts.hostname):
+            return connection_class(parts.hostname, parts.port, **options), target
+        proxy = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        if https:
+            connection = connection_class(proxy.hostname, proxy.port or 8080, **options)
+            connection.set_tunnel(parts.hostname, parts.port)
+            return connection, target
+        # Plain HTTP proxies take the full URL as the request target
+        return http.client.HTTPConnection(proxy.hostname, proxy.port or 8080, **options), url
+
+    def stop(self):
+        """Stop every stream, interrupting I/O they are blocked in; safe from any thread."""
+        self._stop.set()
+        for abort in list(self._aborts.values()):
+            try:
+                abort()
+            except Exception:
+                pass
+
+    def _stop_streams(self):
+        self.stop()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def _sample(self, now, ramping):
+        """Record a sample in the series and the estimator, and return the total bytes."""
+        stream_bytes = list(self.meter.stream_bytes)
+        self.series.append(now - self.meter.started, stream_bytes)
+        total = sum(stream_bytes)
+        self.estimator.add(now, total, ramping)
+        if self.series.warmup is None:
+            self.series.warmup = self.estimator.warmup
+        return total
+
+    def run(self, token=None, progress_callback=None):
+        """
+        Run the transfer.
+
+        Throughput is sampled into self.series every SAMPLE_INTERVAL
+        seconds, so it can be charted while the transfer runs. The warm-up is
+        left out of the result, and the transfer ends before duration once
+        the estimate is stable, see ThroughputEstimator.
+
+        Args:
+            token: Optional CancellationToken; cancelling it calls stop(), so
+                blocked reads and writes are interrupted at once
+            progress_callback: Optional function called every REPORT_INTERVAL
+                seconds with the current TransferResult
+
+        Returns:
+            TransferResult, or None if nothing was transferred or the token
+            was cancelled
+        """
+        self._start_streams(self.streams or INITIAL_STREAMS)
+        started = time.monotonic()
+        scaling = self.streams is None
+        last_scale = started
+        last_scale_bytes = 0
+        last_rate = None
+        last_report = started
+
+        relay = token.register(self.stop) if token is not None else None
+        try:
+            while not self._stop.wait(SAMPLE_INTERVAL):
+                now = time.monotonic()
+                if not any(thread.is_alive() for thread in self._threads):
+                    break
+                if self.meter.started is None:
+                    if now - started > self.timeout:
+                        break
+                    continue
+                total = self._sample(now, scaling)
+                if now - self.meter.started >= self.duration or self.estimator.stable():
+                    break
+                if progress_callback and now - last_report >= REPORT_INTERVAL:
+                    progress_callback(self.meter.result(now, self.estimator))
+                    last_report = now
+
+                if scaling and now - last_scale >= SCALE_INTERVAL:
+                    rate = (total - last_scale_bytes) / (now - last_scale)
+                    streams = len(self._threads)
+                    if (last_rate is not None and rate < last_rate * (1 + SCALE_GAIN)) or streams >= self.max_streams:
+                        scaling = False
+                    else:
+                        self._start_streams(min(streams, self.max_streams - streams))
+                    last_scale, last_scale_bytes, last_rate = now, total, rate
+        finally:
+            if relay is not None:
+                token.unregister(relay)
+            now = time.monotonic()
+            if self.meter.started is not None:
+                self.series.append(now - self.meter.started, list(self.meter.stream_bytes))
+            result = self.meter.result(now, self.estimator)
+            self._stop_streams()
+
+        if (token is not None and token.cancelled) or result.bytes == 0:
+            return None
+        return result
+
+
+class DownloadEngine(TransferEngine):
+    """
+    Multi-stream download throughput test, see TransferEngine.
+
+    Every stream keeps one HTTP connection open and reads the bodies with
+    readinto into a single preallocated buffer, so the read loop allocates
+    nothing and the data is discarded as soon as it is counted.
+    """
+
+    # Most and fewest bytes read per call
+    CHUNK_SIZE = 1024 * 1024
+    MIN_READ = 4 * 1024
+
+    # Redirects followed per request
+    MAX_REDIRECTS = 5
+
+    def __init__(self, urls, streams=None, max_streams=MAX_STREAMS, duration=10, timeout=15,
+                 chunk_size=CHUNK_SIZE):
+        """
+        Initialize the engine.
+
+        Args:
+            chunk_size: Size of each stream's read buffer, the largest read;
+                larger reads mean fewer calls per second on fast links
+
+        See TransferEngine for the other arguments.
+        """
+        super().__init__(urls, streams, max_streams, duration, timeout)
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _get(connection, target):
+        """Send a GET request on a connection and return the response."""
+        # Identity encoding, so every byte read is a byte on the wire
+        connection.request("GET", target, headers=DOWNLOAD_HEADERS)
+        response = connection.getresponse()
+        if response.status != 200 and response.status not in REDIRECTS:
+            raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+        return response
+
+    def _open(self, index, url):
+        """
+        Connect and send a GET request for a URL, following redirects.
+
+        Returns:
+            Tuple of (connection, request target, response) with the
+            response ready to read
+
+        Raises:
+            OSError or http.client.HTTPException: If the request fails
+        """
+        for _redirect in range(self.MAX_REDIRECTS + 1):
+            connection, target = self._connect(url)
+            self._aborts[index] = lambda: _shutdown(connection)
+            try:
+                response = self._get(connection, target)
+            except Exception:
+                connection.close()
+                raise
+            if response.status in REDIRECTS and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                connection.close()
+                continue
+            if response.status != 200:
+                connection.close()
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+            return connection, target, response
+        raise http.client.HTTPException("Too many redirects")
+
+    def _run_stream(self, index):
+        buffer = memoryview(bytearray(self.chunk_size))
+        # Views of the buffer for every read size from MIN_READ up to chunk_size
+        views = [buffer[:min(self.MIN_READ << shift, self.chunk_size)]
+                 for shift in range(max(self.chunk_size // self.MIN_READ, 1).bit_length())]
+        largest = len(views) - 1
+        size = 0
+        meter = self.meter
+        stop = self._stop
+        failures = 0
+        url_index = 0
+        connection = None
+        while not stop.is_set() and failures < len(self.urls):
+            url = self.urls[url_index % len(self.urls)]
+            if connection is not None:
+                # Request the body again on the open connection; if the
+                # server has closed it meanwhile, reconnect
+                try:
+                    response = self._get(connection, target)
+                    if response.status != 200:
+                        raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = None
+                    continue
+            else:
+                try:
+                    connection, target, response = self._open(index, url)
+                except (OSError, http.client.HTTPException) as e:
+                    connection = None
+                    if stop.is_set():
+                        return
+                    logging.error(f"Download stream {index} could not fetch {url}: {e}")
+                    failures += 1
+                    url_index += 1
+                    continue
+
+            failures = 0
+            readinto = response.readinto
+            try:
+                while True:
+                    # A read only returns once its view is full, so the read size
+                    # follows the link rate to keep the counter current on slow links
+                    started = time.monotonic()
+                    count = readinto(views[size])
+                    if not count:
+                        break
+                    meter.add(index, count)
+                    if stop.is_set():
+                        connection.close()
+                        return
+                    took = time.monotonic() - started
+                    if took < FAST_READ and size < largest:
+                        size += 1
+                    elif took > SLOW_READ and size > 0:
+                        size -= 1
+            except (OSError, http.client.HTTPException) as e:
+                # The server answered, so a reset or timeout mid-body costs
+                # this request, not the URL; reconnect and request it again
+                connection.close()
+                connection = None
+                if stop.is_set():
+                    return
+                logging.error(f"Download stream {index} lost {url} mid-body: {e}")
+                continue
+            if response.will_close:
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+
+class UploadBody:
+    """
+    Request body streamed from the shared upload payload.
+
+    The body is a sequence of memoryview slices of the payload, so no data
+    is generated or copied per request. A slice is counted as sent once the
+    connection asks for the next one, which means it has been written to
+    the socket.
+    """
+
+    def __init__(self, size, meter, stream, stop, chunk_size=64 * 1024):
+        """
+        Initialize the body.
+
+        Args:
+            size: Body length in bytes
+            meter: TransferMeter to count sent bytes in
+            stream: Index of the stream in the meter
+            stop: threading.Event that aborts the upload
+            chunk_size: Bytes per slice
+        """
+        self._size = size
+        self._meter = meter
+        self._stream = stream
+        self._stop = stop
+        self._chunk_size = chunk_size
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        payload = memoryview(upload_payload())
+        sent = 0
+        while sent < self._size:
+            if self._stop.is_set():
+                raise OperationCancelled("upload stopped")
+            offset = sent % len(payload)
+            count = min(self._chunk_size, self._size - sent, len(payload) - offset)
+            yield payload[offset:offset + count]
+            self._meter.add(self._stream, count)
+            sent += count
+
+
+class UploadEngine(TransferEngine):
+    """
+    Multi-stream upload throughput test, see TransferEngine.
+
+    Every stream keeps one HTTP connection open and posts UploadBody
+    requests on it, so stop() can shut the socket down in the middle of a
+    write.
+    """
+
+    # Bytes per slice written to the connection
+    CHUNK_SIZE = 64 * 1024
+
+    # Length of each upload request; streams post again until the test ends
+    BODY_SIZE = 32 * 1024 * 1024
+
+    # Largest response read to keep a connection alive; echo servers send
+    # the body back, and their connection is dropped instead
+    MAX_RESPONSE = 64 * 1024
+
+    def _post(self, connection, target, index):
+        """
+        Post one body and read the status.
+
+        Returns:
+            Tuple of (response, whether the connection may be reused)
+        """
+        body = UploadBody(self.BODY_SIZE, self.meter, index, self._stop, self.CHUNK_SIZE)
+        connection.request("POST", target, body=body, headers={
+            'Content-Type': 'application/octet-stream',
+            'Content-Length': str(self.BODY_SIZE),
+            'User-Agent': DOWNLOAD_HEADERS['User-Agent'],
+        })
+        response = connection.getresponse()
+        length = response.getheader("Content-Length")
+        if response.will_close or length is None or not length.isdigit() or int(length) > self.MAX_RESPONSE:
+            return response, False
+        response.read()
+        return response, True
+
+    def _run_stream(self, index):
+        upload_payload()
+        stop = self._stop
+        failures = 0
+        url_index = 0
+        connection = None
+        while not stop.is_set() and failures < len(self.urls):
+            url = self.urls[url_index % len(self.urls)]
+            reused = connection is not None
+            if not reused:
+                connection, target = self._connect(url)
+                self._aborts[index] = lambda connection=connection: _shutdown(connection)
+            try:
+                response, keep = self._post(connection, target, index)
+            except (OSError, http.client.HTTPException, OperationCancelled) as e:
+                connection.close()
+                connection = None
+                if stop.is_set():
+                    return
+                if reused:
+                    # The server closed the kept-alive connection; reconnect
+                    continue
+                logging.error(f"Upload stream {index} could not post to {url}: {e}")
+                failures += 1
+                url_index += 1
+                continue
+            if not keep:
+                connection.close()
+                connection = None
+            if not 200 <= response.status < 300:
+                logging.error(f"Upload stream {index} could not post to {url}: HTTP {response.status} {response.reason}")
+                failures += 1
+                url_index += 1
+                continue
+            failures = 0
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,193 @@
+import errno
+import ipaddress
+import logging
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+from .ping_engine import PingSample, collect_samples
+from .scheduler import FixedRateScheduler
+
+# connect() results that mean the handshake is still in progress
+IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035}  # 10035: WSAEWOULDBLOCK
+
+# connect() results that mean the host answered with a reset
+REFUSED = {errno.ECONNREFUSED, 10061}  # 10061: WSAECONNREFUSED
+
+# Keep well below the usual 1024 open file limit
+MAX_IN_FLIGHT = 900
+
+
+class TcpPingEngine:
+    """
+    TCP connect latency probe ("tcping") for targets that drop ICMP.
+
+    Each probe is a non-blocking connect() driven by a selector, so thousands
+    of handshakes can be in flight at once with a timeout per probe. The
+    round-trip time is the time from SYN to SYN-ACK (or RST, since a refused
+    connection still proves the host answered). Probes produce the same
+    PingSample records as the ICMP engine.
+    """
+
+    def __init__(self, port=443, timeout=2, max_in_flight=MAX_IN_FLIGHT):
+        """
+        Initialize the engine.
+
+        Args:
+            port: TCP port to connect to
+            timeout: Seconds to wait for each handshake before counting it as lost
+            max_in_flight: Maximum number of connections open at the same time
+        """
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+
+    def _connect(self, address):
+        """
+        Start a non-blocking connection.
+
+        Returns:
+            Tuple of (socket or None, errno of the immediate connect result)
+        """
+        family = socket.AF_INET6 if ipaddress.ip_address(address).version == 6 else socket.AF_INET
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as e:
+            logging.error(f"TCP ping socket error for {address}: {e}")
+            return None, e.errno
+        sock.setblocking(False)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+        return sock, sock.connect_ex((address, self.port))
+
+    @staticmethod
+    def _close(sock):
+        """Close a probe socket with a reset so it does not linger in TIME_WAIT."""
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+        sock.close()
+
+    def stream(self, targets, count=None, interval=1, token=None):
+        """
+        Probe targets with TCP handshakes, yielding one record per probe.
+
+        Rounds are sent at a fixed rate on the monotonic clock, exactly like
+        PingEngine.stream.
+
+        Args:
+            targets: Iterable of IPv4 or IPv6 address strings
+            count: Number of probes to send to each target, None for endless
+            interval: Time interval between rounds in seconds
+            token: Optional CancellationToken; the stream stops as soon as it fires
+
+        Yields:
+            PingSample for every probe (ttl is always None)
+        """
+        targets = list(dict.fromkeys(targets))
+        if not targets or (count is not None and count <= 0):
+            return
+
+        selector = selectors.DefaultSelector()
+        if token is not None:
+            selector.register(token, selectors.EVENT_READ)
+        pending = {}        # socket -> (target, round, send_time, send_wall_time)
+        deadlines = deque() # (deadline, socket) in send order
+
+        round_index = 0
+        target_index = 0
+        schedule = FixedRateScheduler(interval)
+
+        def sending():
+            return count is None or round_index < count
+
+        def finish(sock, rtt):
+            selector.unregister(sock)
+            target, index, _sent, sent_wall = pending.pop(sock)
+            self._close(sock)
+            return PingSample(target, index, sent_wall, rtt)
+
+        try:
+            while sending() or pending:
+                if token is not None and token.cancelled:
+                    return
+                now = time.monotonic()
+
+                # Start every handshake that is due
+                while sending() and schedule.is_due(now) and len(pending) < self.max_in_flight:
+                    target = targets[target_index]
+                    sent_wall = time.time()
+                    sent_at = time.monotonic()
+                    sock, result = self._connect(target)
+                    if sock is not None and result in IN_PROGRESS:
+                        pending[sock] = (target, round_index, sent_at, sent_wall)
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        deadlines.append((sent_at + self.timeout, sock))
+                    else:
+                        # Loopback targets may connect or refuse immediately
+                        rtt = (time.monotonic() - sent_at) * 1000 if result == 0 or result in REFUSED else None
+                        if sock is not None:
+                            self._close(sock)
+                        yield PingSample(target, round_index, sent_wall, rtt)
+
+                    target_index += 1
+                    if target_index == len(targets):
+                        target_index = 0
+                        round_index = schedule.advance()
+                    now = time.monotonic()
+
+                # Expire handshakes that never completed
+                while deadlines and deadlines[0][0] <= now:
+                    _deadline, sock = deadlines.popleft()
+                    if sock in pending:
+                        yield finish(sock, None)
+
+                if not sending() and not pending:
+                    break
+
+                # With max_in_flight handshakes open only a completion or
+                # expiry frees a slot, so the schedule alone is no reason to wake
+                wake = deadlines[0][0] if deadlines else now + self.timeout
+                if sending() and len(pending) < self.max_in_flight:
+                    wake = min(wake, schedule.next_due())
+                if not pending and token is None:
+                    # Nothing registered yet; selectors cannot wait on an empty set everywhere
+                    time.sleep(max(0, wake - now))
+                    continue
+
+                for key, _events in selector.select(max(0, wake - now)):
+                    sock = key.fileobj
+                    if sock not in pending:
+                        continue
+                    received_at = time.monotonic()
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error == 0 or error in REFUSED:
+                        rtt = (received_at - pending[sock][2]) * 1000  # Convert to ms
+                    else:
+                        rtt = None
+                    yield finish(sock, rtt)
+        finally:
+            for sock in list(pending):
+                self._close(sock)
+            selector.close()
+
+    def ping_many(self, targets, count=1, interval=1, callback=None, token=None):
+        """
+        Probe many targets concurrently with TCP handshakes.
+
+        Args:
+            targets: Iterable of IPv4 or IPv6 address strings
+            count: Number of probes to send to each target
+            interval: Time interval between rounds in seconds
+            callback: Optional callback function to update progress
+            token: Optional CancellationToken; unfinished probes count as lost
+
+        Returns:
+            Dictionary mapping each target to (LatencySeries, packet_loss_percent)
+        """
+        targets = list(dict.fromkeys(targets))
+        return collect_samples(self.stream(targets, count, interval, token), targets, count, callback)
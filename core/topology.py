@@ -0,0 +1,119 @@
+import threading
+from .ping_stats import RunningStats
+
+
+class TopologyNode:
+    """A router or destination seen in one or more traces."""
+
+    __slots__ = ("address", "min_ttl", "destinations", "rtt")
+
+    def __init__(self, address, ttl):
+        self.address = address
+        self.min_ttl = ttl
+        self.destinations = set()
+        self.rtt = RunningStats()
+
+
+class TopologyEdge:
+    """Link between two consecutive responding hops."""
+
+    __slots__ = ("source", "target", "destinations", "rtt", "gap")
+
+    def __init__(self, source, target, gap):
+        self.source = source
+        self.target = target
+        self.destinations = set()
+        self.rtt = RunningStats()  # RTTs measured at the far end of the link
+        self.gap = gap             # Silent hops skipped between the two ends
+
+
+class TopologyGraph:
+    """
+    Deduplicated hop graph merged from many traces.
+
+    Nodes are keyed by IP address and edges by (source, target) address, so
+    a router shared by several paths appears once, with the destinations
+    that cross it. Hops can be added from several trace threads at once.
+    """
+
+    # Pseudo-node the first hop of every trace is linked from
+    SOURCE = "local"
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self._last = {}  # destination -> (last responding address, its TTL)
+        self._lock = threading.Lock()
+
+    def add_hop(self, destination, hop):
+        """
+        Merge one hop of the trace to a destination.
+
+        Hops of a trace must be added in TTL order.
+
+        Args:
+            destination: Destination the trace was run to
+            hop: Hop record
+
+        Returns:
+            List of addresses of the hop that were already shared with
+            another destination's path
+        """
+        shared = []
+        with self._lock:
+            previous, previous_ttl = self._last.get(destination, (self.SOURCE, 0))
+            for address, rtt in zip(hop.addresses, hop.rtts):
+                if address is None or rtt is None:
+                    continue
+                node = self.nodes.get(address)
+                if node is None:
+                    node = self.nodes[address] = TopologyNode(address, hop.ttl)
+                node.min_ttl = min(node.min_ttl, hop.ttl)
+                if node.destinations and destination not in node.destinations:
+                    shared.append(address)
+                node.destinations.add(destination)
+                node.rtt.add(rtt)
+
+                if previous != address:
+                    key = (previous, address)
+                    edge = self.edges.get(key)
+                    if edge is None:
+                        edge = self.edges[key] = TopologyEdge(previous, address, hop.ttl - previous_ttl - 1)
+                    edge.destinations.add(destination)
+                    edge.rtt.add(rtt)
+
+            responders = hop.responders
+            if responders:
+                # Per-flow load balancing may answer from several routers;
+                # the path continues from the last one
+                self._last[destination] = (responders[-1], hop.ttl)
+        return list(dict.fromkeys(shared))
+
+    def shared_nodes(self, minimum=2):
+        """
+        Find the hops crossed by several destinations' paths.
+
+        Args:
+            minimum: Minimum number of destinations crossing the hop
+
+        Returns:
+            List of TopologyNode, closest to the source first
+        """
+        with self._lock:
+            nodes = [node for node in self.nodes.values() if len(node.destinations) >= minimum]
+        return sorted(nodes, key=lambda node: (node.min_ttl, node.address))
+
+    def summary(self):
+        """
+        Summarize the graph.
+
+        Returns:
+            Dictionary with the number of destinations, nodes, edges and shared nodes
+        """
+        with self._lock:
+            return {
+                'destinations': len(self._last),
+                'nodes': len(self.nodes),
+                'edges': len(self.edges),
+                'shared_nodes': sum(1 for node in self.nodes.values() if len(node.destinations) > 1),
+            }
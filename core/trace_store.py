@@ -0,0 +1,303 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from .traceroute import Hop
+
+# Traces kept per destination; older ones are pruned on save
+MAX_TRACES_PER_DESTINATION = 50
+
+# Latency change (ms) between runs that counts as a hop getting slower or faster
+LATENCY_DELTA_MS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    id INTEGER PRIMARY KEY,
+    destination TEXT NOT NULL,
+    started REAL NOT NULL,
+    protocol TEXT,
+    reached INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS traces_by_destination ON traces (destination, started);
+CREATE TABLE IF NOT EXISTS hops (
+    trace_id INTEGER NOT NULL REFERENCES traces (id) ON DELETE CASCADE,
+    ttl INTEGER NOT NULL,
+    probed_at REAL NOT NULL,
+    addresses TEXT NOT NULL,
+    rtts BLOB NOT NULL,
+    marks TEXT NOT NULL,
+    PRIMARY KEY (trace_id, ttl)
+) WITHOUT ROWID;
+"""
+
+
+def default_store_path():
+    """Return the default location of the trace database, in the user's home directory."""
+    return os.path.join(os.path.expanduser("~"), ".network_diagnostic_tool", "traces.db")
+
+
+class StoredTrace:
+    """A trace loaded from the store."""
+
+    __slots__ = ("id", "destination", "started", "protocol", "reached", "hops", "probed_at")
+
+    def __init__(self, trace_id, destination, started, protocol, reached):
+        self.id = trace_id
+        self.destination = destination
+        self.started = started
+        self.protocol = protocol
+        self.reached = bool(reached)
+        self.hops = []
+        self.probed_at = {}  # ttl -> wall-clock time the hop was last probed
+
+
+class HopChange:
+    """Difference at one TTL between two traces of the same destination."""
+
+    __slots__ = ("ttl", "status", "old_addresses", "new_addresses", "old_rtt", "new_rtt",
+                 "old_asns", "new_asns")
+
+    def __init__(self, ttl, status, old_hop, new_hop, asn_lookup=None):
+        """
+        Initialize the change.
+
+        Args:
+            ttl: TTL of the hop
+            status: "same", "changed", "slower", "faster", "lost", "recovered",
+                "new" or "gone"
+            old_hop: Hop from the previous trace, or None
+            new_hop: Hop from the new trace, or None
+            asn_lookup: Optional function mapping an address to its ASN (or None)
+        """
+        self.ttl = ttl
+        self.status = status
+        self.old_addresses = old_hop.responders if old_hop else []
+        self.new_addresses = new_hop.responders if new_hop else []
+        self.old_rtt = old_hop.avg_rtt if old_hop else None
+        self.new_rtt = new_hop.avg_rtt if new_hop else None
+        self.old_asns = _asns(self.old_addresses, asn_lookup)
+        self.new_asns = _asns(self.new_addresses, asn_lookup)
+
+    @property
+    def latency_delta(self):
+        """Change in average RTT (ms), or None if either side has no answer."""
+        if self.old_rtt is None or self.new_rtt is None:
+            return None
+        return self.new_rtt - self.old_rtt
+
+    @property
+    def new_asn(self):
+        """ASNs on the new path at this hop that were not there before."""
+        return [asn for asn in self.new_asns if asn not in self.old_asns]
+
+    def describe(self):
+        """One-line description of the change."""
+        old = " ".join(self.old_addresses) or "*"
+        new = " ".join(self.new_addresses) or "*"
+        text = f"{self.ttl:2d}  {self.status:<9} {old} -> {new}" if old != new else f"{self.ttl:2d}  {self.status:<9} {new}"
+        delta = self.latency_delta
+        if delta is not None:
+            text += f"  ({delta:+.1f} ms)"
+        if self.new_asn:
+            text += "  new AS" + ", AS".join(str(asn) for asn in self.new_asn)
+        return text
+
+
+def _asns(addresses, asn_lookup):
+    if asn_lookup is None:
+        return []
+    asns = (asn_lookup(address) for address in addresses)
+    return list(dict.fromkeys(asn for asn in asns if asn is not None))
+
+
+def diff_paths(old_hops, new_hops, asn_lookup=None):
+    """
+    Compare two traces of the same destination hop by hop.
+
+    Args:
+        old_hops: Hops of the previous (for example last known-good) trace
+        new_hops: Hops of the new trace
+        asn_lookup: Optional function mapping an address to its ASN
+
+    Returns:
+        List of HopChange, one per TTL present in either trace
+    """
+    old_by_ttl = {hop.ttl: hop for hop in old_hops}
+    new_by_ttl = {hop.ttl: hop for hop in new_hops}
+    changes = []
+    for ttl in sorted(set(old_by_ttl) | set(new_by_ttl)):
+        old = old_by_ttl.get(ttl)
+        new = new_by_ttl.get(ttl)
+        if old is None:
+            status = "new"
+        elif new is None:
+            status = "gone"
+        elif not new.responders:
+            status = "same" if not old.responders else "lost"
+        elif not old.responders:
+            status = "recovered"
+        elif set(new.responders) != set(old.responders):
+            status = "changed"
+        else:
+            delta = new.avg_rtt - old.avg_rtt
+            if delta > LATENCY_DELTA_MS:
+                status = "slower"
+            elif delta < -LATENCY_DELTA_MS:
+                status = "faster"
+            else:
+                status = "same"
+        changes.append(HopChange(ttl, status, old, new, asn_lookup))
+    return changes
+
+
+class TraceStore:
+    """
+    Persistent store of traceroute results, indexed by destination.
+
+    Each hop is one row holding its responders, its RTTs packed as
+    ``array('f')`` bytes (NaN for lost probes) and when it was probed, so
+    a quick re-trace can tell which hops are stale. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, path=None, max_traces=MAX_TRACES_PER_DESTINATION):
+        """
+        Open (or create) the store.
+
+        Args:
+            path: Database file, defaults to default_store_path(); ":memory:" works too
+            max_traces: Traces kept per destination
+        """
+        self.path = path or default_store_path()
+        self.max_traces = max_traces
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    def save(self, destination, hops, protocol=None, probed_at=None):
+        """
+        Store a trace.
+
+        The trace counts as having reached the destination only if a hop
+        was answered by the destination itself (Hop.reached), not merely
+        if its last hop answered.
+
+        Args:
+            destination: Target the trace was run to
+            hops: List of Hop objects
+            protocol: Probe protocol used, for reference
+            probed_at: Optional dictionary of ttl -> probe time for hops
+                reused from an earlier trace; other hops count as probed now
+
+        Returns:
+            ID of the stored trace
+        """
+        now = time.time()
+        probed_at = probed_at or {}
+        reached = any(hop.reached for hop in hops)
+        rows = []
+        for hop in hops:
+            rtts = array('f', (math.nan if rtt is None else rtt for rtt in hop.rtts))
+            rows.append((
+                hop.ttl,
+                probed_at.get(hop.ttl, now),
+                " ".join(address or "" for address in hop.addresses),
+                rtts.tobytes(),
+                " ".join(mark or "-" for mark in hop.marks),
+            ))
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO traces (destination, started, protocol, reached) VALUES (?, ?, ?, ?)",
+                (destination, now, protocol, int(reached))
+            )
+            trace_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO hops (trace_id, ttl, probed_at, addresses, rtts, marks) VALUES (?, ?, ?, ?, ?, ?)",
+                [(trace_id,) + row for row in rows]
+            )
+            # Keep only the newest traces of this destination
+            self._db.execute(
+                "DELETE FROM traces WHERE destination = ? AND id NOT IN "
+                "(SELECT id FROM traces WHERE destination = ? ORDER BY started DESC LIMIT ?)",
+                (destination, destination, self.max_traces)
+            )
+        return trace_id
+
+    def last(self, destination, reached_only=False):
+        """
+        Load the newest trace of a destination.
+
+        Args:
+            destination: Target the trace was run to
+            reached_only: Only consider traces that reached the destination
+                (the last known-good path)
+
+        Returns:
+            StoredTrace, or None if there is none
+        """
+        query = "SELECT id, destination, started, protocol, reached FROM traces WHERE destination = ?"
+        if reached_only:
+            query += " AND reached = 1"
+        query += " ORDER BY started DESC LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, (destination,)).fetchone()
+            if row is None:
+                return None
+            trace = StoredTrace(*row)
+            hop_rows = self._db.execute(
+                "SELECT ttl, probed_at, addresses, rtts, marks FROM hops WHERE trace_id = ? ORDER BY ttl",
+                (trace.id,)
+            ).fetchall()
+
+        for ttl, probed_at, addresses, blob, marks in hop_rows:
+            rtts = array('f')
+            rtts.frombytes(blob)
+            hop = Hop(ttl, len(rtts))
+            hop.rtts = [None if rtt != rtt else float(rtt) for rtt in rtts]
+            hop.addresses = [address or None for address in addresses.split(" ")][:len(rtts)]
+            hop.marks = ["" if mark == "-" else mark for mark in marks.split(" ")][:len(rtts)]
+            trace.hops.append(hop)
+            trace.probed_at[ttl] = probed_at
+        if trace.reached and trace.hops:
+            trace.hops[-1].reached = True
+        return trace
+
+    def history(self, destination, limit=20):
+        """
+        List the stored traces of a destination, newest first.
+
+        Returns:
+            List of (trace_id, started, reached) tuples
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, started, reached FROM traces WHERE destination = ? ORDER BY started DESC LIMIT ?",
+                (destination, limit)
+            ).fetchall()
+        return [(trace_id, started, bool(reached)) for trace_id, started, reached in rows]
+
+    def stale_ttls(self, trace, max_age):
+        """
+        Find the hops of a stored trace that need probing again.
+
+        A hop is stale when it was probed more than max_age seconds ago or
+        no probe was answered.
+
+        Returns:
+            Set of TTLs
+        """
+        now = time.time()
+        return {
+            hop.ttl for hop in trace.hops
+            if not hop.responders or now - trace.probed_at.get(hop.ttl, 0) > max_age
+        }
@@ -0,0 +1,514 @@
+import logging
+import os
+import random
+import re
+import select
+import socket
+import struct
+import sys
+import time
+from .ping_engine import icmp_checksum
+
+# ICMP message types and codes the engine understands
+ICMP_ECHO_REPLY = 0
+ICMP_DEST_UNREACHABLE = 3
+ICMP_ECHO_REQUEST = 8
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACHABLE = 3
+
+# Markers traceroute prints for ICMP unreachable codes
+UNREACHABLE_MARKS = {0: "!N", 1: "!H", 2: "!P", 9: "!X", 10: "!X", 13: "!X"}
+
+# Base UDP destination port, the same as the system traceroute
+UDP_BASE_PORT = 33434
+
+# TCP flags
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+PROTOCOLS = ("udp", "icmp", "tcp")
+
+# Hops slower than this (ms) are reported as high latency
+HIGH_LATENCY_MS = 100
+
+# A hop line starts with its TTL; everything after it is tokenized in one pass
+HOP_LINE_RE = re.compile(r"^\s*(\d+)\s+(.*)$")
+HOP_TOKEN_RE = re.compile(
+    r"(?P<below><)?(?P<rtt>\d+(?:\.\d+)?)\s*ms"   # "0.512 ms", "<1 ms"
+    r"|(?P<lost>\*)"                                  # lost probe
+    r"|(?P<mark>![A-Z0-9<>]*)"                         # "!H", "!N", "!<10>"
+    r"|[(\[](?P<quoted>[0-9A-Fa-f:.]+)[)\]]"           # "(10.0.0.1)", "[10.0.0.1]"
+    r"|(?<!\S)(?P<address>\d{1,3}(?:\.\d{1,3}){3}|[0-9A-Fa-f]*:[0-9A-Fa-f:]*:[0-9A-Fa-f]+)(?!\S)"
+)
+
+# Seconds between probe rounds; hosts refill their ICMP rate limit in between
+ROUND_GAP = 0.05
+
+
+class Hop:
+    """Result of all probes sent with one TTL."""
+
+    __slots__ = ("ttl", "addresses", "rtts", "marks", "reached")
+
+    def __init__(self, ttl, probes):
+        """
+        Initialize an empty hop.
+
+        Args:
+            ttl: TTL of the probes
+            probes: Number of probes sent with this TTL
+        """
+        self.ttl = ttl
+        self.addresses = [None] * probes  # Responder per probe, None if lost
+        self.rtts = [None] * probes       # RTT in ms per probe, None if lost
+        self.marks = [""] * probes        # Unreachable marker per probe ("!H", ...)
+        self.reached = False              # Whether the destination itself answered
+
+    @property
+    def responders(self):
+        """Distinct addresses that answered, in the order of the probes."""
+        return list(dict.fromkeys(address for address in self.addresses if address))
+
+    @property
+    def loss(self):
+        """Percentage of probes that got no answer."""
+        return self.rtts.count(None) / len(self.rtts) * 100 if self.rtts else 100.0
+
+    def format(self, names=None, asn_lookup=None):
+        """
+        Format the hop like a line of ``traceroute`` output.
+
+        Args:
+            names: Optional dictionary of address -> host name; responders
+                without a name are shown numerically, as with ``traceroute -n``
+            asn_lookup: Optional function mapping an address to its origin
+                ASN, shown after the address as with ``traceroute -A``
+        """
+        parts = [f"{self.ttl:2d} "]
+        shown = None
+        for address, rtt, mark in zip(self.addresses, self.rtts, self.marks):
+            if rtt is None:
+                parts.append("*")
+                continue
+            if address != shown:
+                name = names.get(address) if names else None
+                parts.append(f"{name} ({address})" if name else address)
+                asn = asn_lookup(address) if asn_lookup else None
+                if asn is not None:
+                    parts.append(f"[AS{asn}]")
+                shown = address
+            parts.append(f"{rtt:.3f} ms" + (f" {mark}" if mark else ""))
+        return " ".join(parts)
+
+    @property
+    def avg_rtt(self):
+        """Average RTT of the answered probes in ms, or None if every probe was lost."""
+        answered = [rtt for rtt in self.rtts if rtt is not None]
+        return sum(answered) / len(answered) if answered else None
+
+    @property
+    def max_rtt(self):
+        """Slowest answered probe in ms, or None if every probe was lost."""
+        answered = [rtt for rtt in self.rtts if rtt is not None]
+        return max(answered) if answered else None
+
+    @property
+    def high_latency(self):
+        """True if any probe took longer than HIGH_LATENCY_MS."""
+        slowest = self.max_rtt
+        return slowest is not None and slowest > HIGH_LATENCY_MS
+
+    def __repr__(self):
+        return f"Hop(ttl={self.ttl}, addresses={self.responders}, rtts={self.rtts})"
+
+
+def parse_hop(line):
+    """
+    Parse one line of ``traceroute`` (Linux/macOS) or ``tracert`` (Windows) output.
+
+    The line is scanned once. traceroute prints each responder before its
+    RTTs and tracert prints it after them, so RTTs seen before any address
+    are assigned to the next address found on the line.
+
+    Args:
+        line: Line of traceroute output
+
+    Returns:
+        Hop, or None if the line is not a hop line (headers, blank lines)
+    """
+    match = HOP_LINE_RE.match(line)
+    if not match:
+        return None
+
+    addresses = []
+    rtts = []
+    marks = []
+    current = None
+    unassigned = []  # Probes answered before their responder was printed
+    for token in HOP_TOKEN_RE.finditer(match.group(2)):
+        kind = token.lastgroup
+        if kind == "rtt":
+            # tracert prints "<1 ms" for sub-millisecond replies
+            rtts.append(0.0 if token.group("below") else float(token.group("rtt")))
+            addresses.append(current)
+            marks.append("")
+            if current is None:
+                unassigned.append(len(rtts) - 1)
+        elif kind == "lost":
+            rtts.append(None)
+            addresses.append(None)
+            marks.append("")
+        elif kind == "mark":
+            if marks:
+                marks[-1] = token.group("mark")
+        else:
+            current = token.group(kind)
+            for index in unassigned:
+                addresses[index] = current
+            unassigned = []
+
+    if not rtts:
+        return None
+    hop = Hop(int(match.group(1)), len(rtts))
+    hop.addresses = addresses
+    hop.rtts = rtts
+    hop.marks = marks
+    return hop
+
+
+class TraceEngine:
+    """
+    In-process traceroute that probes every TTL at once.
+
+    Each round sends one probe to every TTL back to back, rounds are a few
+    milliseconds apart, and the ICMP time-exceeded and unreachable replies
+    are matched to their probe from the packet quoted inside them, so a
+    whole trace takes about one round trip plus the timeout for lost probes
+    instead of one round trip per probe.
+
+    Probes are Paris-style: every probe of a trace uses the same flow
+    identifiers (addresses, ports, ICMP checksum) so load balancers keep
+    them on one path and the hops stay consistent. The probe number is
+    carried in a field routers do not hash: the UDP length, the ICMP
+    sequence number (with the checksum compensated in the payload) or the
+    TCP sequence number.
+
+    Sending and receiving use raw sockets, so the engine needs
+    administrator rights; creating it raises PermissionError otherwise.
+    """
+
+    def __init__(self, protocol="udp", timeout=2, port=None, probes=3):
+        """
+        Initialize the engine.
+
+        Args:
+            protocol: "udp", "icmp" or "tcp"
+            timeout: Seconds to wait for replies after the last probe
+            port: Destination port for UDP and TCP probes
+            probes: Number of probes sent per TTL
+
+        Raises:
+            ValueError: If the protocol is not supported
+            PermissionError: If raw sockets are not available
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unsupported traceroute protocol: {protocol}")
+        self.protocol = protocol
+        self.timeout = timeout
+        self.probes = probes
+        if port is None:
+            port = 80 if protocol == "tcp" else UDP_BASE_PORT
+        self.port = port
+        self._identifier = (os.getpid() ^ id(self)) & 0xFFFF
+        self._base = random.randrange(1 << 16)
+
+        self._icmp = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        self._icmp.setblocking(False)
+        self._send_sock = None
+        self._tcp = None
+        try:
+            if protocol == "udp":
+                self._send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                # One source port for every probe keeps the flow constant
+                self._send_sock.bind(("", 0))
+            elif protocol == "tcp":
+                if sys.platform == "win32":
+                    raise OSError("Raw TCP probes are not supported on Windows")
+                # Receives SYN-ACK / RST from the destination and sends the SYNs
+                self._tcp = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+                self._tcp.setblocking(False)
+                self._send_sock = self._tcp
+            else:
+                self._send_sock = self._icmp
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the engine's sockets."""
+        for sock in (self._icmp, self._send_sock, self._tcp):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        self._icmp = self._send_sock = self._tcp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def _source_address(self, target):
+        """Return the local address the kernel would use to reach the target."""
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            probe.connect((target, self.port))
+            return probe.getsockname()
+        finally:
+            probe.close()
+
+    def _build_icmp(self, probe_id):
+        """Build an echo request whose checksum is the same for every probe."""
+        sequence = (self._base + probe_id) & 0xFFFF
+        # The filler word makes sequence + filler constant in one's complement
+        filler = 0xFFFF - sequence
+        payload = struct.pack("!H", filler) + b'\x00' * 30
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self._identifier, sequence)
+        checksum = icmp_checksum(header + payload)
+        return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, self._identifier, sequence) + payload
+
+    def _build_syn(self, probe_id, source, target):
+        """Build a TCP SYN carrying the probe number in its sequence number."""
+        sequence = (self._base << 16) + probe_id
+        header = struct.pack("!HHIIBBHHH", source[1], self.port, sequence, 0,
+                             5 << 4, TCP_SYN, 65535, 0, 0)
+        pseudo = socket.inet_aton(source[0]) + socket.inet_aton(target) + struct.pack(
+            "!BBH", 0, socket.IPPROTO_TCP, len(header))
+        checksum = icmp_checksum(pseudo + header)
+        return header[:16] + struct.pack("!H", checksum) + header[18:]
+
+    def _send_probe(self, probe_id, ttl, target, source):
+        """Send one probe with the given TTL."""
+        self._send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        if self.protocol == "udp":
+            # The UDP length identifies the probe in the quoted header
+            self._send_sock.sendto(b'\x00' * probe_id, (target, self.port))
+        elif self.protocol == "icmp":
+            self._send_sock.sendto(self._build_icmp(probe_id), (target, 0))
+        else:
+            self._send_sock.sendto(self._build_syn(probe_id, source, target), (target, 0))
+
+    def _match_quoted(self, quoted, target, source):
+        """
+        Find the probe a quoted packet inside an ICMP error belongs to.
+
+        Returns:
+            Probe number, or None if the packet is not one of ours
+        """
+        if len(quoted) < 20 or quoted[0] >> 4 != 4:
+            return None
+        header_length = (quoted[0] & 0x0F) * 4
+        protocol = quoted[9]
+        if socket.inet_ntoa(quoted[16:20]) != target:
+            return None
+        transport = quoted[header_length:header_length + 8]
+        if len(transport) < 8:
+            return None
+
+        if self.protocol == "udp" and protocol == socket.IPPROTO_UDP:
+            source_port, dest_port, length = struct.unpack("!HHH", transport[:6])
+            if source_port == source[1] and dest_port == self.port:
+                return length - 8
+        elif self.protocol == "icmp" and protocol == socket.IPPROTO_ICMP:
+            icmp_type, _code, _checksum, identifier, sequence = struct.unpack("!BBHHH", transport)
+            if icmp_type == ICMP_ECHO_REQUEST and identifier == self._identifier:
+                return (sequence - self._base) & 0xFFFF
+        elif self.protocol == "tcp" and protocol == socket.IPPROTO_TCP:
+            source_port, dest_port, sequence = struct.unpack("!HHI", transport)
+            if source_port == source[1] and dest_port == self.port and sequence >> 16 == self._base:
+                return sequence & 0xFFFF
+        return None
+
+    def _parse_icmp(self, data, target, source):
+        """
+        Match an ICMP packet to a probe.
+
+        Returns:
+            Tuple of (probe_id, final, mark) or None; final is True when the
+            path ends at this hop, because the destination answered or a
+            router reported it unreachable
+        """
+        header_length = (data[0] & 0x0F) * 4
+        icmp = data[header_length:]
+        if len(icmp) < 8:
+            return None
+        icmp_type, code = icmp[0], icmp[1]
+        if icmp_type == ICMP_ECHO_REPLY and self.protocol == "icmp":
+            _type, _code, _checksum, identifier, sequence = struct.unpack("!BBHHH", icmp[:8])
+            if identifier == self._identifier and socket.inet_ntoa(data[12:16]) == target:
+                return (sequence - self._base) & 0xFFFF, True, ""
+            return None
+        if icmp_type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+            return None
+        probe_id = self._match_quoted(icmp[8:], target, source)
+        if probe_id is None:
+            return None
+        if icmp_type == ICMP_TIME_EXCEEDED:
+            return probe_id, False, ""
+        if code == ICMP_PORT_UNREACHABLE:
+            return probe_id, True, ""
+        return probe_id, True, UNREACHABLE_MARKS.get(code, f"!<{code}>")
+
+    def _parse_tcp(self, data, target, source):
+        """
+        Match a SYN-ACK or RST from the destination to a probe.
+
+        Returns:
+            Tuple of (probe_id, True, "") or None
+        """
+        if socket.inet_ntoa(data[12:16]) != target:
+            return None
+        header_length = (data[0] & 0x0F) * 4
+        tcp = data[header_length:header_length + 14]
+        if len(tcp) < 14:
+            return None
+        source_port, dest_port, _sequence, ack, _offset, flags = struct.unpack("!HHIIBB", tcp)
+        if source_port != self.port or dest_port != source[1] or not flags & (TCP_RST | TCP_ACK):
+            return None
+        sequence = (ack - 1) & 0xFFFFFFFF
+        if sequence >> 16 != self._base:
+            return None
+        return sequence & 0xFFFF, True, ""
+
+    def trace(self, target, max_hops=30, callback=None, token=None, ttls=None):
+        """
+        Trace the route to a target.
+
+        Args:
+            target: IPv4 address to trace
+            max_hops: Highest TTL probed
+            callback: Optional function called with each Hop, in TTL order,
+                as soon as it and every hop before it are complete
+            token: Optional CancellationToken to stop the trace
+            ttls: Optional collection of TTLs to probe, to re-probe only part
+                of a known path; the other TTLs are skipped
+
+        Returns:
+            List of the probed Hop objects up to and including the destination
+        """
+        probes = self.probes
+        total = max_hops * probes
+        hops = [Hop(ttl, probes) for ttl in range(1, max_hops + 1)]
+        sent_at = [0.0] * total
+        answered = bytearray(total)
+        if ttls is not None:
+            ttls = set(ttls)
+            # Skipped TTLs count as complete from the start
+            for ttl in range(1, max_hops + 1):
+                if ttl not in ttls:
+                    answered[(ttl - 1) * probes:ttl * probes] = b'\x01' * probes
+        destination_ttl = None
+        emitted = 0
+
+        if self.protocol == "udp":
+            source = self._send_sock.getsockname()
+        elif self.protocol == "tcp":
+            # Raw TCP needs a source port no local socket will answer for
+            source = (self._source_address(target)[0], random.randrange(33000, 61000))
+        else:
+            source = None
+
+        receivers = [self._icmp] if self._tcp is None else [self._icmp, self._tcp]
+        watched = receivers if token is None else receivers + [token]
+
+        def complete(hop):
+            # A hop is complete once every probe is answered or expired
+            start = (hop.ttl - 1) * probes
+            return all(answered[start:start + probes])
+
+        attempt = 0
+        next_round = time.monotonic()
+        expires = next_round + self.timeout
+        while True:
+            last_ttl = destination_ttl or max_hops
+            while emitted < last_ttl and complete(hops[emitted]):
+                if callback and (ttls is None or emitted + 1 in ttls):
+                    callback(hops[emitted])
+                emitted += 1
+            if emitted == last_ttl:
+                break
+            if token is not None and token.cancelled:
+                break
+
+            now = time.monotonic()
+            if attempt < probes and now >= next_round:
+                # One probe per TTL per round, all sent back to back; rounds
+                # stop at the destination once an earlier round found it
+                for ttl in range(1, last_ttl + 1):
+                    if ttls is not None and ttl not in ttls:
+                        continue
+                    probe_id = (ttl - 1) * probes + attempt
+                    sent_at[probe_id] = time.monotonic()
+                    try:
+                        self._send_probe(probe_id, ttl, target, source)
+                    except OSError as e:
+                        logging.error(f"Trace route send error for {target}: {e}")
+                        answered[probe_id] = 1
+                attempt += 1
+                now = time.monotonic()
+                next_round = now + ROUND_GAP
+                expires = now + self.timeout
+                continue
+
+            if attempt == probes and now >= expires:
+                # Everything still unanswered is lost
+                for probe_id in range(total):
+                    answered[probe_id] = 1
+                continue
+
+            wake = next_round if attempt < probes else expires
+            readable, _, _ = select.select(watched, [], [], max(0, wake - now))
+            for sock in receivers:
+                if sock not in readable:
+                    continue
+                while True:
+                    try:
+                        data, address = sock.recvfrom(2048)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError as e:
+                        logging.error(f"Trace route receive error: {e}")
+                        break
+                    received_at = time.monotonic()
+                    if len(data) < 20:
+                        continue
+                    if sock is self._tcp:
+                        match = self._parse_tcp(data, target, source)
+                    else:
+                        match = self._parse_icmp(data, target, source)
+                    if match is None:
+                        continue
+                    probe_id, final, mark = match
+                    if not 0 <= probe_id < total or answered[probe_id]:
+                        continue
+                    answered[probe_id] = 1
+                    hop = hops[probe_id // probes]
+                    slot = probe_id % probes
+                    hop.addresses[slot] = address[0]
+                    hop.rtts[slot] = (received_at - sent_at[probe_id]) * 1000
+                    hop.marks[slot] = mark
+                    if final:
+                        # A router's unreachable also ends the path, but only
+                        # an answer from the target itself reaches it
+                        if address[0] == target:
+                            hop.reached = True
+                        if destination_ttl is None or hop.ttl < destination_ttl:
+                            destination_ttl = hop.ttl
+
+        if ttls is not None:
+            return [hop for hop in hops[:emitted] if hop.ttl in ttls]
+        return hops[:emitted]
@@ -1,11 +1,13 @@
 import wx
 import wx.lib.agw.flatnotebook as fnb
+import csv
 import os
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import sys
 import psutil
 import platform
+import time
 import traceback
 
 # Configure logging with more detailed format
@@ -60,6 +62,10 @@ from ui.about_view import AboutView
 
 # Import core utilities
 from core.network_utils import NetworkUtils, NetworkValidator
+from core.latency_series import LatencySeries
+from core.ping_stats import PingStatistics
+from core.cancellation import CancellationToken
+from core.monitor import PingMonitor
 
 # Debug window for showing logs in real-time
 class DebugLogWindow(wx.Frame):
@@ -160,6 +166,12 @@ class LogHandler(logging.Handler):
 class NetworkDiagnosticApp(wx.Frame):
     """Main application window for the Network Diagnostic Tool."""
     
+    # Seconds between chart redraws while a ping test or continuous monitor runs
+    MONITOR_REDRAW_INTERVAL = 0.5
+    
+    # Seconds between hop table refreshes while a route monitor runs
+    ROUTE_MONITOR_FRAME_INTERVAL = 0.5
+    
     def __init__(self):
         super().__init__(
             None, 
@@ -195,6 +207,9 @@ class NetworkDiagnosticApp(wx.Frame):
         # Add view debug log checkbox to menu
         self._create_menus()
         
+        # Load the offline IP-to-ASN index, if a routing-table dump is available
+        self._asn_index_future = self.executor.submit(self._load_asn_index)
+        
         # Load initial network info
         self._load_network_info()
         
@@ -298,10 +313,12 @@ class NetworkDiagnosticApp(wx.Frame):
         
         # Ping Test events
         self.ping_view.start_button.Bind(wx.EVT_BUTTON, self.on_start_ping)
+        self.ping_view.stop_button.Bind(wx.EVT_BUTTON, self.on_stop_ping)
         
         # Trace Route events
         self.traceroute_view.start_button.Bind(wx.EVT_BUTTON, self.on_start_trace)
         self.traceroute_view.cancel_button.Bind(wx.EVT_BUTTON, self.on_cancel_trace)
+        self.traceroute_view.export_button.Bind(wx.EVT_BUTTON, self.on_export_trace)
         
         # Network Info events
         self.network_info_view.refresh_button.Bind(wx.EVT_BUTTON, self.on_refresh_network_info)
@@ -380,42 +397,68 @@ class NetworkDiagnosticApp(wx.Frame):
         
         # Update UI
         self.ping_view.clear_results()
-        self.ping_view.start_button.Disable()
+        self.ping_view.set_running_state(True)
         self.status_bar.SetStatusText(f"Running Ping Test to {target}...", 0)
         
+        # Stop button cancels this token
+        self.ping_token = CancellationToken()
+        ping_token = self.ping_token
+        continuous = params['continuous']
+        
         # Start background task
         def ping_task():
             try:
-                # Update progress as the ping runs
-                def progress_callback(value):
-                    wx.CallAfter(self.ping_view.update_progress, value)
+                count = None if continuous else params['count']
                 
-                # Run the ping test
-                latency_data, packet_loss = self.network_utils.run_ping(
-                    target, 
-                    params['count'], 
-                    params['interval'],
-                    progress_callback
-                )
+                if params['mode'] == 'tcp':
+                    samples = self.network_utils.stream_tcp_ping(
+                        target, params['port'], count, params['interval'], token=ping_token
+                    )
+                else:
+                    samples = self.network_utils.stream_ping(
+                        target, count, params['interval'], token=ping_token
+                    )
+                
+                if continuous:
+                    self._run_ping_monitor(target, samples)
+                    return
                 
+                latency_data = LatencySeries(capacity=count)
+                ping_stats = PingStatistics()
+
+                # Consume samples as they arrive to keep the chart and stats live;
+                # redraws are throttled and get a copy, since the series keeps growing.
+                # A loss is only reported at its timeout, after replies to later
+                # probes, so the series is written by sequence number and the
+                # statistics and progress follow the probes in send order
+                waiting = {}
+                in_order = 0
+                last_redraw = 0
+                for sample in samples:
+                    latency_data.set(sample.sequence, sample.rtt)
+                    waiting[sample.sequence] = sample.rtt
+                    while in_order in waiting:
+                        ping_stats.add(waiting.pop(in_order))
+                        in_order += 1
+                    now = time.monotonic()
+                    if now - last_redraw >= self.MONITOR_REDRAW_INTERVAL:
+                        last_redraw = now
+                        wx.CallAfter(self.ping_view.update_progress, in_order / count * 100)
+                        wx.CallAfter(self.ping_view.update_live_stats, ping_stats.snapshot())
+                        wx.CallAfter(self.ping_view.update_chart, latency_data.copy())
+
+                # A stopped run never reports its probes in flight; they count as
+                # lost, as the NaN slots the series already holds for them do
+                for sequence in range(in_order, len(latency_data)):
+                    ping_stats.add(waiting.pop(sequence, None))
+
                 # Process and display results
-                if latency_data is None:
+                if not latency_data:
                     wx.CallAfter(self.show_ping_results, None, 100.0, None)
                     return
                     
-                valid_latencies = [lat for lat in latency_data if lat > 0]
-                if valid_latencies:
-                    stats = {
-                        'avg_latency': sum(valid_latencies) / len(valid_latencies),
-                        'min_latency': min(valid_latencies),
-                        'max_latency': max(valid_latencies)
-                    }
-                else:
-                    stats = {
-                        'avg_latency': 0,
-                        'min_latency': 0,
-                        'max_latency': 0
-                    }
+                packet_loss = ping_stats.packet_loss
+                stats = ping_stats.snapshot()
                     
                 wx.CallAfter(self.show_ping_results, latency_data, packet_loss, stats)
                 
@@ -423,10 +466,49 @@ class NetworkDiagnosticApp(wx.Frame):
                 logging.error(f"Ping test error: {e}")
                 wx.CallAfter(self.status_bar.SetStatusText, f"Error in ping test: {str(e)}", 0)
             finally:
-                wx.CallAfter(self.ping_view.start_button.Enable)
+                ping_token.close()
+                wx.CallAfter(self.ping_view.set_running_state, False)
         
         self.executor.submit(ping_task)
         
+    def _run_ping_monitor(self, target, samples):
+        """
+        Feed a never-ending ping stream into a PingMonitor until it is stopped.
+        
+        Redraws are throttled, and the chart gets a downsample matching its
+        width from the raw samples or a rollup, so the UI cost stays flat
+        however long the monitor runs.
+        
+        Args:
+            target: Target being monitored, for the status bar
+            samples: PingSample generator from stream_ping or stream_tcp_ping
+        """
+        monitor = PingMonitor()
+        last_redraw = 0
+        
+        wx.CallAfter(self.ping_view.progress_gauge.Pulse)
+        wx.CallAfter(self.status_bar.SetStatusText, f"Monitoring {target}... press Stop to finish", 0)
+        
+        for sample in samples:
+            monitor.add(sample)
+            now = time.monotonic()
+            if now - last_redraw >= self.MONITOR_REDRAW_INTERVAL:
+                last_redraw = now
+                series = monitor.chart_series(self.ping_view.chart_width)
+                wx.CallAfter(self.ping_view.update_live_stats, monitor.stats.snapshot())
+                wx.CallAfter(self.ping_view.update_monitor_chart, *series)
+        
+        # Final redraw so the chart includes the last samples
+        series = monitor.chart_series(self.ping_view.chart_width)
+        wx.CallAfter(self.ping_view.update_monitor_chart, *series)
+        wx.CallAfter(self.show_monitor_results, monitor.stats.packet_loss, monitor.stats.snapshot())
+        
+    def on_stop_ping(self, event):
+        """Stop the running ping test or monitor."""
+        if hasattr(self, 'ping_token'):
+            self.ping_token.cancel()
+            self.status_bar.SetStatusText("Stopping ping...", 0)
+        
     def show_ping_results(self, latency_data, packet_loss, stats):
         """Show ping results in the UI."""
         # Update status bar
@@ -442,9 +524,33 @@ class NetworkDiagnosticApp(wx.Frame):
             self.ping_view.show_quality_assessment(quality, description)
             return
             
+        self._show_ping_quality(packet_loss, stats)
+        
+    def show_monitor_results(self, packet_loss, stats):
+        """Show the final statistics of a continuous ping monitor."""
+        self.status_bar.SetStatusText("Ping Monitor Stopped", 0)
+        self.ping_view.update_progress(100)
+        
+        # The chart already shows the monitor series, so no latency data is passed
+        self.ping_view.update_results(None, packet_loss, stats)
+        
+        if not stats.get('received'):
+            self.ping_view.show_quality_assessment(
+                "poor", "No replies were received while monitoring."
+            )
+            return
+        self._show_ping_quality(packet_loss, stats)
+        
+    def _show_ping_quality(self, packet_loss, stats):
+        """Show the connection quality assessment for ping statistics."""
         # Get quality assessment
         avg_latency = stats['avg_latency'] if stats else 0
-        quality, description, icon_name = self.network_utils.analyze_ping_results(avg_latency, packet_loss)
+        quality, description, icon_name = self.network_utils.analyze_ping_results(
+            avg_latency,
+            packet_loss,
+            stats.get('jitter') if stats else None,
+            stats.get('p95_latency') if stats else None
+        )
         
         # Load the icon if available
         icon_bitmap = None
@@ -467,39 +573,119 @@ class NetworkDiagnosticApp(wx.Frame):
             return
             
         max_hops = self.traceroute_view.get_max_hops()
+        protocol = self.traceroute_view.get_protocol()
+        quick = self.traceroute_view.is_quick_retrace()
         
         # Update UI
         self.traceroute_view.clear_results()
         self.traceroute_view.set_controls_state(True)  # Set to running state
+        
+        # Token used by the Cancel button to stop the trace immediately
+        self.trace_token = CancellationToken()
+        trace_token = self.trace_token
+        
+        # Reverse DNS answers arrive on lookup worker threads
+        def on_name(address, name):
+            if name:
+                wx.CallAfter(self.traceroute_view.set_host_name, address, name)
+        
+        continuous = self.traceroute_view.is_continuous()
+        targets = self.traceroute_view.get_targets()
+        if continuous and len(targets) > 1:
+            wx.MessageBox("Continuous mode traces a single target", "Input Required", wx.OK | wx.ICON_INFORMATION)
+            self.traceroute_view.set_controls_state(False)
+            return
+            
+        self.traceroute_view.show_hop_table(continuous)
+        if len(targets) > 1:
+            self.status_bar.SetStatusText(f"Tracing {len(targets)} routes...", 0)
+            self.trace_future = self.executor.submit(
+                self._batch_trace_task, targets, max_hops, protocol, trace_token, on_name
+            )
+            return
+        if continuous:
+            self.status_bar.SetStatusText(f"Monitoring route to {target}... press Cancel to stop", 0)
+            self.trace_future = self.executor.submit(
+                self._route_monitor_task, target, max_hops, protocol, trace_token, on_name
+            )
+            return
+            
         self.status_bar.SetStatusText(f"Running Trace Route to {target}...", 0)
         
         # Start background task
         def trace_task():
             try:
-                # Run the trace with real-time updates
-                output = self.network_utils.run_trace_route(
-                    target, 
-                    max_hops,
-                    lambda line: wx.CallAfter(self.traceroute_view.update_trace_output, line)
-                )
+                # Run the trace with real-time updates; every line arrives parsed
+                hops = []
+                
+                def on_line(line, hop):
+                    if hop is not None:
+                        hops.append(hop)
+                        # Names are filled in as they resolve; the trace never waits on DNS
+                        NetworkValidator.reverse_lookup_async(hop.responders, on_name)
+                    wx.CallAfter(self.traceroute_view.update_trace_output, line, hop)
+                
+                reused = {}
+                if quick:
+                    # Reuse fresh hops of the last stored trace, probe the rest
+                    try:
+                        quick_hops, reused = self.network_utils.quick_trace_route(
+                            target,
+                            max_hops,
+                            lambda hop: on_line(hop.format() + '\n', hop),
+                            protocol,
+                            token=trace_token
+                        )
+                        output = "" if quick_hops is not None else f"Error: could not resolve {target}"
+                    except OSError as e:
+                        output = f"Error: quick re-trace needs raw socket access ({e})"
+                else:
+                    output = self.network_utils.run_trace_route(
+                        target, 
+                        max_hops,
+                        on_line,
+                        token=trace_token,
+                        protocol=protocol
+                    )
                 
                 # Process completed trace
-                if "Error" in output:
+                if trace_token.cancelled:
+                    # The cancel handler has already updated the UI
+                    return
+                elif "Error" in output:
                     wx.CallAfter(
                         self.traceroute_view.show_notification,
                         f"Trace route failed: {output}",
                         "error"
                     )
-                elif "timeout" in output.lower():
+                elif "timeout" in output.lower() or "timed out" in output.lower():
                     wx.CallAfter(
                         self.traceroute_view.show_notification,
                         "Trace route timed out. The target may be unreachable.",
                         "warning"
                     )
                 else:
+                    # Compare with the last known-good path of this target
+                    previous, changes = self.network_utils.record_trace(target, hops, protocol, reused)
+                    changed = [change for change in changes if change.status != "same"]
+                    if previous is not None:
+                        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(previous.started))
+                        lines = [f"\nChanges since the last good trace ({when}):\n"]
+                        lines += [change.describe() + "\n" for change in changed] or ["None\n"]
+                        for line in lines:
+                            wx.CallAfter(self.traceroute_view.update_trace_output, line)
+                    
                     # Analyze for high-latency hops
-                    high_latency = any("ms" in line and any(int(val) > 100 for val in line.split() if val.isdigit()) for line in output.splitlines())
-                    if high_latency:
+                    high_latency = any(hop.high_latency for hop in hops)
+                    # Only responder changes count; slower or faster hops are not a new route
+                    rerouted = [change for change in changed if change.status in ("changed", "lost", "new", "gone")]
+                    if rerouted:
+                        wx.CallAfter(
+                            self.traceroute_view.show_notification,
+                            f"The route changed at {len(rerouted)} hops since the last good trace.",
+                            "warning"
+                        )
+                    elif high_latency:
                         wx.CallAfter(
                             self.traceroute_view.show_notification,
                             "High-latency hops detected in the route. Highlighted in orange.",
@@ -520,19 +706,200 @@ class NetworkDiagnosticApp(wx.Frame):
                     "error"
                 )
             finally:
-                wx.CallAfter(self.status_bar.SetStatusText, "Trace Route Complete", 0)
+                if not trace_token.cancelled:
+                    wx.CallAfter(self.status_bar.SetStatusText, "Trace Route Complete", 0)
                 wx.CallAfter(self.traceroute_view.set_controls_state, False)  # Set to not running
                 
         self.trace_future = self.executor.submit(trace_task)
         
+    def _batch_trace_task(self, targets, max_hops, protocol, trace_token, on_name):
+        """
+        Trace many targets concurrently and summarize the hops their paths share.
+        """
+        shared_hops = set()
+        
+        def on_line(target, line, hop, shared):
+            if hop is not None:
+                NetworkValidator.reverse_lookup_async(hop.responders, on_name)
+            wx.CallAfter(self.traceroute_view.update_trace_output, line, hop, target)
+            new_shared = set(shared) - shared_hops
+            if new_shared:
+                shared_hops.update(new_shared)
+                wx.CallAfter(
+                    self.status_bar.SetStatusText,
+                    f"Tracing {len(targets)} routes... {len(shared_hops)} shared hops found",
+                    0
+                )
+        
+        try:
+            graph, outputs = self.network_utils.run_trace_route_many(
+                targets, max_hops, on_line, protocol, token=trace_token
+            )
+            if trace_token.cancelled:
+                # The cancel handler has already updated the UI
+                return
+                
+            # Summary of the merged topology, closest hops first
+            shared = graph.shared_nodes()
+            lines = [f"\nShared hops ({len(targets)} destinations):\n"]
+            for node in shared:
+                lines.append(
+                    f"{node.min_ttl:2d}  {node.address}  {len(node.destinations)}/{len(targets)} destinations"
+                    f"  avg {node.rtt.mean:.3f} ms\n"
+                )
+            if not shared:
+                lines.append("None\n")
+            for line in lines:
+                wx.CallAfter(self.traceroute_view.update_trace_output, line)
+                
+            failed = [target for target, output in outputs.items() if output.startswith("Error")]
+            summary = graph.summary()
+            if failed:
+                wx.CallAfter(
+                    self.traceroute_view.show_notification,
+                    f"Trace route failed for: {', '.join(failed)}",
+                    "error"
+                )
+            else:
+                wx.CallAfter(
+                    self.traceroute_view.show_notification,
+                    f"Traced {len(targets)} routes: {summary['nodes']} unique hops, "
+                    f"{summary['shared_nodes']} shared by several paths.",
+                    "success"
+                )
+        except Exception as e:
+            logging.error(f"Batch trace route error: {e}")
+            wx.CallAfter(
+                self.traceroute_view.show_notification,
+                f"Error: {str(e)}",
+                "error"
+            )
+        finally:
+            if not trace_token.cancelled:
+                wx.CallAfter(self.status_bar.SetStatusText, "Trace Route Complete", 0)
+            wx.CallAfter(self.traceroute_view.set_controls_state, False)
+        
+    def _route_monitor_task(self, target, max_hops, protocol, trace_token, on_name):
+        """
+        Run an MTR-style route monitor until the trace is cancelled.
+        
+        The hop table is refreshed at most ROUTE_MONITOR_FRAME_INTERVAL
+        seconds apart, however fast the probe rounds are. Host names of new
+        responders are looked up in the background and passed to on_name.
+        """
+        last_frame = 0
+        looked_up = set()
+        
+        def on_round(monitor, changes):
+            nonlocal last_frame
+            responders = [stats.address for stats in monitor.hops[:monitor.depth]
+                          if stats.address and stats.address not in looked_up]
+            if responders:
+                looked_up.update(responders)
+                NetworkValidator.reverse_lookup_async(responders, on_name)
+            for _time, ttl, old_address, new_address in changes:
+                wx.CallAfter(
+                    self.traceroute_view.show_notification,
+                    f"Route changed at hop {ttl}: {old_address} -> {new_address}",
+                    "warning"
+                )
+            now = time.monotonic()
+            if now - last_frame >= self.ROUTE_MONITOR_FRAME_INTERVAL:
+                last_frame = now
+                wx.CallAfter(self.traceroute_view.update_hop_table, monitor.rows())
+        
+        try:
+            monitor = self.network_utils.run_route_monitor(
+                target, max_hops, protocol, callback=on_round, token=trace_token
+            )
+            if monitor is None:
+                wx.CallAfter(
+                    self.traceroute_view.show_notification,
+                    f"Could not resolve {target}",
+                    "error"
+                )
+            else:
+                # Final frame with the last round
+                wx.CallAfter(self.traceroute_view.update_hop_table, monitor.rows())
+        except PermissionError:
+            wx.CallAfter(
+                self.traceroute_view.show_notification,
+                "Continuous trace needs administrator rights to send raw probes.",
+                "error"
+            )
+        except Exception as e:
+            logging.error(f"Route monitor error: {e}")
+            wx.CallAfter(
+                self.traceroute_view.show_notification,
+                f"Error: {str(e)}",
+                "error"
+            )
+        finally:
+            wx.CallAfter(self.traceroute_view.set_controls_state, False)
+        
     def on_cancel_trace(self, event):
         """Cancel a running trace route."""
         if hasattr(self, 'trace_future') and not self.trace_future.done():
             self.trace_future.cancel()
+            self.trace_token.cancel()
             self.status_bar.SetStatusText("Trace Route Cancelled", 0)
             self.traceroute_view.set_controls_state(False)
             self.traceroute_view.show_notification("Trace route cancelled by user", "info")
         
+    def on_export_trace(self, event):
+        """Export the hops of the last trace route to a CSV file."""
+        hops = self.traceroute_view.hops
+        if not hops:
+            return
+            
+        with wx.FileDialog(
+            self, "Export Trace Route", wildcard="CSV files (*.csv)|*.csv",
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT
+        ) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+                
+            try:
+                probes = max(len(hop.rtts) for hop in hops)
+                with open(fileDialog.GetPath(), 'w', newline='') as file:
+                    writer = csv.writer(file)
+                    names = self.traceroute_view.host_names
+                    destinations = self.traceroute_view.hop_destinations
+                    origins = self.network_utils.lookup_asns(
+                        address for hop in hops for address in hop.responders
+                    )
+                    writer.writerow(
+                        ["Destination", "Hop", "Address", "Host", "ASN", "Prefix"]
+                        + [f"RTT {n} (ms)" for n in range(1, probes + 1)] + ["Loss (%)"]
+                    )
+                    for hop, destination in zip(hops, destinations):
+                        rtts = ["" if rtt is None else f"{rtt:.3f}" for rtt in hop.rtts]
+                        rtts += [""] * (probes - len(rtts))
+                        writer.writerow(
+                            [
+                                destination or self.traceroute_view.get_target(),
+                                hop.ttl,
+                                " ".join(hop.responders) or "*",
+                                " ".join(names.get(address) or "" for address in hop.responders).strip(),
+                                " ".join(f"AS{origins[address][0]}" for address in hop.responders if origins.get(address)),
+                                " ".join(origins[address][1] for address in hop.responders if origins.get(address)),
+                            ] + rtts + [f"{hop.loss:.0f}"]
+                        )
+                wx.MessageBox("Trace route exported successfully.", "Success", wx.OK | wx.ICON_INFORMATION)
+            except Exception as e:
+                wx.MessageBox(f"Error exporting trace route: {e}", "Error", wx.OK | wx.ICON_ERROR)
+        
+    def _load_asn_index(self):
+        """Load the ASN index and label trace hops with it once loaded."""
+        if self.network_utils.load_asn_index():
+            wx.CallAfter(setattr, self.traceroute_view, "asn_lookup", self.network_utils.lookup_asn)
+        
+    def _label_public_ip(self, public_ip):
+        """Show the origin ASN of the public IP, if the loaded index covers it."""
+        origin = self.network_utils.describe_origin(public_ip)
+        if origin:
+            wx.CallAfter(self.network_info_view.set_public_asn, public_ip, origin)
+        
     def _load_network_info(self):
         """Load network information in the background."""
         self.network_info_view.set_loading_state(True)
@@ -545,6 +912,12 @@ class NetworkDiagnosticApp(wx.Frame):
                 # Update UI with the information
                 wx.CallAfter(self.network_info_view.update_network_info, info)
                 wx.CallAfter(self.status_bar.SetStatusText, "Network Information Loaded", 0)
+                
+                # The ASN index may still be loading; label the public IP once it is
+                if 'public_asn' not in info:
+                    self._asn_index_future.add_done_callback(
+                        lambda future: self._label_public_ip(info.get('public_ip'))
+                    )
             except Exception as e:
                 logging.error(f"Error loading network info: {e}")
                 wx.CallAfter(
@@ -589,10 +962,15 @@ class NetworkDiagnosticApp(wx.Frame):
                     elif "No internet" in message:
                         wx.CallAfter(self.status_bar.SetStatusText, "No Internet Connection", 1)
                 
+                # The chart polls each phase's series at its own frame rate
+                def series_callback(phase, series):
+                    wx.CallAfter(self.speedtest_view.track_throughput, phase, series)
+                
                 # Run the speed test with selected server
                 download, upload, ping = self.network_utils.run_speed_test(
                     progress_callback,
-                    selected_server
+                    selected_server,
+                    series_callback=series_callback
                 )
                 
                 # Update UI with results
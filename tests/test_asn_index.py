@@ -0,0 +1,72 @@
+import pytest
+
+from core.asn_index import AsnIndex, build_index, open_index
+
+PREFIXES = """\
+# prefix\tlength\tasn
+1.0.0.0\t24\t13335
+10.0.0.0\t8\t100
+10.1.0.0\t16\t200
+10.1.2.0\t24\t300_301
+10.1.2.128\t25\t400
+2001:db8::\t32\t64496
+192.168.0.0/16 64512
+not an address\t8\t1
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    source = tmp_path / "routeviews.pfx2as"
+    source.write_text(PREFIXES)
+    index_path = str(tmp_path / "asn.idx")
+    assert build_index(str(source), index_path) == 6
+    with AsnIndex(index_path) as index:
+        yield index
+
+
+def test_lookup_finds_longest_prefix(index):
+    assert index.lookup("1.0.0.77") == (13335, "1.0.0.0/24")
+    assert index.lookup("10.200.0.1") == (100, "10.0.0.0/8")
+    assert index.lookup("10.1.9.9") == (200, "10.1.0.0/16")
+    assert index.lookup("10.1.2.5") == (300, "10.1.2.0/24")
+    assert index.lookup("10.1.2.200") == (400, "10.1.2.128/25")
+    assert index.lookup("192.168.4.4") == (64512, "192.168.0.0/16")
+
+
+def test_lookup_outside_every_prefix(index):
+    assert index.lookup("8.8.8.8") is None
+    assert index.asn("11.0.0.0") is None
+    assert index.asn("255.255.255.255") is None
+
+
+def test_lookup_rejects_non_ipv4(index):
+    assert index.asn("2001:db8::1") is None
+    assert index.asn("bogus") is None
+    assert index.lookup(None) is None
+
+
+def test_lookup_many_skips_none_and_duplicates(index):
+    results = index.lookup_many(["10.1.2.5", None, "10.1.2.5", "8.8.8.8"])
+    assert results == {"10.1.2.5": (300, "10.1.2.0/24"), "8.8.8.8": None}
+
+
+def test_truncated_index_is_rejected(tmp_path):
+    source = tmp_path / "routeviews.pfx2as"
+    source.write_text(PREFIXES)
+    index_path = tmp_path / "asn.idx"
+    build_index(str(source), str(index_path))
+    index_path.write_bytes(index_path.read_bytes()[:-1])
+
+    with pytest.raises(ValueError):
+        AsnIndex(str(index_path))
+
+
+def test_open_index_builds_from_source(tmp_path):
+    source = tmp_path / "routeviews.pfx2as"
+    source.write_text(PREFIXES)
+    index = open_index(str(source), str(tmp_path / "asn.idx"))
+    try:
+        assert index.asn("1.0.0.1") == 13335
+    finally:
+        index.close()
@@ -0,0 +1,84 @@
+import select
+import threading
+import time
+
+import pytest
+
+from core.cancellation import CancellationToken, OperationCancelled
+
+
+def test_cancel_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.register(lambda: calls.append("abort"))
+
+    token.cancel()
+    token.cancel("shutdown")
+
+    assert calls == ["abort"]
+    assert token.reason == "cancelled"
+    with pytest.raises(OperationCancelled):
+        token.raise_if_cancelled()
+
+
+def test_register_after_cancel_runs_at_once():
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+
+    token.register(lambda: calls.append("abort"))
+
+    assert calls == ["abort"]
+
+
+def test_unregistered_callbacks_do_not_run():
+    token = CancellationToken()
+    calls = []
+    callback = token.register(lambda: calls.append("abort"))
+    token.unregister(callback)
+
+    token.cancel()
+
+    assert calls == []
+
+
+def test_deadline_cancels_the_token_on_time():
+    calls = []
+    with CancellationToken(timeout=0.1) as token:
+        token.register(lambda: calls.append(token.reason))
+        started = time.monotonic()
+
+        assert token.wait(2)
+        assert time.monotonic() - started < 1
+        assert token.deadline_exceeded
+        assert calls == ["deadline"]
+
+
+def test_token_wakes_select_when_cancelled():
+    with CancellationToken() as token:
+        threading.Timer(0.05, token.cancel).start()
+        started = time.monotonic()
+        readable, _, _ = select.select([token], [], [], 2)
+
+        assert readable == [token]
+        assert time.monotonic() - started < 1
+
+
+def test_child_follows_its_parent():
+    parent = CancellationToken()
+    child = parent.child()
+
+    parent.cancel("shutdown")
+
+    assert child.cancelled
+    assert child.reason == "shutdown"
+
+
+def test_closed_child_is_detached_from_its_parent():
+    parent = CancellationToken()
+    child = parent.child()
+    child.close()
+
+    parent.cancel()
+
+    assert not child.cancelled
@@ -0,0 +1,155 @@
+import socket
+import threading
+
+import pytest
+
+from core.dns_cache import DnsCache
+
+
+class FakeResolver:
+    """Stands in for getaddrinfo and gethostbyaddr, counting the queries."""
+
+    def __init__(self, monkeypatch):
+        self.forward = {}   # hostname -> list of addresses or exception
+        self.reverse = {}   # address -> name or exception
+        self.queries = 0
+        monkeypatch.setattr(socket, "getaddrinfo", self.getaddrinfo)
+        monkeypatch.setattr(socket, "gethostbyaddr", self.gethostbyaddr)
+
+    def getaddrinfo(self, hostname, port, family=0, kind=0):
+        self.queries += 1
+        answer = self.forward[hostname]
+        if isinstance(answer, Exception):
+            raise answer
+        return [(socket.AF_INET, kind, 6, "", (address, 0)) for address in answer]
+
+    def gethostbyaddr(self, address):
+        self.queries += 1
+        answer = self.reverse[address]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer, [], [address]
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    return FakeResolver(monkeypatch)
+
+
+def test_answers_are_cached(resolver):
+    resolver.forward["example.test"] = ["192.0.2.1", "192.0.2.1", "192.0.2.2"]
+    cache = DnsCache()
+
+    assert cache.resolve("example.test") == ("192.0.2.1", "192.0.2.2")
+    assert cache.resolve("EXAMPLE.test") == ("192.0.2.1", "192.0.2.2")
+    assert resolver.queries == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+
+def test_unknown_names_are_cached_negatively(resolver):
+    resolver.forward["missing.test"] = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    cache = DnsCache()
+
+    assert cache.resolve("missing.test") == ()
+    assert cache.resolve("missing.test") == ()
+    assert resolver.queries == 1
+
+
+def test_transient_failures_are_not_cached(resolver):
+    resolver.forward["flaky.test"] = socket.gaierror(socket.EAI_AGAIN, "Temporary failure in name resolution")
+    cache = DnsCache()
+
+    assert cache.resolve("flaky.test") == ()
+    # The resolver is back; the next call asks it again
+    resolver.forward["flaky.test"] = ["192.0.2.7"]
+    assert cache.resolve("flaky.test") == ("192.0.2.7",)
+    assert resolver.queries == 2
+
+
+def test_negative_answers_expire(resolver):
+    resolver.forward["later.test"] = socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    cache = DnsCache(negative_ttl=0)
+
+    assert cache.resolve("later.test") == ()
+    resolver.forward["later.test"] = ["192.0.2.8"]
+    assert cache.resolve("later.test") == ("192.0.2.8",)
+
+
+def test_reverse_distinguishes_missing_ptr_from_failure(resolver):
+    resolver.reverse["192.0.2.1"] = socket.herror(1, "Unknown host")
+    resolver.reverse["192.0.2.2"] = socket.herror(2, "Host name lookup failure")
+    cache = DnsCache()
+
+    assert cache.reverse("192.0.2.1") is None
+    assert cache.reverse("192.0.2.1") is None
+    assert cache.reverse("192.0.2.2") is None
+    resolver.reverse["192.0.2.2"] = "router.example.test"
+    assert cache.reverse("192.0.2.2") == "router.example.test"
+    assert resolver.queries == 3
+
+
+def test_reverse_async_queries_each_address_once(resolver):
+    resolver.reverse["192.0.2.1"] = "one.example.test"
+    resolver.reverse["192.0.2.2"] = socket.herror(1, "Unknown host")
+    cache = DnsCache()
+    results = {}
+    done = threading.Event()
+
+    def on_name(address, name):
+        results[address] = name
+        if len(results) == 2:
+            done.set()
+
+    cache.reverse_async(["192.0.2.1", "192.0.2.2", "192.0.2.1", None], on_name)
+    assert done.wait(5)
+    cache.close()
+
+    assert results == {"192.0.2.1": "one.example.test", "192.0.2.2": None}
+    assert resolver.queries == 2
+    assert cache.reverse("192.0.2.1") == "one.example.test"
+
+
+def test_reverse_async_shares_a_lookup_in_flight(resolver, monkeypatch):
+    release = threading.Event()
+    answer = resolver.gethostbyaddr
+
+    def slow_gethostbyaddr(address):
+        release.wait(5)
+        return answer(address)
+
+    monkeypatch.setattr(socket, "gethostbyaddr", slow_gethostbyaddr)
+    resolver.reverse["192.0.2.1"] = "one.example.test"
+    cache = DnsCache()
+    results = []
+    done = threading.Event()
+
+    def broken(address, name):
+        raise RuntimeError("view went away")
+
+    def on_name(address, name):
+        results.append(name)
+        if len(results) == 2:
+            done.set()
+
+    # Two traces ask for the same hop while its lookup is running
+    cache.reverse_async(["192.0.2.1"], broken)
+    cache.reverse_async(["192.0.2.1"], on_name)
+    cache.reverse_async(["192.0.2.1"], on_name)
+    release.set()
+    assert done.wait(5)
+    cache.close()
+
+    assert results == ["one.example.test", "one.example.test"]
+    assert resolver.queries == 1
+
+
+def test_reverse_async_delivers_cached_names_at_once(resolver):
+    resolver.reverse["192.0.2.1"] = "one.example.test"
+    cache = DnsCache()
+    assert cache.reverse("192.0.2.1") == "one.example.test"
+    results = []
+
+    cache.reverse_async(["192.0.2.1"], lambda address, name: results.append(name))
+
+    assert results == ["one.example.test"]
+    assert resolver.queries == 1
@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from core.latency_series import LatencySeries
+
+
+def test_lost_packets_are_nan_not_zero():
+    series = LatencySeries([10.0, None, 0.0, float("nan")])
+
+    values = list(series)
+    assert values[0] == 10.0 and values[2] == 0.0
+    assert math.isnan(values[1]) and math.isnan(values[3])
+    assert (series.count, series.received, series.lost) == (4, 2, 2)
+    assert series.packet_loss == 50.0
+    assert series.min == 0.0 and series.max == 10.0
+
+
+def test_set_places_out_of_order_loss_at_its_sequence():
+    series = LatencySeries(capacity=4)
+    # Replies to probes 1 and 2 arrive before probe 0 times out
+    series.set(1, 10.0)
+    series.set(2, 30.0)
+    series.set(0, None)
+    series.set(3, 20.0)
+
+    values = list(series)
+    assert math.isnan(values[0])
+    assert values[1:] == [10.0, 30.0, 20.0]
+    assert series.lost == 1
+    assert series.packet_loss == 25.0
+    assert series.avg == 20.0
+    assert series.percentile(50) == 20.0
+
+
+def test_unset_slots_count_as_lost_until_set():
+    series = LatencySeries()
+    series.set(2, 5.0)
+    assert series.count == 3
+    assert series.lost == 2
+
+    series.set(0, 7.0)
+    assert series.lost == 1
+    assert series.received == 2
+    assert series.max == 7.0
+
+
+def test_set_rejects_overwriting_a_reply():
+    series = LatencySeries()
+    series.set(0, 5.0)
+    with pytest.raises(ValueError):
+        series.set(0, 6.0)
+    with pytest.raises(ValueError):
+        series.set(-1, 6.0)
+
+
+def test_views_stay_valid_while_the_series_grows():
+    series = LatencySeries(capacity=2)
+    series.append(1.0)
+    view = series.view()
+    for rtt in range(100):
+        series.append(float(rtt))
+
+    assert list(view) == [1.0]
+    assert len(series) == 101
+
+
+def test_copy_is_independent():
+    series = LatencySeries([1.0, 2.0])
+    clone = series.copy()
+    series.append(None)
+
+    assert list(clone) == [1.0, 2.0]
+    assert clone.lost == 0
+    assert series.lost == 1
+
+
+def test_stats_of_empty_series():
+    series = LatencySeries()
+    assert series.percentile(95) is None
+    assert series.stats() == {'avg_latency': 0, 'min_latency': 0, 'max_latency': 0, 'stddev_latency': 0}
@@ -0,0 +1,131 @@
+import math
+import time
+
+import pytest
+
+from core.monitor import PingMonitor, RingBuffer, Rollup, lttb
+from core.ping_engine import PingSample
+
+
+def test_ring_buffer_keeps_newest_samples_in_order():
+    ring = RingBuffer(3)
+    for i in range(5):
+        ring.append(float(i), i * 10.0)
+
+    times, values = ring.snapshot()
+    assert len(ring) == 3
+    assert list(times) == [2.0, 3.0, 4.0]
+    assert list(values) == [20.0, 30.0, 40.0]
+
+
+def test_rollup_aggregates_each_bucket():
+    rollup = Rollup(resolution=10, capacity=4)
+    rollup.add(100.0, 5.0)
+    rollup.add(105.0, 15.0)
+    rollup.add(109.0, math.nan)
+    rollup.add(110.0, 7.0)
+
+    first, second = rollup.buckets()
+    assert first[:4] == (100, 5.0, 10.0, 15.0)
+    assert first[4] == pytest.approx(100 / 3)
+    assert second == (110, 7.0, 7.0, 7.0, 0.0)
+
+
+def test_rollup_places_out_of_order_samples_in_their_bucket():
+    rollup = Rollup(resolution=1, capacity=4)
+    rollup.add(10.5, 1.0)
+    rollup.add(12.5, 3.0)
+    # A loss reported at its timeout, after the reply to a later probe
+    rollup.add(11.5, math.nan)
+    rollup.add(10.7, 2.0)
+
+    buckets = list(rollup.buckets())
+    assert [bucket[0] for bucket in buckets] == [10, 11, 12]
+    assert buckets[0][1:4] == (1.0, 1.5, 2.0)
+    assert buckets[1][4] == 100.0
+
+
+def test_rollup_drops_buckets_older_than_capacity():
+    rollup = Rollup(resolution=1, capacity=3)
+    for second in range(6):
+        rollup.add(second, float(second))
+    # Older than the oldest bucket kept
+    rollup.add(1.5, 100.0)
+
+    assert [bucket[0] for bucket in rollup.buckets()] == [3, 4, 5]
+    assert len(rollup) == 3
+
+
+def test_lttb_returns_short_series_unchanged():
+    xs, ys = lttb([0, 1, 2], [5, 6, 7], 10)
+    assert xs == [0, 1, 2]
+    assert ys == [5, 6, 7]
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    xs = list(range(1000))
+    ys = [1.0] * 1000
+    ys[437] = 500.0
+
+    out_x, out_y = lttb(xs, ys, 50)
+    assert len(out_x) == 50
+    assert out_x[0] == 0 and out_x[-1] == 999
+    assert out_x == sorted(out_x)
+    assert 437 in out_x
+    assert max(out_y) == 500.0
+
+
+def test_ring_buffer_tail_copies_only_the_newest_samples():
+    ring = RingBuffer(4)
+    for i in range(6):
+        ring.append(float(i), i * 10.0)
+
+    times, values = ring.tail(3)
+    assert list(times) == [3.0, 4.0, 5.0]
+    assert list(values) == [30.0, 40.0, 50.0]
+    assert list(ring.tail(10)[0]) == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_chart_series_sorts_replies_and_marks_losses():
+    monitor = PingMonitor(raw_capacity=100)
+    now = time.time()
+    for offset, rtt in ((-3, 10.0), (-1, 30.0), (-2, 20.0), (-0.5, None)):
+        monitor.add(PingSample("192.0.2.1", 0, now + offset, rtt))
+
+    xs, ys, lost, resolution = monitor.chart_series(100, now=now)
+    assert xs == [-3, -2, -1]
+    assert ys == [10.0, 20.0, 30.0]
+    assert lost == [-0.5]
+    assert resolution is None
+    assert monitor.stats.snapshot()['received'] == 3
+
+
+def test_chart_series_switches_to_rollups_for_long_runs():
+    monitor = PingMonitor(raw_capacity=100)
+    now = 1699999200.0  # On the hour
+    monitor.started = now - 7200
+    # Two hours at one probe per 10 s, with one loss 30 minutes ago
+    for second in range(0, 7200, 10):
+        sent = monitor.started + second
+        monitor.add(PingSample("192.0.2.1", second, sent, None if second == 5400 else 20.0))
+
+    xs, ys, lost, resolution = monitor.chart_series(100, now=now)
+    # The 1 s rollup would need 7200 points for 100 pixels; 1 min needs 120
+    assert resolution == 60
+    assert len(xs) <= 100
+    assert set(ys) == {20.0}
+    # Marked in the middle of its minute
+    assert lost == [-1800 + 30]
+
+
+def test_chart_series_uses_hour_rollup_beyond_a_day():
+    monitor = PingMonitor(raw_capacity=100)
+    now = 1699999200.0  # On the hour
+    monitor.started = now - 3 * 86400
+    for minute in range(0, 3 * 1440, 5):
+        monitor.add(PingSample("192.0.2.1", minute, monitor.started + minute * 60, 15.0))
+
+    xs, _ys, lost, resolution = monitor.chart_series(600, now=now)
+    assert resolution == 3600
+    assert len(xs) == 72
+    assert lost == []
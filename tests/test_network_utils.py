@@ -0,0 +1,222 @@
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("psutil")
+pytest.importorskip("speedtest")
+pytest.importorskip("pyspeedtest")
+
+from core.cancellation import CancellationToken
+from core.network_utils import NetworkUtils
+from core.tcp_ping import TcpPingEngine
+from core.trace_store import TraceStore
+from core.traceroute import Hop
+
+PREFIXES = """\
+10.0.0.0\t8\t100
+10.1.0.0\t16\t200
+"""
+
+
+@pytest.fixture
+def utils():
+    utils = NetworkUtils()
+    yield utils
+    utils.shutdown()
+
+
+@pytest.fixture
+def store(utils):
+    utils._trace_store = TraceStore(":memory:")
+    return utils._trace_store
+
+
+def make_hop(ttl, address, reached=False):
+    hop = Hop(ttl, 1)
+    hop.addresses = [address]
+    hop.rtts = [None if address is None else 1.0]
+    hop.reached = reached
+    return hop
+
+
+def fake_trace(utils, paths):
+    """Replace trace_route with one answering from the given ttl -> Hop maps, in turn."""
+    calls = []
+
+    def trace_route(target, max_hops, hop_callback=None, protocol="udp", token=None, deadline=None, ttls=None):
+        path = paths[len(calls)]
+        calls.append(ttls)
+        return [path[ttl] for ttl in sorted(path) if ttls is None or ttl in ttls]
+
+    utils.trace_route = trace_route
+    return calls
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / "routeviews.pfx2as"
+    source.write_text(PREFIXES)
+    return str(source)
+
+
+def test_origin_is_described_once_the_index_is_loaded(utils, source, tmp_path):
+    assert utils.describe_origin("10.1.0.1") is None
+
+    assert utils.load_asn_index(source, str(tmp_path / "asn.idx"))
+    assert utils.describe_origin("10.1.0.1") == "AS200 (10.1.0.0/16)"
+    assert utils.describe_origin("192.0.2.1") is None
+
+
+def test_lookups_survive_reloading_the_index(utils, source, tmp_path):
+    index_path = str(tmp_path / "asn.idx")
+    assert utils.load_asn_index(source, index_path)
+    stop = threading.Event()
+    errors = []
+
+    def look_up():
+        while not stop.is_set():
+            try:
+                assert utils.lookup_asn("10.2.0.1") == 100
+                assert utils.lookup_asns(["10.1.0.1"]) == {"10.1.0.1": (200, "10.1.0.0/16")}
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=look_up) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    # Every reload unmaps the previous index while the readers are using it
+    for _ in range(200):
+        assert utils.load_asn_index(source, index_path)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+
+
+def test_quick_trace_reprobes_only_stale_hops(utils, store):
+    stored = [make_hop(1, "10.0.0.1"), make_hop(2, "10.0.0.2"), make_hop(3, "192.0.2.1", reached=True)]
+    store.save("192.0.2.1", stored, probed_at={2: time.time() - 600})
+    calls = fake_trace(utils, [{2: make_hop(2, "10.0.0.2")}])
+
+    hops, reused = utils.quick_trace_route("192.0.2.1")
+
+    assert calls == [{2}]
+    assert [hop.responders for hop in hops] == [["10.0.0.1"], ["10.0.0.2"], ["192.0.2.1"]]
+    assert set(reused) == {1, 3}
+
+
+def test_quick_trace_drops_stored_hops_past_an_earlier_destination(utils, store):
+    stored = [make_hop(1, "10.0.0.1"), make_hop(2, None), make_hop(3, "192.0.2.1", reached=True)]
+    store.save("192.0.2.1", stored)
+    # The silent hop is probed again and now is the destination itself
+    fake_trace(utils, [{2: make_hop(2, "192.0.2.1", reached=True)}])
+
+    hops, reused = utils.quick_trace_route("192.0.2.1")
+
+    assert [hop.ttl for hop in hops] == [1, 2]
+    assert hops[-1].reached
+    assert set(reused) == {1}
+
+
+def test_quick_trace_falls_back_when_a_hop_moved(utils, store):
+    stored = [make_hop(1, "10.0.0.1"), make_hop(2, "10.0.0.2"), make_hop(3, "192.0.2.1", reached=True)]
+    store.save("192.0.2.1", stored, probed_at={2: time.time() - 600})
+    full = {1: make_hop(1, "10.0.0.1"), 2: make_hop(2, "10.9.0.2"), 3: make_hop(3, "10.9.0.3"),
+            4: make_hop(4, "192.0.2.1", reached=True)}
+    calls = fake_trace(utils, [{2: make_hop(2, "10.9.0.2")}, full])
+
+    hops, reused = utils.quick_trace_route("192.0.2.1")
+
+    assert calls == [{2}, None]
+    assert [hop.responders for hop in hops] == [["10.0.0.1"], ["10.9.0.2"], ["10.9.0.3"], ["192.0.2.1"]]
+    assert reused == {}
+
+
+def test_quick_trace_falls_back_when_the_destination_stops_answering(utils, store):
+    stored = [make_hop(1, "10.0.0.1"), make_hop(2, "192.0.2.1", reached=True)]
+    store.save("192.0.2.1", stored, probed_at={2: time.time() - 600})
+    full = {1: make_hop(1, "10.0.0.1"), 2: make_hop(2, None), 3: make_hop(3, "192.0.2.1", reached=True)}
+    calls = fake_trace(utils, [{2: make_hop(2, None)}, full])
+
+    hops, reused = utils.quick_trace_route("192.0.2.1")
+
+    assert calls == [{2}, None]
+    assert [hop.ttl for hop in hops] == [1, 2, 3]
+    assert reused == {}
+
+
+def fail(*args, **kwargs):
+    raise OSError(24, "Too many open files")
+
+
+def test_tcp_ping_many_reports_engine_errors_as_loss(utils, monkeypatch):
+    monkeypatch.setattr(TcpPingEngine, "ping_many", fail)
+
+    results = utils.run_tcp_ping_many(["127.0.0.1"], port=9, count=2)
+
+    assert results == {"127.0.0.1": (None, 100.0)}
+
+
+def test_tcp_ping_stream_raises_engine_errors(utils, monkeypatch):
+    monkeypatch.setattr(TcpPingEngine, "stream", fail)
+
+    with pytest.raises(OSError, match="Too many open files"):
+        list(utils.stream_tcp_ping("127.0.0.1", port=9, count=2))
+
+
+def test_tcp_ping_stream_stops_at_its_deadline(utils):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(64)
+    try:
+        started = time.monotonic()
+        samples = list(utils.stream_tcp_ping(
+            "127.0.0.1", listener.getsockname()[1], count=None, interval=0.05, deadline=0.3
+        ))
+    finally:
+        listener.close()
+
+    assert samples
+    assert time.monotonic() - started < 2
+
+
+def test_cancelling_the_caller_token_stops_a_stream(utils):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(64)
+    token = CancellationToken()
+    try:
+        threading.Timer(0.2, token.cancel).start()
+        started = time.monotonic()
+        samples = list(utils.stream_tcp_ping(
+            "127.0.0.1", listener.getsockname()[1], count=None, interval=0.05, token=token
+        ))
+    finally:
+        listener.close()
+
+    assert samples
+    assert time.monotonic() - started < 2
+
+
+def test_trace_many_merges_paths_and_flags_shared_hops(utils):
+    def run_trace_route(target, max_hops, update_ui_callback=None, token=None, protocol="udp"):
+        for hop in (make_hop(1, "10.0.0.1"), make_hop(2, target, reached=True)):
+            update_ui_callback(hop.format() + "\n", hop)
+        return f"trace to {target}"
+
+    utils.run_trace_route = run_trace_route
+    lines = []
+
+    graph, outputs = utils.run_trace_route_many(
+        ["192.0.2.1", "192.0.2.2", "192.0.2.1"],
+        update_ui_callback=lambda target, line, hop, shared: lines.append((target, hop.ttl, shared))
+    )
+
+    assert outputs == {"192.0.2.1": "trace to 192.0.2.1", "192.0.2.2": "trace to 192.0.2.2"}
+    assert [node.address for node in graph.shared_nodes()] == ["10.0.0.1"]
+    # Whichever trace reached the first hop second sees it as shared
+    assert sorted(shared for _target, ttl, shared in lines if ttl == 1) == [[], ["10.0.0.1"]]
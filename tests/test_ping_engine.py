@@ -0,0 +1,87 @@
+import math
+import select
+
+import pytest
+
+from core import ping_engine
+from core.latency_series import LatencySeries
+from core.ping_engine import PingEngine
+
+
+@pytest.fixture
+def engine():
+    engine = PingEngine(timeout=0.3)
+    try:
+        engine.open()
+    except PermissionError:
+        pytest.skip("ICMP sockets are not allowed here")
+    yield engine
+    engine.close()
+
+
+def drop_probes(engine, dropped):
+    """Make the engine 'send' the given probe rounds without putting them on the wire."""
+    send = engine._send
+    sent = []
+
+    def lossy_send(packet, address):
+        sent.append(address)
+        if len(sent) - 1 in dropped:
+            return True
+        return send(packet, address)
+
+    engine._send = lossy_send
+
+
+def test_stream_reports_loss_late_with_its_own_sequence(engine):
+    drop_probes(engine, {1})
+    samples = list(engine.stream(["127.0.0.1"], count=6, interval=0.02))
+
+    arrival = [sample.sequence for sample in samples]
+    # The loss is only reported at its timeout, after replies to later probes
+    assert sorted(arrival) == list(range(6))
+    assert arrival.index(1) > arrival.index(2)
+    assert [sample.sequence for sample in samples if sample.lost] == [1]
+
+    series = LatencySeries(capacity=6)
+    for sample in samples:
+        series.set(sample.sequence, sample.rtt)
+    assert [math.isnan(value) for value in series] == [False, True, False, False, False, False]
+
+
+def test_closing_the_stream_stops_it(engine):
+    samples = engine.stream(["127.0.0.1"], count=None, interval=0.01)
+    first = [next(samples) for _ in range(3)]
+    samples.close()
+
+    assert [sample.sequence for sample in first] == [0, 1, 2]
+    assert all(sample.rtt is not None for sample in first)
+
+
+def test_stream_sleeps_while_in_flight_cap_is_reached(engine, monkeypatch):
+    monkeypatch.setattr(ping_engine, "MAX_IN_FLIGHT", 2)
+    drop_probes(engine, set(range(4)))
+    waits = []
+    wait = select.select
+
+    def counting_select(readable, writable, errors, timeout):
+        waits.append(timeout)
+        return wait(readable, writable, errors, timeout)
+
+    monkeypatch.setattr(select, "select", counting_select)
+    samples = list(engine.stream(["127.0.0.1"], count=4, interval=0.01))
+
+    assert [sample.sequence for sample in samples] == [0, 1, 2, 3]
+    assert all(sample.lost for sample in samples)
+    # Two slots free up per timeout; the engine waits for them instead of polling
+    assert len(waits) < 20
+
+
+def test_stream_pings_many_targets_on_one_socket(engine):
+    targets = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+    samples = list(engine.stream(targets, count=2, interval=0.05))
+
+    assert sorted((sample.target, sample.sequence) for sample in samples) == [
+        (target, sequence) for target in targets for sequence in (0, 1)
+    ]
+    assert all(sample.rtt is not None for sample in samples)
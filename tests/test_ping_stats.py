@@ -0,0 +1,66 @@
+import random
+import statistics
+
+import pytest
+
+from core.ping_stats import JitterEstimator, P2Quantile, PingStatistics, RunningStats
+
+
+def test_running_stats_matches_batch_statistics():
+    values = [12.5, 10.0, 31.0, 14.25, 9.5]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.stddev == pytest.approx(statistics.stdev(values))
+    assert (stats.min, stats.max) == (9.5, 31.0)
+
+
+def test_jitter_smooths_rtt_differences():
+    jitter = JitterEstimator()
+    for rtt in (10.0, 26.0, 10.0):
+        jitter.add(rtt)
+
+    assert jitter.jitter == pytest.approx(1 + (16 - 1) / 16)
+
+
+def test_p2_quantile_is_exact_for_first_samples():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    for value in (5.0, 1.0, 3.0):
+        estimator.add(value)
+
+    assert estimator.value == 3.0
+
+
+@pytest.mark.parametrize("quantile", [0.5, 0.95, 0.99])
+def test_p2_quantile_tracks_true_quantile(quantile):
+    rng = random.Random(7)
+    values = [rng.expovariate(1 / 20) for _ in range(20000)]
+    estimator = P2Quantile(quantile)
+    for value in values:
+        estimator.add(value)
+
+    exact = sorted(values)[int(quantile * (len(values) - 1))]
+    assert estimator.value == pytest.approx(exact, rel=0.05)
+
+
+def test_snapshot_counts_losses():
+    stats = PingStatistics()
+    for rtt in (10.0, None, 20.0, float("nan")):
+        stats.add(rtt)
+
+    snapshot = stats.snapshot()
+    assert snapshot['received'] == 2
+    assert snapshot['packet_loss'] == 50.0
+    assert snapshot['avg_latency'] == 15.0
+    assert (snapshot['min_latency'], snapshot['max_latency']) == (10.0, 20.0)
+
+
+def test_empty_snapshot_reports_zeros():
+    snapshot = PingStatistics().snapshot()
+    assert snapshot['received'] == 0
+    assert snapshot['avg_latency'] == 0
+    assert snapshot['p95_latency'] == 0
+    assert snapshot['packet_loss'] == 0.0
@@ -0,0 +1,172 @@
+import math
+import socket
+import threading
+import time
+
+import pytest
+
+from core import probe_helper
+from core.cancellation import CancellationToken
+from core.ping_engine import PingEngine, PingSample
+from core.probe_helper import (
+    FRAME, MAX_PAYLOAD, MSG_PING, ProbeHelper, ProbeHelperClient,
+    _pack_hop, _pack_sample, _read_frame, _take, _unpack_hops, _unpack_samples
+)
+from core.scheduler import TokenBucket
+from core.traceroute import Hop
+
+
+def icmp_allowed():
+    engine = PingEngine()
+    try:
+        engine.open()
+    except PermissionError:
+        return False
+    finally:
+        engine.close()
+    return True
+
+
+@pytest.fixture
+def helper(tmp_path):
+    helper = ProbeHelper(str(tmp_path / "probe.sock"))
+    threading.Thread(target=helper.serve_forever, daemon=True).start()
+    yield helper
+    helper.close()
+
+
+@pytest.fixture
+def client(helper):
+    client = ProbeHelperClient(helper.path)
+    yield client
+    client.close()
+
+
+def test_samples_round_trip():
+    samples = [PingSample("192.0.2.1", 7, 1700000000.25, 12.5, 64), PingSample("192.0.2.2", 8, 1700000001.5)]
+    decoded = _unpack_samples(b"".join(_pack_sample(sample) for sample in samples))
+
+    assert [(s.target, s.sequence, s.sent_at, s.ttl) for s in decoded] == [
+        ("192.0.2.1", 7, 1700000000.25, 64), ("192.0.2.2", 8, 1700000001.5, None)
+    ]
+    assert decoded[0].rtt == pytest.approx(12.5)
+    assert decoded[1].rtt is None
+
+
+def test_hops_round_trip():
+    hop = Hop(5, 3)
+    hop.addresses = ["192.0.2.9", None, "192.0.2.9"]
+    hop.rtts = [1.5, None, 2.25]
+    hop.marks = ["", "", "!H"]
+    hop.reached = True
+    decoded, = _unpack_hops(_pack_hop(hop))
+
+    assert decoded.ttl == 5
+    assert decoded.addresses == hop.addresses
+    assert decoded.rtts == hop.rtts
+    assert decoded.marks == hop.marks
+    assert decoded.reached
+
+
+def test_oversized_frame_is_rejected():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(FRAME.pack(MAX_PAYLOAD + 1, 1, MSG_PING))
+        with pytest.raises(ValueError):
+            _read_frame(right)
+
+
+@pytest.mark.parametrize("timeout", [math.nan, math.inf])
+def test_non_finite_timeout_is_rejected(client, timeout):
+    with pytest.raises(OSError, match="Invalid timeout"):
+        list(client.stream_ping(["127.0.0.1"], count=1, timeout=timeout))
+
+
+def test_non_finite_interval_is_rejected(client):
+    with pytest.raises(OSError, match="Invalid interval"):
+        list(client.stream_ping(["127.0.0.1"], count=1, interval=math.nan))
+
+
+def test_ping_through_helper(client):
+    if not icmp_allowed():
+        pytest.skip("ICMP sockets are not allowed here")
+    samples = list(client.stream_ping(["127.0.0.1"], count=2, interval=0.2, timeout=1))
+
+    assert sorted(sample.sequence for sample in samples) == [0, 1]
+    assert all(sample.rtt is not None for sample in samples)
+
+
+def test_take_paces_packets_at_the_bucket_rate():
+    bucket = TokenBucket(1000)
+    started = time.monotonic()
+    assert _take(bucket, 300, CancellationToken())
+
+    assert time.monotonic() - started == pytest.approx(0.29, abs=0.1)
+
+
+def test_take_stops_when_cancelled():
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    started = time.monotonic()
+
+    assert not _take(TokenBucket(10), 100, token)
+    assert time.monotonic() - started < 1
+
+
+def test_requests_are_capped_across_connections(tmp_path, monkeypatch):
+    if not icmp_allowed():
+        pytest.skip("ICMP sockets are not allowed here")
+    monkeypatch.setattr(probe_helper, "MAX_REQUESTS", 1)
+    helper = ProbeHelper(str(tmp_path / "probe.sock"))
+    threading.Thread(target=helper.serve_forever, daemon=True).start()
+    first, second = ProbeHelperClient(helper.path), ProbeHelperClient(helper.path)
+    try:
+        endless = first.stream_ping(["127.0.0.1"], interval=0.2, timeout=1)
+        next(endless)
+        with pytest.raises(OSError, match="Too many requests in flight on the helper"):
+            list(second.stream_ping(["127.0.0.1"], count=1, timeout=1))
+
+        # Ending the first request frees its slot
+        endless.close()
+        time.sleep(0.3)
+        assert len(list(second.stream_ping(["127.0.0.1"], count=1, timeout=1))) == 1
+    finally:
+        first.close()
+        second.close()
+        helper.close()
+
+
+def test_connections_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(probe_helper, "MAX_CONNECTIONS", 1)
+    helper = ProbeHelper(str(tmp_path / "probe.sock"))
+    threading.Thread(target=helper.serve_forever, daemon=True).start()
+    first = ProbeHelperClient(helper.path)
+    second = ProbeHelperClient(helper.path)
+    try:
+        with pytest.raises(OSError, match="connection closed"):
+            list(second.stream_ping(["127.0.0.1"], count=1, timeout=1))
+        with pytest.raises(OSError, match="Invalid timeout"):
+            list(first.stream_ping(["127.0.0.1"], count=1, timeout=math.nan))
+    finally:
+        first.close()
+        second.close()
+        helper.close()
+
+
+def test_traces_are_charged_to_the_helper_rate(tmp_path, monkeypatch):
+    if not icmp_allowed():
+        pytest.skip("Raw sockets are not allowed here")
+    monkeypatch.setattr(probe_helper, "MAX_RATE", 100)
+    helper = ProbeHelper(str(tmp_path / "probe.sock"))
+    threading.Thread(target=helper.serve_forever, daemon=True).start()
+    client = ProbeHelperClient(helper.path)
+    try:
+        started = time.monotonic()
+        hops = client.trace("127.0.0.1", max_hops=5, probes=10, timeout=0.5)
+
+        # 50 probes at 100 packets per second
+        assert time.monotonic() - started >= 0.4
+        assert hops[-1].reached
+    finally:
+        client.close()
+        helper.close()
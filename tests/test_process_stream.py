@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+
+from core.cancellation import CancellationToken
+from core.process_stream import ProcessStream, stream_processes
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def read_all(stream):
+    return [line for batch in stream.batches() for line in batch]
+
+
+def test_stdout_and_stderr_lines_are_delivered():
+    stream = ProcessStream(python(
+        "import sys; print('one'); print('oops', file=sys.stderr); sys.stdout.write('two')"
+    ), batch_interval=0)
+
+    lines = read_all(stream)
+
+    assert [line for line in lines if line[0] == "stdout"] == [("stdout", "one"), ("stdout", "two")]
+    assert stream.stderr == "oops"
+    assert stream.returncode == 0
+    assert stream.reason is None
+
+
+def test_deadline_kills_a_silent_process():
+    started = time.monotonic()
+    stream = ProcessStream(python("import time; print('ready', flush=True); time.sleep(30)"), deadline=0.3)
+
+    lines = read_all(stream)
+
+    assert time.monotonic() - started < 5
+    assert lines == [("stdout", "ready")]
+    assert stream.reason == "deadline"
+    assert stream.returncode != 0
+
+
+def test_cancelled_token_kills_the_process_group():
+    token = CancellationToken()
+    # The child shares the stdout pipe, so the read only ends once it is killed too
+    stream = ProcessStream(python(
+        "import subprocess, sys, time;"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']);"
+        "time.sleep(30)"
+    ), token=token)
+    threading.Timer(0.3, token.cancel).start()
+    started = time.monotonic()
+
+    read_all(stream)
+
+    assert time.monotonic() - started < 5
+    assert stream.reason == "cancelled"
+
+
+def test_lines_are_batched():
+    stream = ProcessStream(python("for n in range(100): print(n)"), batch_interval=1)
+
+    batches = list(stream.batches())
+
+    # Everything arrives well within one batch interval, so at most a couple of batches
+    assert len(batches) <= 2
+    assert [int(line) for batch in batches for _name, line in batch] == list(range(100))
+
+
+def test_many_processes_share_one_reader():
+    streams = [ProcessStream(python(f"print({n})"), batch_interval=0) for n in range(5)]
+
+    output = {}
+    for stream, batch in stream_processes(streams):
+        output.setdefault(stream.command[-1], []).extend(line for _name, line in batch)
+
+    assert sorted(lines[0] for lines in output.values()) == ["0", "1", "2", "3", "4"]
+    assert all(stream.returncode == 0 for stream in streams)
@@ -0,0 +1,92 @@
+import pytest
+
+from core.cancellation import CancellationToken
+from core.route_monitor import RouteMonitor
+from core.traceroute import Hop
+
+
+def make_round(*addresses):
+    hops = []
+    for ttl, address in enumerate(addresses, 1):
+        hop = Hop(ttl, 1)
+        hop.addresses = [address]
+        hop.rtts = [None if address is None else float(ttl)]
+        hops.append(hop)
+    return hops
+
+
+class ScriptedEngine:
+    """Trace engine answering each round from a script, cancelling the token at its end."""
+
+    def __init__(self, rounds, token):
+        self.rounds = list(rounds)
+        self.token = token
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def trace(self, target, max_hops, token=None):
+        hops = self.rounds.pop(0)
+        if not self.rounds:
+            self.token.cancel()
+        return hops
+
+
+def test_rounds_fold_into_per_hop_loss_and_latency():
+    monitor = RouteMonitor("192.0.2.9", max_hops=5)
+    monitor.add_round(make_round("10.0.0.1", "10.0.0.2", "192.0.2.9"))
+    monitor.add_round(make_round("10.0.0.1", None, "192.0.2.9"))
+    monitor.add_round(make_round("10.0.0.1", "10.0.0.2", "192.0.2.9"))
+
+    rows = monitor.rows()
+    assert [row[:4] for row in rows] == [
+        (1, "10.0.0.1", 0.0, 3), (2, "10.0.0.2", pytest.approx(100 / 3), 3), (3, "192.0.2.9", 0.0, 3)
+    ]
+    ttl, _address, _loss, _sent, last, avg, best, worst, stddev = rows[1]
+    assert (last, avg, best, worst, stddev) == (2.0, 2.0, 2.0, 2.0, 0.0)
+
+
+def test_silent_hop_has_no_latency():
+    monitor = RouteMonitor("192.0.2.9", max_hops=3)
+    monitor.add_round(make_round("10.0.0.1", None, "192.0.2.9"))
+
+    assert monitor.rows()[1] == (2, None, 100.0, 1, None, None, None, None, None)
+
+
+def test_new_responder_is_a_route_change():
+    monitor = RouteMonitor("192.0.2.9", max_hops=3)
+    monitor.add_round(make_round("10.0.0.1", "10.0.0.2"))
+    # A lost probe is not a change
+    assert monitor.add_round(make_round("10.0.0.1", None)) == []
+
+    changes = monitor.add_round(make_round("10.0.0.1", "10.9.0.2"))
+
+    assert [change[1:] for change in changes] == [(2, "10.0.0.2", "10.9.0.2")]
+    assert list(monitor.changes) == changes
+
+
+def test_rows_follow_the_depth_of_the_last_round():
+    monitor = RouteMonitor("192.0.2.9", max_hops=5)
+    monitor.add_round(make_round("10.0.0.1", "10.0.0.2", "192.0.2.9"))
+    monitor.add_round(make_round("192.0.2.9"))
+
+    assert len(monitor.rows()) == 1
+
+
+def test_run_reports_every_round_until_cancelled():
+    token = CancellationToken()
+    rounds = [make_round("10.0.0.1", "192.0.2.9") for _ in range(3)]
+    monitor = RouteMonitor(
+        "192.0.2.9", max_hops=5, interval=0.01,
+        engine_factory=lambda protocol, timeout, probes: ScriptedEngine(rounds, token)
+    )
+    seen = []
+
+    monitor.run(lambda monitor, changes: seen.append(monitor.rounds), token)
+
+    # The round that cancels the token is not folded in
+    assert seen == [1, 2]
+    assert monitor.rounds == 2
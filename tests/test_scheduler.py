@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from core.ping_engine import PingEngine
+from core.scheduler import FixedRateScheduler, TokenBucket
+
+
+@pytest.fixture
+def icmp_engine():
+    engine = PingEngine(timeout=1)
+    try:
+        engine.open()
+    except PermissionError:
+        pytest.skip("ICMP sockets are not allowed here")
+    yield engine
+    engine.close()
+
+
+def test_bucket_starts_full_and_refuses_past_its_burst():
+    bucket = TokenBucket(100, burst=5)
+
+    assert all(bucket.consume(now=bucket.updated) for _ in range(5))
+    assert not bucket.consume(now=bucket.updated)
+
+
+def test_bucket_refills_at_its_rate_up_to_its_burst():
+    bucket = TokenBucket(100, burst=5)
+    start = bucket.updated
+    assert bucket.consume(5, now=start)
+
+    assert bucket.time_until_available(now=start) == pytest.approx(0.01)
+    assert bucket.consume(2, now=start + 0.02)
+    assert not bucket.consume(now=start + 0.02)
+    # A long pause only refills the burst
+    assert not bucket.consume(6, now=start + 10)
+    assert bucket.consume(5, now=start + 10)
+
+
+def test_default_burst_is_ten_milliseconds_of_tokens():
+    assert TokenBucket(1000).capacity == 10
+    assert TokenBucket(10).capacity == 1
+
+
+def test_due_times_are_computed_from_the_start():
+    schedule = FixedRateScheduler(0.1, start=100.0)
+
+    assert schedule.is_due(100.0)
+    for _ in range(50):
+        schedule.advance()
+    assert schedule.next_due() == pytest.approx(105.0)
+    assert not schedule.is_due(104.99)
+    assert schedule.time_until_due(104.9) == pytest.approx(0.1)
+    assert schedule.time_until_due(106.0) == 0
+
+
+def test_send_rate_does_not_drift_under_a_slow_consumer(icmp_engine):
+    # The consumer takes most of an interval per sample; sends keep to the schedule
+    sent = []
+    started = time.monotonic()
+    for sample in icmp_engine.stream(["127.0.0.1"], count=10, interval=0.05):
+        sent.append(sample.sent_at)
+        time.sleep(0.04)
+    elapsed = time.monotonic() - started
+
+    gaps = [later - earlier for earlier, later in zip(sent, sent[1:])]
+    assert sum(gaps) / len(gaps) == pytest.approx(0.05, abs=0.01)
+    assert elapsed < 10 * 0.05 + 0.3
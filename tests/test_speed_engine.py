@@ -0,0 +1,337 @@
+import http.server
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from core.cancellation import CancellationToken, OperationCancelled
+from core.speed_engine import (
+    BATCH_SAMPLES, MAX_WARMUP_SHARE, MIN_BATCHES, MIN_WARMUP, PAYLOAD_SIZE, SAMPLE_INTERVAL, TOLERANCE,
+    DownloadEngine, ThroughputEstimator, ThroughputSeries, TransferMeter, TransferResult, UploadBody,
+    UploadEngine, upload_payload
+)
+
+BLOCK = bytes(64 * 1024)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serves endless-looking downloads and accepts uploads."""
+
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = 0
+    posts = 0
+    body_size = 64 * 1024 * 1024
+    reset_after = None  # Blocks sent before a download is reset, None to send it all
+    stall_uploads = False
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def do_GET(self):
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).requests += 1
+        size = self.body_size
+        self.send_response(200)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        try:
+            for sent, offset in enumerate(range(0, size, len(BLOCK))):
+                if self.reset_after is not None and sent == self.reset_after:
+                    # Close with a reset, so the client sees an error mid-body
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    self.close_connection = True
+                    return
+                self.wfile.write(BLOCK[:size - offset])
+        except OSError:
+            pass
+
+    def do_POST(self):
+        type(self).posts += 1
+        if self.stall_uploads:
+            # Never read the body, so the client blocks once the socket buffers fill
+            time.sleep(5)
+            return
+        length = int(self.headers["Content-Length"])
+        while length:
+            length -= len(self.rfile.read(min(length, 1024 * 1024)))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def server():
+    """Start a server thread and return its URL and handler class."""
+    handler = type("TestHandler", (Handler,), {})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/", handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_measures_throughput(server):
+    url, _handler = server
+    result = DownloadEngine([url], streams=2, duration=1.5).run()
+
+    assert result is not None
+    assert result.bytes > 0
+    assert result.mbps > 0
+    assert len(result.streams) == 2
+
+
+def test_download_reconnects_after_mid_body_reset(server):
+    url, handler = server
+    handler.reset_after = 16
+    started = time.monotonic()
+    result = DownloadEngine([url], streams=1, duration=1.5).run()
+
+    # The stream kept going for the whole test, over several connections
+    assert result is not None
+    assert time.monotonic() - started >= 1.4
+    assert handler.requests > 1
+
+
+def test_download_skips_failing_url(server):
+    url, _handler = server
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        dead = f"http://127.0.0.1:{unused.getsockname()[1]}/"
+    result = DownloadEngine([dead, url], streams=1, duration=1).run()
+
+    assert result is not None
+    assert result.bytes > 0
+
+
+def test_upload_measures_throughput(server):
+    url, _handler = server
+    result = UploadEngine([url], streams=2, duration=1.5).run()
+
+    assert result is not None
+    assert result.bytes > 0
+
+
+def test_cancel_interrupts_blocked_upload(server):
+    url, handler = server
+    handler.stall_uploads = True
+    token = CancellationToken()
+    threading.Timer(0.5, token.cancel).start()
+    started = time.monotonic()
+    UploadEngine([url], streams=1, duration=10, timeout=10).run(token)
+
+    # Well before the server or the socket timeout would end the request
+    assert time.monotonic() - started < 2
+
+
+def test_upload_body_is_sliced_from_the_shared_payload():
+    meter = TransferMeter()
+    stream = meter.add_stream()
+    size = PAYLOAD_SIZE + 100 * 1024
+    body = UploadBody(size, meter, stream, threading.Event(), chunk_size=64 * 1024)
+    payload = upload_payload()
+
+    slices = iter(body)
+    first = next(slices)
+    # A slice only counts once the connection asks for the next one
+    assert meter.total == 0
+    assert first.obj is payload
+
+    rest = list(slices)
+    assert len(body) == size
+    assert meter.total == size
+    assert len(first) + sum(len(piece) for piece in rest) == size
+    assert all(piece.obj is payload for piece in rest)
+    # The body wraps around to the start of the payload
+    assert bytes(rest[-1]) == payload[100 * 1024 - len(rest[-1]):100 * 1024]
+
+
+def test_stopped_upload_body_raises():
+    meter = TransferMeter()
+    stop = threading.Event()
+    slices = iter(UploadBody(1024 * 1024, meter, meter.add_stream(), stop))
+    next(slices)
+    stop.set()
+
+    with pytest.raises(OperationCancelled):
+        next(slices)
+
+
+def test_upload_posts_again_on_the_same_connection(server, monkeypatch):
+    url, handler = server
+    monkeypatch.setattr(UploadEngine, "BODY_SIZE", 1024 * 1024)
+    result = UploadEngine([url], streams=1, duration=1).run()
+
+    assert result is not None
+    assert handler.posts > 1
+    assert handler.connections == 1
+
+
+def test_download_reads_short_bodies_on_one_connection(server):
+    url, handler = server
+    # Not a multiple of any read size, so reads end short at every body end
+    handler.body_size = 100001
+    result = DownloadEngine([url], streams=1, duration=1, chunk_size=64 * 1024).run()
+
+    assert result is not None
+    assert handler.requests > 1
+    assert handler.connections == 1
+    assert result.bytes <= handler.requests * handler.body_size
+
+
+def test_download_follows_redirects(server):
+    url, handler = server
+    result = DownloadEngine([url + "redirect"], streams=1, duration=0.5).run()
+
+    assert result is not None
+    assert result.bytes > 0
+    assert handler.requests >= 1
+
+
+def feed(estimator, rates, ramping=False):
+    """Feed one sample per SAMPLE_INTERVAL, at the given bytes per second each."""
+    total = 0.0
+    estimator.add(0.0, total, ramping)
+    for n, rate in enumerate(rates, 1):
+        total += rate * SAMPLE_INTERVAL
+        estimator.add(n * SAMPLE_INTERVAL, total, ramping)
+
+
+def slow_start(steady, seconds):
+    """Rates doubling every batch up to steady, then flat for the given seconds."""
+    rates = []
+    rate = steady / 64
+    while rate < steady:
+        rates += [rate] * BATCH_SAMPLES
+        rate *= 2
+    return rates + [steady] * int(seconds / SAMPLE_INTERVAL)
+
+
+def test_warmup_excludes_slow_start():
+    estimator = ThroughputEstimator(duration=10)
+    feed(estimator, slow_start(1e6, 3))
+
+    # Six doubling batches of 0.5 s, the jump to the steady rate, then the
+    # first batch that did not rise
+    assert estimator.warmup == pytest.approx(4.0)
+    assert estimator.rate == pytest.approx(1e6)
+
+
+def test_warmup_waits_at_least_the_minimum():
+    estimator = ThroughputEstimator(duration=10)
+    feed(estimator, [1e6] * int(MIN_WARMUP / SAMPLE_INTERVAL - 1))
+
+    assert estimator.warmup is None
+    assert estimator.rate is None
+
+
+def test_warmup_is_capped_while_the_rate_keeps_rising():
+    estimator = ThroughputEstimator(duration=4)
+    feed(estimator, [1e3 * 1.5 ** n for n in range(100)])
+
+    assert estimator.warmup == pytest.approx(4 * MAX_WARMUP_SHARE)
+
+
+def test_adding_streams_extends_the_warmup():
+    estimator = ThroughputEstimator(duration=10)
+    feed(estimator, [1e6] * 80, ramping=True)
+
+    assert estimator.warmup == pytest.approx(10 * MAX_WARMUP_SHARE)
+
+
+def test_steady_rate_is_stable_after_enough_batches():
+    ramp = slow_start(1e6, 0)
+    checks = []
+    for batches in range(1, MIN_BATCHES + 3):
+        estimator = ThroughputEstimator(duration=10)
+        feed(estimator, ramp + [1e6] * (batches * BATCH_SAMPLES))
+        checks.append(estimator.stable())
+
+    # The jump to the steady rate, the batch ending the warm-up, then MIN_BATCHES measured ones
+    assert checks == [False] * (MIN_BATCHES + 1) + [True]
+    assert estimator.warmup == pytest.approx((len(ramp) + 2 * BATCH_SAMPLES) * SAMPLE_INTERVAL)
+    assert estimator.margin == pytest.approx(0, abs=1)
+
+
+def test_noisy_rate_is_not_stable():
+    estimator = ThroughputEstimator(duration=10)
+    noisy = [1e6 if (n // BATCH_SAMPLES) % 2 else 2e6 for n in range(200)]
+    feed(estimator, noisy)
+
+    assert len(estimator.batch_rates) >= MIN_BATCHES
+    assert not estimator.stable()
+    assert estimator.margin > estimator.rate * TOLERANCE
+
+
+def test_result_reports_the_post_warmup_rate():
+    result = TransferResult(
+        12500000, 2.0, [(12500000, 2.0)], warmup=1.0, measured=(10000000, 1.0), margin=0.5
+    )
+
+    assert result.mbps == pytest.approx(80)
+    assert result.format_mbps() == "80.00 ± 0.50 Mbps"
+    assert TransferResult(12500000, 2.0, [(12500000, 2.0)]).mbps == pytest.approx(50)
+
+
+def test_series_rates_per_stream_and_in_total():
+    series = ThroughputSeries(max_streams=2, capacity=2)
+    for n in range(5):
+        # Stream 0 sends 1 MB and stream 1 0.5 MB per 0.1 s
+        series.append(n * 0.1, [n * 1000000, n * 500000])
+
+    assert len(series) == 5
+    assert series.elapsed == pytest.approx(0.4)
+    assert list(series.stream_totals(1)) == [0, 500000, 1000000, 1500000, 2000000]
+    times, mbps = series.rates()
+    assert list(times) == pytest.approx([0.1, 0.2, 0.3, 0.4])
+    assert list(mbps) == pytest.approx([120] * 4)
+    _times, mbps = series.rates(stream=0, window=2)
+    assert list(mbps) == pytest.approx([80] * 3)
+    times, _mbps = series.rates(start=3)
+    assert list(times) == pytest.approx([0.3, 0.4])
+
+
+def test_series_stall_shows_as_zero_rate():
+    series = ThroughputSeries(max_streams=1)
+    for n, total in enumerate([0, 1000000, 1000000, 2000000]):
+        series.append(n * 0.1, [total])
+
+    _times, mbps = series.rates()
+    assert list(mbps) == pytest.approx([80, 0, 80])
+
+
+def test_series_readers_keep_their_snapshot_while_it_grows():
+    series = ThroughputSeries(max_streams=1, capacity=1)
+    series.append(0.0, [0])
+    totals = series.totals()
+    for n in range(1, 100):
+        series.append(n * 0.1, [n])
+
+    assert list(totals) == [0]
+    assert len(series.totals()) == 100
+
+
+def test_engine_samples_the_transfer_into_its_series(server):
+    url, _handler = server
+    engine = DownloadEngine([url], streams=2, duration=1)
+    result = engine.run()
+
+    assert result is not None
+    assert len(engine.series) >= 5
+    assert list(engine.series.times()) == sorted(engine.series.times())
+    # The final sample is taken just before the result, as the streams stop
+    assert 0 < engine.series.totals()[-1] <= result.bytes
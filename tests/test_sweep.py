@@ -0,0 +1,75 @@
+import ipaddress
+import time
+
+import pytest
+
+from core.cancellation import CancellationToken
+from core.ping_engine import PingEngine
+from core.scheduler import TokenBucket
+from core.sweep import PingSweep, SweepResult
+
+
+@pytest.fixture
+def icmp():
+    engine = PingEngine()
+    try:
+        engine.open()
+    except PermissionError:
+        pytest.skip("ICMP sockets are not allowed here")
+    finally:
+        engine.close()
+
+
+def test_result_bitmap_tracks_live_hosts():
+    result = SweepResult(ipaddress.ip_network("192.0.2.0/28"))
+    result.record(1, 1.5)
+    result.record(2, None)
+    result.record(9, 3.0)
+
+    assert result.probed == 3
+    assert result.alive_count == 2
+    assert result.is_alive("192.0.2.9")
+    assert not result.is_alive("192.0.2.2")
+    assert not result.is_alive("198.51.100.1")
+    assert result.rtt("192.0.2.1") == 1.5
+    assert result.rtt("192.0.2.2") is None
+    assert [str(host) for host, _rtt in result.alive_hosts()] == ["192.0.2.1", "192.0.2.9"]
+
+
+def test_sweep_rejects_large_and_ipv6_networks():
+    with pytest.raises(ValueError):
+        PingSweep("10.0.0.0/8")
+    with pytest.raises(ValueError):
+        PingSweep("2001:db8::/120")
+
+
+def test_sweep_finds_loopback_hosts(icmp):
+    progress = []
+    result = PingSweep("127.0.0.0/29", rate=1000, timeout=0.5).run(progress.append)
+
+    # Network and broadcast addresses are skipped
+    assert result.probed == 6
+    assert result.alive_count == 6
+    assert progress[-1] == 100
+    assert progress == sorted(progress)
+
+
+def test_sweep_is_paced_by_its_rate(icmp):
+    started = time.monotonic()
+    result = PingSweep("127.0.0.0/27", timeout=0.5, rate_limiter=TokenBucket(100, burst=1)).run()
+
+    # 30 hosts at 100 packets per second
+    assert time.monotonic() - started >= 0.25
+    assert result.probed == 30
+
+
+def test_cancelled_sweep_stops_early(icmp):
+    token = CancellationToken()
+    sweep = PingSweep("127.0.0.0/24", timeout=0.5, rate_limiter=TokenBucket(100, burst=1))
+    probed = 0
+    for _sample in sweep.stream(token):
+        probed += 1
+        if probed == 5:
+            token.cancel()
+
+    assert sweep.result.probed == 5
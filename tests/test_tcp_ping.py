@@ -0,0 +1,79 @@
+import selectors
+import socket
+
+import pytest
+
+from core import tcp_ping
+from core.tcp_ping import TcpPingEngine
+
+
+@pytest.fixture
+def listener():
+    """Listening socket on a free loopback port."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(64)
+    yield sock
+    sock.close()
+
+
+def test_stream_times_every_handshake(listener):
+    port = listener.getsockname()[1]
+    engine = TcpPingEngine(port=port, timeout=1)
+    samples = list(engine.stream(["127.0.0.1"], count=3, interval=0.05))
+
+    assert [sample.sequence for sample in samples] == [0, 1, 2]
+    assert all(sample.target == "127.0.0.1" for sample in samples)
+    assert all(sample.rtt is not None and sample.rtt >= 0 for sample in samples)
+
+
+def test_refused_connection_counts_as_answered(listener):
+    # Closing the listener leaves a port that answers with a reset
+    port = listener.getsockname()[1]
+    listener.close()
+    engine = TcpPingEngine(port=port, timeout=1)
+    samples = list(engine.stream(["127.0.0.1"], count=2, interval=0.05))
+
+    assert len(samples) == 2
+    assert all(sample.rtt is not None for sample in samples)
+
+
+def test_ping_many_collects_series_per_target(listener):
+    port = listener.getsockname()[1]
+    engine = TcpPingEngine(port=port, timeout=1)
+    progress = []
+    results = engine.ping_many(["127.0.0.1", "127.0.0.1"], count=2, interval=0.05, callback=progress.append)
+
+    # Duplicate targets are probed once
+    assert list(results) == ["127.0.0.1"]
+    series, packet_loss = results["127.0.0.1"]
+    assert len(series) == 2
+    assert packet_loss == 0
+    assert progress[-1] == 100
+
+
+def test_stream_sleeps_while_in_flight_cap_is_reached(monkeypatch):
+    # A listener whose backlog is full leaves further handshakes hanging
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    filler = socket.create_connection(("127.0.0.1", port))
+    waits = []
+
+    class CountingSelector(selectors.DefaultSelector):
+        def select(self, timeout=None):
+            waits.append(timeout)
+            return super().select(timeout)
+
+    monkeypatch.setattr(tcp_ping.selectors, "DefaultSelector", CountingSelector)
+    try:
+        engine = TcpPingEngine(port=port, timeout=0.2, max_in_flight=1)
+        samples = list(engine.stream(["127.0.0.1"], count=3, interval=0.01))
+    finally:
+        filler.close()
+        listener.close()
+
+    assert [sample.sequence for sample in samples] == [0, 1, 2]
+    assert all(sample.lost for sample in samples)
+    assert len(waits) < 20
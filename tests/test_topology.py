@@ -0,0 +1,65 @@
+import threading
+
+from core.topology import TopologyGraph
+from core.traceroute import Hop
+
+
+def make_hop(ttl, *addresses):
+    hop = Hop(ttl, len(addresses))
+    hop.addresses = list(addresses)
+    hop.rtts = [None if address is None else float(ttl) for address in addresses]
+    return hop
+
+
+def add_path(graph, destination, *path):
+    shared = []
+    for ttl, addresses in enumerate(path, 1):
+        shared.append(graph.add_hop(destination, make_hop(ttl, *addresses)))
+    return shared
+
+
+def test_shared_routers_are_merged():
+    graph = TopologyGraph()
+    add_path(graph, "192.0.2.1", ["10.0.0.1"], ["10.0.0.2"], ["192.0.2.1"])
+    shared = add_path(graph, "198.51.100.1", ["10.0.0.1"], ["10.9.0.2"], ["198.51.100.1"])
+
+    assert shared == [["10.0.0.1"], [], []]
+    assert [node.address for node in graph.shared_nodes()] == ["10.0.0.1"]
+    assert graph.summary() == {'destinations': 2, 'nodes': 5, 'edges': 5, 'shared_nodes': 1}
+    assert graph.edges[(TopologyGraph.SOURCE, "10.0.0.1")].destinations == {"192.0.2.1", "198.51.100.1"}
+
+
+def test_silent_hops_become_edge_gaps():
+    graph = TopologyGraph()
+    add_path(graph, "192.0.2.1", ["10.0.0.1"], [None, None], [None], ["192.0.2.1"])
+
+    edge = graph.edges[("10.0.0.1", "192.0.2.1")]
+    assert edge.gap == 2
+    assert set(graph.nodes) == {"10.0.0.1", "192.0.2.1"}
+
+
+def test_load_balanced_hop_links_every_responder():
+    graph = TopologyGraph()
+    add_path(graph, "192.0.2.1", ["10.0.0.1"], ["10.0.1.1", "10.0.2.1"], ["192.0.2.1"])
+
+    assert ("10.0.0.1", "10.0.1.1") in graph.edges
+    assert ("10.0.0.1", "10.0.2.1") in graph.edges
+    # The path continues from the last responder
+    assert ("10.0.2.1", "192.0.2.1") in graph.edges
+
+
+def test_hops_merge_from_many_threads():
+    graph = TopologyGraph()
+    destinations = [f"192.0.2.{n}" for n in range(1, 33)]
+
+    def trace(destination):
+        add_path(graph, destination, ["10.0.0.1"], ["10.0.0.2"], [destination])
+
+    threads = [threading.Thread(target=trace, args=(destination,)) for destination in destinations]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert graph.summary() == {'destinations': 32, 'nodes': 34, 'edges': 34, 'shared_nodes': 2}
+    assert graph.nodes["10.0.0.2"].rtt.count == 32
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from core.trace_store import TraceStore, diff_paths
+from core.traceroute import Hop
+
+
+def make_hop(ttl, address, rtt=1.0, reached=False):
+    hop = Hop(ttl, 2)
+    if address is not None:
+        hop.addresses = [address, address]
+        hop.rtts = [rtt, rtt]
+    hop.reached = reached
+    return hop
+
+
+@pytest.fixture
+def store():
+    store = TraceStore(":memory:")
+    yield store
+    store.close()
+
+
+def test_diff_paths_classifies_every_ttl():
+    old = [make_hop(1, "10.0.0.1"), make_hop(2, "10.0.0.2"), make_hop(3, None),
+           make_hop(4, "10.0.0.4"), make_hop(5, "10.0.0.5", 10.0), make_hop(6, "10.0.0.6")]
+    new = [make_hop(1, "10.0.0.1"), make_hop(2, "10.9.0.2"), make_hop(3, "10.0.0.3"),
+           make_hop(4, None), make_hop(5, "10.0.0.5", 50.0), make_hop(7, "10.0.0.7")]
+    statuses = {change.ttl: change.status for change in diff_paths(old, new)}
+
+    assert statuses == {1: "same", 2: "changed", 3: "recovered", 4: "lost",
+                        5: "slower", 6: "gone", 7: "new"}
+
+
+def test_diff_paths_reports_new_asns():
+    asns = {"10.0.0.2": 64496, "10.9.0.2": 64511}
+    change, = diff_paths([make_hop(2, "10.0.0.2")], [make_hop(2, "10.9.0.2")], asns.get)
+
+    assert change.new_asn == [64511]
+    assert "new AS64511" in change.describe()
+
+
+def test_saved_trace_round_trips(store):
+    hops = [make_hop(1, "10.0.0.1", 1.5), make_hop(2, None), make_hop(3, "192.0.2.1", 9.0, reached=True)]
+    hops[1].rtts = [None, None]
+    store.save("192.0.2.1", hops, "udp")
+    trace = store.last("192.0.2.1")
+
+    assert trace.reached
+    assert [hop.responders for hop in trace.hops] == [["10.0.0.1"], [], ["192.0.2.1"]]
+    assert trace.hops[0].rtts == [1.5, 1.5]
+    assert trace.hops[1].rtts == [None, None]
+    assert trace.hops[-1].reached
+
+
+def test_last_known_good_skips_unreached_traces(store):
+    store.save("192.0.2.1", [make_hop(1, "10.0.0.1"), make_hop(2, "192.0.2.1", reached=True)])
+    time.sleep(0.01)
+    store.save("192.0.2.1", [make_hop(1, "10.0.0.1"), make_hop(2, None)])
+
+    assert not store.last("192.0.2.1").reached
+    assert len(store.last("192.0.2.1", reached_only=True).hops) == 2
+
+
+def test_stale_ttls_are_old_or_unanswered(store):
+    now = time.time()
+    hops = [make_hop(1, "10.0.0.1"), make_hop(2, "10.0.0.2"), make_hop(3, None), make_hop(4, "192.0.2.1", reached=True)]
+    store.save("192.0.2.1", hops, probed_at={1: now - 600, 2: now - 60})
+    trace = store.last("192.0.2.1")
+
+    assert store.stale_ttls(trace, max_age=300) == {1, 3}
+    assert store.stale_ttls(trace, max_age=30) == {1, 2, 3}
+
+
+def test_only_the_newest_traces_are_kept(tmp_path):
+    store = TraceStore(str(tmp_path / "traces.db"), max_traces=2)
+    try:
+        for ttl in (1, 2, 3):
+            store.save("192.0.2.1", [make_hop(ttl, "192.0.2.1", reached=True)])
+            time.sleep(0.01)
+
+        history = store.history("192.0.2.1")
+        assert len(history) == 2
+        assert store.last("192.0.2.1").hops[0].ttl == 3
+    finally:
+        store.close()
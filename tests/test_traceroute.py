@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from core.cancellation import CancellationToken
+from core.traceroute import HIGH_LATENCY_MS, Hop, TraceEngine, parse_hop
+
+
+def test_parse_traceroute_line():
+    hop = parse_hop(" 3  router.example.net (10.0.0.1)  1.234 ms  1.456 ms 10.0.0.9  2.5 ms")
+
+    assert hop.ttl == 3
+    assert hop.addresses == ["10.0.0.1", "10.0.0.1", "10.0.0.9"]
+    assert hop.rtts == [1.234, 1.456, 2.5]
+    assert hop.responders == ["10.0.0.1", "10.0.0.9"]
+
+
+def test_parse_numeric_line_with_lost_probes_and_marks():
+    hop = parse_hop(" 7  192.0.2.1  10.1 ms !H  *  12.0 ms !N")
+
+    assert hop.addresses == ["192.0.2.1", None, "192.0.2.1"]
+    assert hop.rtts == [10.1, None, 12.0]
+    assert hop.marks == ["!H", "", "!N"]
+    assert round(hop.loss, 1) == 33.3
+
+
+def test_parse_tracert_line():
+    # tracert prints the RTTs before the responder
+    hop = parse_hop("  2    <1 ms     1 ms     2 ms  gateway.local [192.168.1.1]")
+
+    assert hop.ttl == 2
+    assert hop.rtts == [0.0, 1.0, 2.0]
+    assert hop.addresses == ["192.168.1.1"] * 3
+
+
+def test_parse_ipv6_line():
+    hop = parse_hop(" 1  2001:db8::1  0.512 ms  0.498 ms")
+
+    assert hop.addresses == ["2001:db8::1", "2001:db8::1"]
+
+
+def test_parse_fully_lost_hop():
+    hop = parse_hop(" 9  * * *")
+
+    assert hop.rtts == [None, None, None]
+    assert hop.responders == []
+    assert hop.loss == 100.0
+
+
+def test_non_hop_lines_are_ignored():
+    assert parse_hop("traceroute to example.com (93.184.216.34), 30 hops max, 60 byte packets") is None
+    assert parse_hop("Tracing route to example.com [93.184.216.34]") is None
+    assert parse_hop("") is None
+    assert parse_hop("Trace complete.") is None
+
+
+def test_format_round_trips_through_parse():
+    hop = Hop(4, 3)
+    hop.addresses = ["10.0.0.1", None, "10.0.0.2"]
+    hop.rtts = [1.5, None, 2.25]
+    hop.marks = ["", "", "!X"]
+
+    parsed = parse_hop(hop.format())
+    assert parsed.addresses == hop.addresses
+    assert parsed.rtts == hop.rtts
+    assert parsed.marks == hop.marks
+
+
+@pytest.fixture
+def raw_sockets():
+    try:
+        TraceEngine().close()
+    except PermissionError:
+        pytest.skip("Raw sockets are not allowed here")
+
+
+@pytest.mark.parametrize("protocol", ["udp", "icmp", "tcp"])
+def test_trace_reaches_loopback_in_one_hop(raw_sockets, protocol):
+    hops = []
+    with TraceEngine(protocol, timeout=1) as engine:
+        result = engine.trace("127.0.0.1", max_hops=5, callback=hops.append)
+
+    assert [hop.ttl for hop in result] == [1]
+    assert hops == result
+    assert result[0].reached
+    assert result[0].responders == ["127.0.0.1"]
+    assert all(rtt is not None for rtt in result[0].rtts)
+
+
+def test_trace_probes_only_the_requested_ttls(raw_sockets):
+    with TraceEngine("icmp", timeout=0.5) as engine:
+        result = engine.trace("127.0.0.1", max_hops=5, ttls={1})
+
+    assert [hop.ttl for hop in result] == [1]
+    assert result[0].reached
+
+
+def test_cancelled_trace_returns_early(raw_sockets):
+    token = CancellationToken()
+    token.cancel()
+    started = time.monotonic()
+    # Nothing answers from a documentation address, so only the token ends the trace
+    with TraceEngine("icmp", timeout=5) as engine:
+        result = engine.trace("192.0.2.1", max_hops=5, token=token)
+
+    assert time.monotonic() - started < 1
+    assert result == []
+
+
+def test_unknown_protocol_is_rejected():
+    with pytest.raises(ValueError):
+        TraceEngine("sctp")
+
+
+def test_high_latency_follows_the_slowest_answered_probe():
+    hop = Hop(1, 3)
+    hop.addresses = ["10.0.0.1", None, "10.0.0.1"]
+    hop.rtts = [5.0, None, HIGH_LATENCY_MS + 1]
+
+    assert hop.high_latency
+    assert hop.avg_rtt == pytest.approx((5.0 + HIGH_LATENCY_MS + 1) / 2)
+
+
+def test_lost_hop_is_not_high_latency():
+    hop = Hop(1, 3)
+
+    assert not hop.high_latency
+    assert hop.max_rtt is None
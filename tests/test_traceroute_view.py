@@ -0,0 +1,83 @@
+import pytest
+
+wx = pytest.importorskip("wx")
+
+from core.traceroute import Hop
+from ui.modern_widgets import AppTheme
+from ui.traceroute_view import TracerouteView
+
+
+@pytest.fixture(scope="module")
+def app():
+    try:
+        app = wx.App(False)
+    except (Exception, SystemExit):
+        pytest.skip("No display to create windows on")
+    yield app
+    app.Destroy()
+
+
+@pytest.fixture
+def view(app):
+    frame = wx.Frame(None)
+    view = TracerouteView(frame)
+    yield view
+    frame.Destroy()
+
+
+def make_hop(ttl, address, rtt):
+    hop = Hop(ttl, 2)
+    hop.addresses = [address, address]
+    hop.rtts = [rtt, rtt]
+    return hop
+
+
+def show(view, hops, destination=None):
+    for hop in hops:
+        view.update_trace_output(hop.format() + "\n", hop, destination)
+    # The flush normally runs from the event loop
+    view._flush_trace_output()
+
+
+def shown_lines(view):
+    return [view.results_text.GetRange(start, end) for start, end in view._hop_lines]
+
+
+def colour_at(view, position):
+    style = wx.TextAttr()
+    view.results_text.GetStyle(position, style)
+    return style.GetTextColour()
+
+
+def test_only_high_latency_lines_are_highlighted(view):
+    hops = [make_hop(1, "10.0.0.1", 1.0), make_hop(2, "10.0.0.2", 250.0), make_hop(3, "10.0.0.3", 2.0)]
+    show(view, hops[:1])
+    show(view, hops[1:])
+
+    assert shown_lines(view) == [hop.format() + "\n" for hop in hops]
+    assert colour_at(view, view._hop_lines[1][0] + 1) == AppTheme.WARNING
+    assert colour_at(view, view._hop_lines[0][0] + 1) != AppTheme.WARNING
+    assert colour_at(view, view._hop_lines[2][0] + 1) != AppTheme.WARNING
+
+
+def test_host_names_rewrite_lines_in_the_next_flush(view):
+    hops = [make_hop(1, "10.0.0.1", 1.0), make_hop(2, "10.0.0.2", 250.0), make_hop(3, "10.0.0.1", 2.0)]
+    show(view, hops, "192.0.2.9")
+
+    view.set_host_name("10.0.0.1", "first.example.test")
+    view.set_host_name("10.0.0.2", "second.example.test")
+    view._flush_trace_output()
+
+    names = view.host_names
+    assert shown_lines(view) == ["[192.0.2.9] " + hop.format(names) + "\n" for hop in hops]
+    assert colour_at(view, view._hop_lines[1][0] + 1) == AppTheme.WARNING
+
+
+def test_clear_results_forgets_displayed_hops(view):
+    show(view, [make_hop(1, "10.0.0.1", 1.0)])
+    view.clear_results()
+    view.set_host_name("10.0.0.1", "first.example.test")
+    view._flush_trace_output()
+
+    assert view.hops == []
+    assert view.results_text.GetValue() == ""
@@ -8,6 +8,9 @@ class NetworkInfoView(ModernPanel):
     def __init__(self, parent):
         super().__init__(parent)
         
+        # Information currently shown
+        self._info = None
+        
         self._create_ui()
         
     def _create_ui(self):
@@ -99,6 +102,8 @@ class NetworkInfoView(ModernPanel):
         
     def update_network_info(self, info):
         """Update the displayed network information."""
+        self._info = info
+        
         # Update metric cards
         self.hostname_card.SetValue(info.get('hostname', 'Unknown'))
         self.local_ip_card.SetValue(info.get('local_ip', 'Unknown'))
@@ -123,6 +128,8 @@ class NetworkInfoView(ModernPanel):
         # Update additional information
         self.info_text.Clear()
         self.info_text.AppendText(f"Default Gateway: {info.get('default_gateway', 'Unknown')}\n")
+        if 'public_asn' in info:
+            self.info_text.AppendText(f"Public IP Origin: {info['public_asn']}\n")
         
         if 'error' in info:
             self.show_notification(
@@ -130,6 +137,21 @@ class NetworkInfoView(ModernPanel):
                 "warning"
             )
             
+    def set_public_asn(self, public_ip, origin):
+        """
+        Add the origin ASN of the public IP once it is known.
+        
+        Args:
+            public_ip: Public IP the origin was looked up for
+            origin: Description of the origin, e.g. "AS64496 (192.0.2.0/24)"
+        """
+        info = self._info
+        # Ignore labels for an IP that a refresh has since replaced
+        if info is None or info.get('public_ip') != public_ip or 'public_asn' in info:
+            return
+        info['public_asn'] = origin
+        self.info_text.AppendText(f"Public IP Origin: {origin}\n")
+        
     def show_notification(self, message, style="info"):
         """Show a notification message."""
         # Clear any existing notifications
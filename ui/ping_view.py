@@ -34,17 +34,30 @@ class PingTestView(ModernPanel):
         # Test parameters group
         params_group = self._create_test_parameters(controls_panel)
         
-        # Start button 
+        # Start and stop buttons
+        buttons_sizer = wx.BoxSizer(wx.VERTICAL)
+        
         self.start_button = ModernButton(
             controls_panel, 
             label="Start Test",
             size=(-1, 36)
         )
         
+        self.stop_button = ModernButton(
+            controls_panel, 
+            label="Stop", 
+            color=AppTheme.DANGER,
+            size=(-1, 36)
+        )
+        self.stop_button.Disable()  # Disabled until a test is running
+        
+        buttons_sizer.Add(self.start_button, 0, wx.EXPAND | wx.BOTTOM, 5)
+        buttons_sizer.Add(self.stop_button, 0, wx.EXPAND)
+        
         # Add the groups to the controls section
         controls_sizer.Add(target_group, 2, wx.EXPAND | wx.RIGHT, 10)
         controls_sizer.Add(params_group, 1, wx.EXPAND)
-        controls_sizer.Add(self.start_button, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
+        controls_sizer.Add(buttons_sizer, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
         controls_panel.SetSizer(controls_sizer)
         
         # Progress gauge
@@ -62,6 +75,8 @@ class PingTestView(ModernPanel):
         self.figure, self.ax = plt.subplots(figsize=(6, 2))
         self.figure.patch.set_facecolor(AppTheme.PANEL_BG.GetAsString(wx.C2S_HTML_SYNTAX))
         self.canvas = FigureCanvas(self, -1, self.figure)
+        # Pixel width of the chart, read by background threads when downsampling
+        self.chart_width = 600
         
         # Result card container with fixed height
         self.result_card_container = ModernPanel(self)
@@ -136,7 +151,7 @@ class PingTestView(ModernPanel):
         sizer = wx.StaticBoxSizer(group_box, wx.VERTICAL)
         
         # Parameters grid
-        params_grid = wx.FlexGridSizer(2, 2, 5, 10)
+        params_grid = wx.FlexGridSizer(5, 2, 5, 10)
         params_grid.AddGrowableCol(1)
         
         # Ping count
@@ -145,12 +160,34 @@ class PingTestView(ModernPanel):
         
         # Ping interval
         interval_label = wx.StaticText(group_box, label="Interval (s):")
-        self.ping_interval = wx.SpinCtrl(group_box, value="1", min=1, max=10, size=(70, -1))
+        self.ping_interval = wx.SpinCtrlDouble(
+            group_box, value="1", min=0.01, max=10, inc=0.1, size=(70, -1)
+        )
+        self.ping_interval.SetDigits(2)
+        
+        # Probe mode: ICMP echo or TCP handshake for targets that drop ICMP
+        mode_label = wx.StaticText(group_box, label="Mode:")
+        self.ping_mode = wx.Choice(group_box, choices=["ICMP", "TCP"])
+        self.ping_mode.SetSelection(0)
+        
+        # TCP port
+        port_label = wx.StaticText(group_box, label="TCP Port:")
+        self.tcp_port = wx.SpinCtrl(group_box, value="443", min=1, max=65535, size=(70, -1))
+        self.tcp_port.Disable()
         
         params_grid.Add(count_label, 0, wx.ALIGN_CENTER_VERTICAL)
         params_grid.Add(self.ping_count, 0, wx.EXPAND)
         params_grid.Add(interval_label, 0, wx.ALIGN_CENTER_VERTICAL)
         params_grid.Add(self.ping_interval, 0, wx.EXPAND)
+        params_grid.Add(mode_label, 0, wx.ALIGN_CENTER_VERTICAL)
+        params_grid.Add(self.ping_mode, 0, wx.EXPAND)
+        params_grid.Add(port_label, 0, wx.ALIGN_CENTER_VERTICAL)
+        params_grid.Add(self.tcp_port, 0, wx.EXPAND)
+        
+        # Continuous monitor mode ignores the count and runs until stopped
+        self.continuous_check = wx.CheckBox(group_box, label="Continuous monitor")
+        params_grid.Add(self.continuous_check, 0, wx.ALIGN_CENTER_VERTICAL)
+        params_grid.AddSpacer(0)
         
         sizer.Add(params_grid, 0, wx.EXPAND | wx.ALL, 5)
         
@@ -159,12 +196,33 @@ class PingTestView(ModernPanel):
     def _bind_events(self):
         """Bind control events."""
         self.ip_choice.Bind(wx.EVT_CHOICE, self.on_ip_choice)
+        self.ping_mode.Bind(wx.EVT_CHOICE, self.on_mode_choice)
+        self.continuous_check.Bind(wx.EVT_CHECKBOX, self.on_continuous_check)
+        self.canvas.Bind(wx.EVT_SIZE, self.on_canvas_size)
         
     def on_ip_choice(self, event):
         """Handle IP choice selection."""
         # Clear the custom input when selecting from dropdown
         self.target_input.Clear()
         
+    def on_mode_choice(self, event):
+        """Enable the port field only in TCP mode."""
+        self.tcp_port.Enable(self.ping_mode.GetStringSelection() == "TCP")
+        
+    def on_continuous_check(self, event):
+        """The ping count does not apply to continuous monitoring."""
+        self.ping_count.Enable(not self.continuous_check.GetValue())
+        
+    def on_canvas_size(self, event):
+        """Remember the chart width so downsampling can match it."""
+        self.chart_width = max(3, event.GetSize().GetWidth())
+        event.Skip()
+        
+    def set_running_state(self, is_running):
+        """Set the state of the start and stop buttons."""
+        self.start_button.Enable(not is_running)
+        self.stop_button.Enable(is_running)
+        
     def get_target(self):
         """Get the selected target (IP or hostname)."""
         custom_target = self.target_input.GetValue().strip()
@@ -177,13 +235,23 @@ class PingTestView(ModernPanel):
         """Get the test parameters."""
         return {
             'count': self.ping_count.GetValue(),
-            'interval': self.ping_interval.GetValue()
+            'interval': self.ping_interval.GetValue(),
+            'mode': self.ping_mode.GetStringSelection().lower(),
+            'port': self.tcp_port.GetValue(),
+            'continuous': self.continuous_check.GetValue()
         }
         
     def update_progress(self, value):
         """Update the progress gauge."""
         self.progress_gauge.SetValue(value)
         
+    def update_live_stats(self, stats):
+        """Show the running statistics of a ping test in progress."""
+        self.progress_gauge.SetStatus(
+            f"avg {stats['avg_latency']:.1f} ms, p95 {stats['p95_latency']:.1f} ms, "
+            f"jitter {stats['jitter']:.1f} ms, loss {stats['packet_loss']:.0f}%"
+        )
+        
     def clear_results(self):
         """Clear previous results."""
         self.results_text.Clear()
@@ -213,6 +281,15 @@ class PingTestView(ModernPanel):
                 self.results_text.AppendText(f"Average Latency: {stats['avg_latency']:.2f} ms\n")
                 self.results_text.AppendText(f"Minimum Latency: {stats['min_latency']:.2f} ms\n")
                 self.results_text.AppendText(f"Maximum Latency: {stats['max_latency']:.2f} ms\n")
+                if 'stddev_latency' in stats:
+                    self.results_text.AppendText(f"Std Deviation: {stats['stddev_latency']:.2f} ms\n")
+                if 'jitter' in stats:
+                    self.results_text.AppendText(f"Jitter: {stats['jitter']:.2f} ms\n")
+                if 'p95_latency' in stats:
+                    self.results_text.AppendText(
+                        f"Percentiles: p50 {stats['p50_latency']:.2f} / p95 {stats['p95_latency']:.2f} / "
+                        f"p99 {stats['p99_latency']:.2f} ms\n"
+                    )
                 self.results_text.AppendText(f"Packet Loss: {packet_loss:.2f}%\n")
                 
                 # Add quality assessment based on latency
@@ -227,7 +304,9 @@ class PingTestView(ModernPanel):
                     
                 self.results_text.AppendText(f"\nConnection Quality: {quality}")
                 
-            self.update_chart(latency_data)
+            # Continuous monitors keep their live chart
+            if latency_data is not None:
+                self.update_chart(latency_data)
             
             # Ensure text is visible
             self.results_text.ShowPosition(0)
@@ -248,8 +327,9 @@ class PingTestView(ModernPanel):
         try:
             self.ax.clear()
             if latency_data:
+                # Lost packets are NaN and show up as gaps in the line
                 self.ax.plot(
-                    latency_data, 
+                    latency_data.as_array(), 
                     label="Ping Latency (ms)", 
                     color=AppTheme.PRIMARY.GetAsString(wx.C2S_HTML_SYNTAX), 
                     marker="o", 
@@ -270,6 +350,64 @@ class PingTestView(ModernPanel):
             import logging
             logging.error(f"Error updating chart: {e}")
             
+    def update_monitor_chart(self, seconds_ago, latencies, lost=(), resolution=None):
+        """
+        Update the chart with a downsampled continuous monitor series.
+
+        Args:
+            seconds_ago: X values of the latency line
+            latencies: Latencies in ms
+            lost: X values of lost probes, or of buckets with losses
+            resolution: Bucket width in seconds the line averages over, None for raw samples
+        """
+        if not wx.IsMainThread():
+            wx.CallAfter(self._safe_update_monitor_chart, seconds_ago, latencies, lost, resolution)
+        else:
+            self._safe_update_monitor_chart(seconds_ago, latencies, lost, resolution)
+            
+    def _safe_update_monitor_chart(self, seconds_ago, latencies, lost=(), resolution=None):
+        """Thread-safe implementation of update_monitor_chart."""
+        try:
+            self.ax.clear()
+            if latencies:
+                self.ax.plot(
+                    seconds_ago, 
+                    latencies, 
+                    label="Ping Latency (ms)" if resolution is None else "Average Latency (ms)", 
+                    color=AppTheme.PRIMARY.GetAsString(wx.C2S_HTML_SYNTAX), 
+                    linestyle="-", 
+                    linewidth=1
+                )
+            if lost:
+                # Losses are marked along the bottom of the chart
+                self.ax.plot(
+                    lost,
+                    [0] * len(lost),
+                    label="Packet Loss",
+                    color=AppTheme.DANGER.GetAsString(wx.C2S_HTML_SYNTAX),
+                    linestyle="",
+                    marker="x",
+                    markersize=5,
+                    clip_on=False
+                )
+            if latencies or lost:
+                self.ax.legend(fontsize=8)
+                
+            self.ax.set_ylim(bottom=0)
+            title = "Continuous Ping Monitor"
+            if resolution is not None:
+                unit = {1: "1 s", 60: "1 min", 3600: "1 h"}.get(resolution, f"{resolution} s")
+                title += f" ({unit} averages)"
+            self.ax.set_title(title, fontsize=10)
+            self.ax.set_xlabel("Seconds Ago", fontsize=9)
+            self.ax.set_ylabel("Latency (ms)", fontsize=9)
+            self.ax.grid(True, linestyle="--", alpha=0.7)
+            self.figure.tight_layout()
+            self.canvas.draw_idle()
+        except Exception as e:
+            import logging
+            logging.error(f"Error updating monitor chart: {e}")
+            
     def show_quality_assessment(self, quality, description, icon_bitmap=None):
         """Show a quality assessment card."""
         if not wx.IsMainThread():
@@ -2,9 +2,20 @@ import wx
 import logging
 import os
 import subprocess
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 from .modern_widgets import ModernPanel, ModernButton, ModernTextCtrl, ModernGauge, AppTheme
 from .modern_widgets import ResultCard, MetricCard
 
+# Milliseconds between chart redraws while a test runs, capping the frame rate
+CHART_FRAME_INTERVAL = 100
+
+# Samples each plotted rate spans, smoothing out 100 ms counting jitter
+CHART_SMOOTHING = 3
+
+# Seconds the time axis covers before it has to grow
+CHART_SECONDS = 10
+
 class SpeedTestView(ModernPanel):
     """Panel for the Speed Test tab."""
     
@@ -57,6 +68,11 @@ class SpeedTestView(ModernPanel):
             }
         }
         
+        # Throughput series being charted, by phase: [series, samples drawn]
+        self._chart_series = {}
+        self._chart_background = None
+        self._chart_warmups = set()
+        
         self._create_ui()
         self._check_server_status()
         
@@ -143,6 +159,22 @@ class SpeedTestView(ModernPanel):
         progress_sizer.Add(self.current_speed_text, 0, wx.ALIGN_CENTER)
         self.progress_panel.SetSizer(progress_sizer)
         
+        # Live throughput chart; the lines are redrawn over a cached
+        # background, so a frame only paints what changed
+        self.figure, self.ax = plt.subplots(figsize=(6, 2))
+        self.figure.patch.set_facecolor(AppTheme.PANEL_BG.GetAsString(wx.C2S_HTML_SYNTAX))
+        self.canvas = FigureCanvas(self, -1, self.figure)
+        self.canvas.Bind(wx.EVT_SIZE, self._on_canvas_size)
+        self.chart_lines = {
+            "download": self.ax.plot([], [], label="Download", animated=True, linewidth=1.5,
+                                     color=AppTheme.PRIMARY.GetAsString(wx.C2S_HTML_SYNTAX))[0],
+            "upload": self.ax.plot([], [], label="Upload", animated=True, linewidth=1.5,
+                                   color=AppTheme.ACCENT.GetAsString(wx.C2S_HTML_SYNTAX))[0],
+        }
+        self.chart_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self._on_chart_timer, self.chart_timer)
+        self._init_chart()
+        
         # Results section - cards for speed metrics
         self.results_panel = ModernPanel(self)
         results_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -189,6 +221,7 @@ class SpeedTestView(ModernPanel):
         # Layout all components
         main_sizer.Add(header_panel, 0, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(self.progress_panel, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        main_sizer.Add(self.canvas, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         main_sizer.Add(self.results_panel, 0, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(self.analysis_container, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         main_sizer.Add(log_label, 0, wx.LEFT | wx.TOP, 10)
@@ -196,6 +229,99 @@ class SpeedTestView(ModernPanel):
         
         self.SetSizer(main_sizer)
         
+    def _init_chart(self):
+        """Reset the throughput chart to empty axes."""
+        for patch in list(self.ax.patches):
+            patch.remove()
+        for line in self.chart_lines.values():
+            line.set_data([], [])
+        self._chart_warmups.clear()
+        self.ax.set_xlim(0, CHART_SECONDS)
+        self.ax.set_ylim(0, 1)
+        self.ax.set_title("Throughput", fontsize=10)
+        self.ax.set_xlabel("Seconds", fontsize=9)
+        self.ax.set_ylabel("Mbps", fontsize=9)
+        self.ax.grid(True, linestyle="--", alpha=0.7)
+        self.ax.legend(loc="upper right", fontsize=8)
+        self.figure.tight_layout()
+        self._redraw_chart()
+        
+    def _redraw_chart(self):
+        """Draw the whole chart and cache its background for the line-only frames."""
+        self.canvas.draw()
+        self._chart_background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._blit_chart()
+        
+    def _blit_chart(self):
+        """Repaint just the lines over the cached background."""
+        self.canvas.restore_region(self._chart_background)
+        for line in self.chart_lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+        
+    def _on_canvas_size(self, event):
+        """The cached background no longer fits; redraw everything on the next frame."""
+        self._chart_background = None
+        event.Skip()
+        if not self.chart_timer.IsRunning():
+            wx.CallAfter(self._draw_chart_frame)
+        
+    def track_throughput(self, phase, series):
+        """
+        Chart a speed test phase while it runs.
+        
+        Args:
+            phase: "download" or "upload"
+            series: ThroughputSeries the phase is filling in
+        """
+        self._chart_series[phase] = [series, 0]
+        self.chart_lines[phase].set_data([], [])
+        if not self.chart_timer.IsRunning():
+            self.chart_timer.Start(CHART_FRAME_INTERVAL)
+            
+    def _on_chart_timer(self, event):
+        """Draw the samples added since the last frame."""
+        self._draw_chart_frame()
+        
+    def _draw_chart_frame(self):
+        """Add new samples to the lines, redrawing the axes only when they must grow."""
+        try:
+            if not self or self.canvas.IsBeingDeleted():
+                return
+            full = self._chart_background is None
+            for phase, entry in self._chart_series.items():
+                series, drawn = entry
+                length = len(series)
+                if series.warmup is not None and phase not in self._chart_warmups:
+                    # Shade the warm-up the result leaves out
+                    self._chart_warmups.add(phase)
+                    self.ax.axvspan(0, series.warmup, color=self.chart_lines[phase].get_color(),
+                                    alpha=0.08, linewidth=0)
+                    full = True
+                if length <= drawn:
+                    continue
+                times, mbps = series.rates(drawn, CHART_SMOOTHING)
+                entry[1] = length
+                if not times:
+                    continue
+                line = self.chart_lines[phase]
+                line.set_data(list(line.get_xdata()) + list(times), list(line.get_ydata()) + list(mbps))
+                
+                left, right = self.ax.get_xlim()
+                if times[-1] > right:
+                    self.ax.set_xlim(left, times[-1] * 1.25)
+                    full = True
+                bottom, top = self.ax.get_ylim()
+                if max(mbps) > top:
+                    self.ax.set_ylim(bottom, max(mbps) * 1.25)
+                    full = True
+            if full:
+                self._redraw_chart()
+            else:
+                self._blit_chart()
+        except Exception as e:
+            logging.debug(f"Chart update skipped - widget may have been destroyed: {e}")
+        
     def update_progress(self, value, status_message=None):
         """Update the progress gauge and status text."""
         if not wx.IsMainThread():
@@ -441,6 +567,10 @@ class SpeedTestView(ModernPanel):
                 if self.log_text and not self.log_text.IsBeingDeleted():
                     self.log_text.Clear()
                 
+                self.chart_timer.Stop()
+                self._chart_series.clear()
+                self._init_chart()
+                
                 if self.analysis_container and not self.analysis_container.IsBeingDeleted():
                     self.analysis_container.GetSizer().Clear(True)
                     self.analysis_container.Layout()
@@ -471,6 +601,9 @@ class SpeedTestView(ModernPanel):
                 if is_testing:
                     self.status_text.SetLabel("Running speed test...")
                 else:
+                    if self.chart_timer.IsRunning():
+                        self.chart_timer.Stop()
+                        self._draw_chart_frame()
                     if hasattr(self, 'progress_gauge') and not self.progress_gauge.IsBeingDeleted():
                         self.progress_gauge.SetValue(0)
                     self.status_text.SetLabel("Ready to test")
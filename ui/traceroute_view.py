@@ -1,13 +1,44 @@
+import re
 import wx
 from .modern_widgets import ModernPanel, ModernButton, ModernTextCtrl, ModernGauge, AppTheme
 from .modern_widgets import NotificationBar
+from core.traceroute import HIGH_LATENCY_MS
 
 class TracerouteView(ModernPanel):
     """Panel for the Traceroute tab."""
     
+    # (title, width) of the continuous mode table columns
+    HOP_TABLE_COLUMNS = (
+        ("Hop", 45), ("Host", 160), ("AS", 70), ("Loss %", 70), ("Sent", 60), ("Last", 70),
+        ("Avg", 70), ("Best", 70), ("Worst", 70), ("StDev", 70)
+    )
+    
     def __init__(self, parent):
         super().__init__(parent)
         
+        # Parsed hops of the current trace, in the order they were displayed,
+        # the destination of each (batch mode) and the [start, end] text
+        # positions of each hop's line
+        self.hops = []
+        self.hop_destinations = []
+        self._hop_lines = []
+        
+        # Indices into self.hops of the hops each address answered, and of
+        # the hops whose lines wait to be rewritten with new host names
+        self._address_hops = {}
+        self._renamed_hops = set()
+        
+        # Reverse DNS names of hop addresses, filled in as lookups complete
+        self.host_names = {}
+        
+        # Optional function mapping an address to its origin ASN, set once
+        # an offline ASN index is loaded
+        self.asn_lookup = None
+        
+        # Output lines waiting to be appended in the next batch
+        self._pending_lines = []
+        self._flush_scheduled = False
+        
         self._create_ui()
         
     def _create_ui(self):
@@ -38,8 +69,17 @@ class TracerouteView(ModernPanel):
         )
         self.cancel_button.Disable()  # Disabled initially
         
+        self.export_button = ModernButton(
+            controls_panel, 
+            label="Export",
+            color=AppTheme.SECONDARY,
+            size=(-1, 36)
+        )
+        self.export_button.Disable()  # Enabled once there are hops to export
+        
         buttons_sizer.Add(self.start_button, 0, wx.RIGHT, 5)
-        buttons_sizer.Add(self.cancel_button, 0)
+        buttons_sizer.Add(self.cancel_button, 0, wx.RIGHT, 5)
+        buttons_sizer.Add(self.export_button, 0)
         
         # Add controls to the panel
         controls_sizer.Add(target_group, 1, wx.EXPAND | wx.RIGHT, 10)
@@ -67,12 +107,20 @@ class TracerouteView(ModernPanel):
             wx.Font(10, wx.FONTFAMILY_TELETYPE, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
         )
         
+        # Per-hop statistics table for continuous mode, shown instead of the text
+        self.hop_table = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for index, (title, width) in enumerate(self.HOP_TABLE_COLUMNS):
+            align = wx.LIST_FORMAT_LEFT if index < 2 else wx.LIST_FORMAT_RIGHT
+            self.hop_table.InsertColumn(index, title, align, width)
+        self.hop_table.Hide()
+        
         # Layout
         main_sizer.Add(controls_panel, 0, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(self.progress_gauge, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
         main_sizer.Add(self.notification_area, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
         main_sizer.Add(results_label, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
         main_sizer.Add(self.results_text, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        main_sizer.Add(self.hop_table, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
         
         self.SetSizer(main_sizer)
             
@@ -95,12 +143,28 @@ class TracerouteView(ModernPanel):
         input_sizer.Add(target_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
         input_sizer.Add(self.target_input, 1, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
         input_sizer.Add(hops_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
-        input_sizer.Add(self.max_hops, 0, wx.ALIGN_CENTER_VERTICAL)
+        input_sizer.Add(self.max_hops, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        # Probe protocol
+        protocol_label = wx.StaticText(group_box, label="Protocol:")
+        self.protocol = wx.Choice(group_box, choices=["UDP", "ICMP", "TCP"])
+        self.protocol.SetSelection(0)
+        input_sizer.Add(protocol_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        input_sizer.Add(self.protocol, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        # MTR-style continuous mode
+        self.continuous_check = wx.CheckBox(group_box, label="Continuous (MTR)")
+        input_sizer.Add(self.continuous_check, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        # Re-probe only the hops whose stored results are stale
+        self.quick_check = wx.CheckBox(group_box, label="Quick re-trace")
+        input_sizer.Add(self.quick_check, 0, wx.ALIGN_CENTER_VERTICAL)
         
         # Help text
         help_text = wx.StaticText(
             group_box, 
-            label="Enter an IP address or hostname to trace the network route."
+            label="Enter an IP address or hostname to trace the network route, "
+                  "or several separated by commas to trace them all at once."
         )
         help_text.SetFont(AppTheme.get_font(8))
         help_text.SetForegroundColour(AppTheme.TEXT_LIGHT)
@@ -114,50 +178,240 @@ class TracerouteView(ModernPanel):
         """Get the target IP or hostname."""
         return self.target_input.GetValue().strip()
         
+    def get_targets(self):
+        """Get every target entered, for batch traces."""
+        return [target for target in re.split(r"[\s,;]+", self.get_target()) if target]
+        
     def get_max_hops(self):
         """Get the maximum hops value."""
         return self.max_hops.GetValue()
         
+    def is_continuous(self):
+        """Check whether MTR-style continuous mode is selected."""
+        return self.continuous_check.GetValue()
+        
+    def is_quick_retrace(self):
+        """Check whether only stale hops of the last stored trace should be probed."""
+        return self.quick_check.GetValue()
+        
+    def get_protocol(self):
+        """Get the probe protocol ("udp", "icmp" or "tcp")."""
+        return self.protocol.GetStringSelection().lower()
+        
     def clear_results(self):
         """Clear the results area."""
         self.results_text.Clear()
+        self.hop_table.DeleteAllItems()
+        self.hops = []
+        self.hop_destinations = []
+        self._hop_lines = []
+        self._address_hops = {}
+        self._renamed_hops = set()
+        self._pending_lines = []
+        self.export_button.Disable()
         self.progress_gauge.SetValue(0)
         self.hide_notifications()
         
-    def update_trace_output(self, line):
-        """Update the trace route output."""
+    def update_trace_output(self, line, hop=None, destination=None):
+        """
+        Update the trace route output.
+        
+        Lines are queued and appended to the control in one batch, so the
+        cost per line stays constant however much output has built up.
+        
+        Args:
+            line: Output line to append
+            hop: Parsed Hop for the line, or None if it is not a hop line
+            destination: Target the line belongs to in batch mode; the line
+                is prefixed with it
+        """
         if not wx.IsMainThread():
-            wx.CallAfter(self._safe_update_trace_output, line)
-        else:
-            self._safe_update_trace_output(line)
+            wx.CallAfter(self.update_trace_output, line, hop, destination)
+            return
+        self._pending_lines.append((line, hop, destination))
+        self._schedule_flush()
+        
+    def _schedule_flush(self):
+        """Schedule _flush_trace_output unless it is already pending."""
+        if not self._flush_scheduled:
+            # Runs after every update already queued, so they share one flush
+            self._flush_scheduled = True
+            wx.CallAfter(self._flush_trace_output)
             
-    def _safe_update_trace_output(self, line):
-        """Thread-safe implementation of update_trace_output."""
+    def _flush_trace_output(self):
+        """
+        Apply the queued host names and append the queued lines.
+        
+        Renamed hop lines are rewritten once per flush however many names
+        arrived for them, and new lines are appended with one control update
+        that styles only the new range.
+        """
+        self._flush_scheduled = False
+        pending, self._pending_lines = self._pending_lines, []
+        renamed, self._renamed_hops = self._renamed_hops, set()
+        if renamed:
+            self._rewrite_hop_lines(sorted(renamed))
+        if not pending:
+            return
         try:
-            self.results_text.AppendText(line)
+            lines = []
+            for line, hop, destination in pending:
+                if hop is not None and (
+                    self.asn_lookup or any(address in self.host_names for address in hop.responders)
+                ):
+                    line = hop.format(self.host_names, self.asn_lookup) + '\n'
+                lines.append(self._line_prefix(destination) + line)
+            text = "".join(lines)
             
-            # Auto-scroll to the bottom
-            self.results_text.ShowPosition(self.results_text.GetLastPosition())
+            start = self.results_text.GetLastPosition()
+            self.results_text.AppendText(text)
+            end = self.results_text.GetLastPosition()
             
-            # Highlight high latency lines with color
-            if "ms" in line:
-                try:
-                    latencies = [int(val.strip()) for val in line.split() if val.strip().isdigit()]
-                    if latencies and max(latencies) > 100:
-                        # Mark high latency lines
-                        pos = self.results_text.GetLastPosition()
-                        line_start = self.results_text.GetValue().rfind('\n', 0, pos-1) + 1
-                        
-                        self.results_text.SetStyle(
-                            line_start, pos,
-                            wx.TextAttr(AppTheme.WARNING)
-                        )
-                except (ValueError, IndexError):
-                    pass
+            # Some platforms count a newline as two positions; spread the
+            # difference over the new lines instead of reading the text back
+            newlines = text.count('\n')
+            extra = (end - start - len(text)) // newlines if newlines else 0
+            
+            position = start
+            for line, (_line, hop, destination) in zip(lines, pending):
+                line_end = position + len(line) + extra * line.count('\n')
+                if hop is not None:
+                    for address in hop.responders:
+                        self._address_hops.setdefault(address, []).append(len(self.hops))
+                    self.hops.append(hop)
+                    self.hop_destinations.append(destination)
+                    self._hop_lines.append([position, line_end])
+                    # Highlight high latency lines with color
+                    if hop.high_latency:
+                        self.results_text.SetStyle(position, line_end, wx.TextAttr(AppTheme.WARNING))
+                position = line_end
+                
+            if self.hops:
+                self.export_button.Enable()
+            
+            # Auto-scroll to the bottom
+            self.results_text.ShowPosition(end)
         except Exception as e:
             import logging
             logging.error(f"Error updating trace output: {e}")
         
+    @staticmethod
+    def _line_prefix(destination):
+        """Prefix marking the destination of a line in batch mode."""
+        return f"[{destination}] " if destination else ""
+        
+    def set_host_name(self, address, name):
+        """
+        Show the host name of a hop address once its reverse lookup completes.
+        
+        Hop lines already displayed are rewritten in place with the next
+        batch of output; the continuous mode table picks the name up on its
+        next refresh.
+        """
+        if not wx.IsMainThread():
+            wx.CallAfter(self._safe_set_host_name, address, name)
+        else:
+            self._safe_set_host_name(address, name)
+            
+    def _safe_set_host_name(self, address, name):
+        """Thread-safe implementation of set_host_name."""
+        self.host_names[address] = name
+        hops = self._address_hops.get(address)
+        if hops:
+            self._renamed_hops.update(hops)
+            self._schedule_flush()
+            
+    def _rewrite_hop_lines(self, indices):
+        """
+        Rewrite the displayed lines of some hops with the current host names.
+        
+        Args:
+            indices: Ascending indices into self.hops
+        """
+        try:
+            # Replace the last line first so the positions of earlier lines
+            # stay valid, then shift every span after the first one in one pass
+            deltas = {}
+            for index in reversed(indices):
+                start, end = self._hop_lines[index]
+                before = self.results_text.GetLastPosition()
+                # Replace the line without its trailing newline
+                self.results_text.Replace(
+                    start, end - 1,
+                    self._line_prefix(self.hop_destinations[index])
+                    + self.hops[index].format(self.host_names, self.asn_lookup)
+                )
+                deltas[index] = self.results_text.GetLastPosition() - before
+                
+            shift = 0
+            for index in range(indices[0], len(self._hop_lines)):
+                span = self._hop_lines[index]
+                span[0] += shift
+                shift += deltas.get(index, 0)
+                span[1] += shift
+                
+            for index in indices:
+                if self.hops[index].high_latency:
+                    start, end = self._hop_lines[index]
+                    self.results_text.SetStyle(start, end, wx.TextAttr(AppTheme.WARNING))
+        except Exception as e:
+            import logging
+            logging.error(f"Error showing host names: {e}")
+        
+    def show_hop_table(self, show):
+        """Show the per-hop table (continuous mode) or the text output."""
+        self.hop_table.Show(show)
+        self.results_text.Show(not show)
+        self.Layout()
+        
+    def update_hop_table(self, rows):
+        """
+        Update the per-hop statistics table.
+        
+        Args:
+            rows: List of (ttl, address, loss, sent, last, avg, best, worst, stddev)
+        """
+        if not wx.IsMainThread():
+            wx.CallAfter(self._safe_update_hop_table, rows)
+        else:
+            self._safe_update_hop_table(rows)
+            
+    def _safe_update_hop_table(self, rows):
+        """Thread-safe implementation of update_hop_table."""
+        try:
+            table = self.hop_table
+            table.Freeze()
+            try:
+                # Rows are updated in place so the table does not flicker
+                while table.GetItemCount() > len(rows):
+                    table.DeleteItem(table.GetItemCount() - 1)
+                for index, row in enumerate(rows):
+                    ttl, address, loss, sent, last, avg, best, worst, stddev = row
+                    name = self.host_names.get(address)
+                    asn = self.asn_lookup(address) if self.asn_lookup and address else None
+                    cells = [
+                        str(ttl),
+                        name or address or "???",
+                        "" if asn is None else f"AS{asn}",
+                        f"{loss:.1f}",
+                        str(sent),
+                    ] + ["" if value is None else f"{value:.1f}" for value in (last, avg, best, worst, stddev)]
+                    if index >= table.GetItemCount():
+                        table.InsertItem(index, cells[0])
+                    for column, text in enumerate(cells):
+                        if table.GetItemText(index, column) != text:
+                            table.SetItem(index, column, text)
+                    
+                    # Highlight lossy or slow hops like the text output does
+                    colour = AppTheme.WARNING if loss > 0 or (avg is not None and avg > HIGH_LATENCY_MS) else AppTheme.TEXT
+                    if table.GetItemTextColour(index) != colour:
+                        table.SetItemTextColour(index, colour)
+            finally:
+                table.Thaw()
+        except Exception as e:
+            import logging
+            logging.error(f"Error updating hop table: {e}")
+        
     def show_notification(self, message, style="info"):
         """Show a notification message."""
         if not wx.IsMainThread():
@@ -192,6 +446,9 @@ class TracerouteView(ModernPanel):
         self.cancel_button.Enable(is_running)
         self.target_input.Enable(not is_running)
         self.max_hops.Enable(not is_running)
+        self.protocol.Enable(not is_running)
+        self.continuous_check.Enable(not is_running)
+        self.quick_check.Enable(not is_running)
         
         if is_running:
             self.progress_gauge.Pulse()